@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+多 VM 驅動方式比較
+比較「每個 VM 一條執行緒」的 XV6TestHarness 與單一 event loop 的
+AsyncXV6TestHarness，在 8/32/64 個 VM 下的總耗時與 commands/sec
+
+用法:
+    python benchmarks/bench_async.py --vm-counts 8 32 64 --commands 20
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# 將 src 目錄加入 Python 路徑
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from xv6_async import AsyncXV6TestHarness
+from xv6_harness import XV6TestHarness
+
+
+def run_threaded(xv6_path: str, vms: int, commands: int) -> int:
+    """每個 VM 一條執行緒：開機 → 執行命令 → 關機，返回成功的命令數"""
+    def one_vm(index: int) -> int:
+        harness = XV6TestHarness(xv6_path=xv6_path, isolate_disk=True)
+        if not harness.start():
+            return 0
+        try:
+            return sum(harness.run_command(f"echo vm{index} cmd{i}")[0]
+                       for i in range(commands))
+        finally:
+            harness.stop()
+
+    with ThreadPoolExecutor(max_workers=vms) as executor:
+        return sum(executor.map(one_vm, range(vms)))
+
+
+async def run_async(xv6_path: str, vms: int, commands: int) -> int:
+    """單一 event loop 同時驅動所有 VM，返回成功的命令數"""
+    async def one_vm(index: int) -> int:
+        harness = AsyncXV6TestHarness(xv6_path=xv6_path)
+        if not await harness.start():
+            return 0
+        try:
+            completed = 0
+            for i in range(commands):
+                success, _ = await harness.run_command(f"echo vm{index} cmd{i}")
+                completed += success
+            return completed
+        finally:
+            await harness.stop()
+
+    return sum(await asyncio.gather(*(one_vm(i) for i in range(vms))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比較執行緒與 asyncio 驅動多個 VM")
+    parser.add_argument("--xv6-path", default="../xv6-riscv")
+    parser.add_argument("--vm-counts", type=int, nargs="+", default=[8, 32, 64],
+                        help="要量測的同時 VM 數量")
+    parser.add_argument("--commands", type=int, default=20, help="每個 VM 執行的命令數")
+    args = parser.parse_args()
+
+    print(f"{'VMs':>5}  {'模式':<8}  {'耗時(s)':>8}  {'完成命令':>8}  {'commands/sec':>12}")
+    for vms in args.vm_counts:
+        for mode in ("threads", "asyncio"):
+            start = time.perf_counter()
+            if mode == "threads":
+                completed = run_threaded(args.xv6_path, vms, args.commands)
+            else:
+                completed = asyncio.run(run_async(args.xv6_path, vms, args.commands))
+            elapsed = time.perf_counter() - start
+            print(f"{vms:>5}  {mode:<8}  {elapsed:>8.2f}  "
+                  f"{completed:>4}/{vms * args.commands:<4}  {completed / elapsed:>12.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
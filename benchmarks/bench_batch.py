@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+批次命令吞吐量比較
+比較逐一 run_command() 與 run_commands() 批次送出的 commands/sec
+
+用法:
+    python benchmarks/bench_batch.py --commands 50 --repetitions 3
+"""
+
+import argparse
+import sys
+
+from bench_common import measure, print_summary, summarize
+from xv6_harness import XV6TestHarness
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比較逐一與批次執行命令的吞吐量")
+    parser.add_argument("--xv6-path", default="../xv6-riscv")
+    parser.add_argument("--commands", type=int, default=50, help="每輪的命令數量")
+    parser.add_argument("--repetitions", type=int, default=3)
+    args = parser.parse_args()
+
+    harness = XV6TestHarness(xv6_path=args.xv6_path)
+    if not harness.start():
+        print("[ERROR] 無法啟動 xv6")
+        return 1
+
+    commands = [f"echo bench{i}" for i in range(args.commands)]
+    try:
+        def one_at_a_time():
+            for command in commands:
+                harness.run_command(command)
+
+        single = summarize(measure(one_at_a_time, args.repetitions, warmup=1))
+        batch = summarize(measure(lambda: harness.run_commands(commands),
+                                  args.repetitions, warmup=1))
+    finally:
+        harness.stop()
+
+    print(f"=== {args.commands} 個命令 ===")
+    print_summary("逐一 run_command()", single)
+    print_summary("批次 run_commands()", batch)
+
+    single_rate = args.commands / single["median"]
+    batch_rate = args.commands / batch["median"]
+    print(f"\n逐一: {single_rate:.1f} commands/sec")
+    print(f"批次: {batch_rate:.1f} commands/sec（{batch_rate / single_rate:.1f}x）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""
+效能量測共用工具
+提供重複量測與統計摘要，各個 bench_*.py 腳本共用
+"""
+
+import datetime
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+# 將 src 目錄加入 Python 路徑
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+
+def measure(func: Callable[[], object],
+            repetitions: int,
+            warmup: int = 0) -> List[float]:
+    """
+    重複執行 func 並記錄每次耗時
+
+    Args:
+        func: 要量測的函數
+        repetitions: 正式量測次數
+        warmup: 暖身次數（不列入結果）
+
+    Returns:
+        List[float]: 每次執行的秒數
+    """
+    for _ in range(warmup):
+        func()
+
+    samples = []
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """計算百分位數（最近排名法）"""
+    ordered = sorted(samples)
+    rank = math.ceil(pct / 100 * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """
+    計算量測結果的統計摘要
+
+    Args:
+        samples: 每次執行的秒數
+
+    Returns:
+        Dict[str, float]: count/min/mean/median/p95/max/stdev
+    """
+    if not samples:
+        return {"count": 0}
+    return {
+        "count": len(samples),
+        "min": min(samples),
+        "mean": statistics.mean(samples),
+        "median": statistics.median(samples),
+        "p95": percentile(samples, 95),
+        "max": max(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+    }
+
+
+def print_summary(title: str, summary: Dict[str, float]) -> None:
+    """以固定格式印出統計摘要（單位：毫秒）"""
+    if not summary.get("count"):
+        print(f"{title:<32} 無資料")
+        return
+    print(f"{title:<32} n={summary['count']:<4} "
+          f"median={summary['median'] * 1000:9.2f}ms  "
+          f"p95={summary['p95'] * 1000:9.2f}ms  "
+          f"min={summary['min'] * 1000:9.2f}ms")
+
+
+def environment() -> Dict[str, str]:
+    """記錄量測環境（框架版本、Python、主機），讓不同版本的結果可以對照"""
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                                  cwd=os.path.dirname(os.path.abspath(__file__)),
+                                  capture_output=True, text=True, timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        revision = ""
+    return {
+        "framework_revision": revision or "unknown",
+        "python": platform.python_version(),
+        "host": platform.node(),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def save_results(path: str, results: Dict[str, Dict[str, float]],
+                 parameters: Optional[Dict] = None) -> None:
+    """
+    將統計摘要連同量測環境寫成 JSON
+
+    Args:
+        path: 輸出檔案路徑
+        results: 項目名稱 -> summarize() 的結果
+        parameters: 量測參數（重複次數等）
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"environment": environment(), "parameters": parameters or {},
+                   "results": results}, f, indent=2)
+
+
+def print_comparison(baseline_path: str, results: Dict[str, Dict[str, float]]) -> None:
+    """
+    與先前 save_results() 保存的結果比較中位數
+
+    Args:
+        baseline_path: 基準 JSON 路徑
+        results: 這次的結果
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\n=== 與 {baseline_path}（{baseline['environment']['framework_revision']}）比較 ===")
+    for name, summary in results.items():
+        old = baseline["results"].get(name)
+        if not old or not old.get("count") or not summary.get("count"):
+            continue
+        change = (summary["median"] - old["median"]) / old["median"] * 100
+        print(f"{name:<32} {old['median'] * 1000:9.2f}ms -> "
+              f"{summary['median'] * 1000:9.2f}ms  ({change:+.1f}%)")
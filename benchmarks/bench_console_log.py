@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+除錯輸出方式比較
+以相同的測試比較 print 除錯輸出（XV6_DEBUG=1）與只寫入 console 日誌（預設）的整體執行時間
+
+用法:
+    python benchmarks/bench_console_log.py tests/test_basic.py --repetitions 3
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+from bench_common import measure, print_summary, summarize
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def run_suite(paths, debug: bool) -> None:
+    """以指定的除錯模式執行一次 pytest（輸出被 pytest 擷取，與平常執行相同）"""
+    env = dict(os.environ, XV6_DEBUG="1" if debug else "0")
+    subprocess.run([sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider"] + paths,
+                   cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比較 print 除錯輸出與 console 日誌的測試執行時間")
+    parser.add_argument("paths", nargs="*", default=["tests/test_basic.py"])
+    parser.add_argument("--repetitions", type=int, default=3)
+    args = parser.parse_args()
+
+    printed = summarize(measure(lambda: run_suite(args.paths, True), args.repetitions))
+    logged = summarize(measure(lambda: run_suite(args.paths, False), args.repetitions))
+
+    print(f"=== {' '.join(args.paths)} ===")
+    print_summary("print 除錯輸出（XV6_DEBUG=1）", printed)
+    print_summary("console 日誌", logged)
+    print(f"\n加速: {printed['median'] / logged['median']:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+檔案驗證方式比較
+比較透過 console 逐一 cat 與主機端直接讀取 fs.img 驗證檔案內容的延遲
+
+用法:
+    python benchmarks/bench_fs_read.py --files 20 --repetitions 3
+"""
+
+import argparse
+import sys
+
+from bench_common import measure, print_summary, summarize
+from xv6_harness import XV6TestHarness
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比較 console cat 與主機端讀取 fs.img")
+    parser.add_argument("--xv6-path", default="../xv6-riscv")
+    parser.add_argument("--files", type=int, default=20, help="要驗證的檔案數量")
+    parser.add_argument("--repetitions", type=int, default=3)
+    args = parser.parse_args()
+
+    harness = XV6TestHarness(xv6_path=args.xv6_path, disk_overlay=True)
+    if not harness.start():
+        print("[ERROR] 無法啟動 xv6")
+        return 1
+
+    names = [f"bench{i}.txt" for i in range(args.files)]
+    try:
+        harness.run_commands([f"echo content {name} > {name}" for name in names])
+
+        def via_console():
+            for name in names:
+                success, output = harness.run_command(f"cat {name}")
+                assert success and output == f"content {name}"
+
+        def via_host():
+            with harness.open_filesystem() as fs:
+                for name in names:
+                    assert fs.read_file(name) == f"content {name}\n".encode()
+
+        console = summarize(measure(via_console, args.repetitions, warmup=1))
+        host = summarize(measure(via_host, args.repetitions, warmup=1))
+    finally:
+        harness.stop()
+
+    print(f"=== 驗證 {args.files} 個檔案 ===")
+    print_summary("console cat", console)
+    print_summary("主機端讀取 fs.img", host)
+    print(f"\n加速: {console['median'] / host['median']:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
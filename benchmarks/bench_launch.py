@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+QEMU 啟動方式比較
+量測 `make qemu` 與直接執行 qemu-system-riscv64 從 spawn 到 shell 提示符的延遲
+
+用法:
+    python benchmarks/bench_launch.py --boots 5
+"""
+
+import argparse
+import sys
+
+from bench_common import measure, print_summary, summarize
+from xv6_harness import XV6TestHarness
+from xv6_qemu import resolve_qemu_command
+
+
+def boot_once(harness: XV6TestHarness) -> None:
+    """啟動並停止一次 xv6"""
+    if not harness.start():
+        raise RuntimeError("無法啟動 xv6")
+    harness.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比較 make qemu 與直接啟動 QEMU 的延遲")
+    parser.add_argument("--xv6-path", default="../xv6-riscv")
+    parser.add_argument("--boots", type=int, default=5, help="每種方式的開機次數")
+    args = parser.parse_args()
+
+    # 先解析並快取命令列，量測的是穩態下的啟動延遲
+    print("QEMU 命令列:", " ".join(resolve_qemu_command(args.xv6_path)))
+
+    results = {}
+    for launch in ("make", "direct"):
+        harness = XV6TestHarness(xv6_path=args.xv6_path, launch=launch)
+        results[launch] = summarize(measure(lambda: boot_once(harness), args.boots, warmup=1))
+
+    print("\n=== spawn 到 shell 提示符的延遲 ===")
+    print_summary("make qemu", results["make"])
+    print_summary("直接執行 QEMU", results["direct"])
+
+    saved = results["make"]["median"] - results["direct"]["median"]
+    print(f"\n每次開機節省（中位數）: {saved * 1000:.1f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
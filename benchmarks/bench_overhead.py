@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+框架本身的額外開銷量測
+量測 console 來回延遲（直接 pexpect 與 run_command()）、不同長度 echo 的吞吐量、
+check_file_exists() 的成本，以及開機與停止時間，結果保存為 JSON 以比較不同版本的框架
+
+用法:
+    python benchmarks/bench_overhead.py --repetitions 50 --boots 5
+    python benchmarks/bench_overhead.py --compare reports/bench_overhead-old.json
+"""
+
+import argparse
+import sys
+import time
+
+from bench_common import (measure, print_comparison, print_summary,
+                          save_results, summarize)
+from xv6_harness import XV6TestHarness
+
+# xv6 sh 的輸入緩衝區是 100 個字元（user/sh.c getcmd），
+# 加上 "echo " 與結束標記的框架後單行 payload 不能再更長
+MAX_ECHO_PAYLOAD = 90
+
+
+def bench_console(harness: XV6TestHarness, args) -> dict:
+    """已開機 VM 上的來回延遲、echo 吞吐量與檔案檢查成本"""
+    results = {}
+
+    # 基準：不經過框架，直接送出空行並等待提示符
+    def raw_roundtrip():
+        harness.process.sendline("")
+        harness.process.expect_exact("$ ")
+
+    results["raw_roundtrip"] = summarize(measure(raw_roundtrip, args.repetitions, args.warmup))
+    results["noop_run_command"] = summarize(
+        measure(lambda: harness.run_command(""), args.repetitions, args.warmup))
+
+    for size in args.payload_sizes:
+        payload = "x" * size
+        summary = summarize(measure(lambda: harness.run_command(f"echo {payload}"),
+                                    args.repetitions, args.warmup))
+        summary["bytes_per_sec"] = size / summary["median"]
+        results[f"echo_{size}B"] = summary
+
+    harness.run_command("echo bench > bench_exists")
+
+    # 每次都重新 ls（清除目錄列表快取）與命中快取兩種情況
+    def check_uncached():
+        harness._listings.clear()
+        harness.check_file_exists("bench_exists")
+
+    results["check_file_exists_uncached"] = summarize(
+        measure(check_uncached, args.repetitions, args.warmup))
+    results["check_file_exists_cached"] = summarize(
+        measure(lambda: harness.check_file_exists("bench_exists"),
+                args.repetitions, args.warmup))
+    return results
+
+
+def bench_lifecycle(args) -> dict:
+    """每輪建立新的框架實例，分別量測 start() 與 stop()"""
+    boots, stops = [], []
+    for i in range(args.boots + 1):
+        harness = XV6TestHarness(xv6_path=args.xv6_path, launch=args.launch, debug=False)
+        started = time.perf_counter()
+        if not harness.start():
+            harness.stop()
+            raise RuntimeError("無法啟動 xv6")
+        booted = time.perf_counter()
+        harness.stop()
+        stopped = time.perf_counter()
+        # 第一次開機當作暖身（建置檢查與磁碟快取）
+        if i:
+            boots.append(booted - started)
+            stops.append(stopped - booted)
+    return {"start": summarize(boots), "stop": summarize(stops)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="量測框架本身的額外開銷")
+    parser.add_argument("--xv6-path", default="../xv6-riscv")
+    parser.add_argument("--launch", choices=("direct", "make"), default="direct")
+    parser.add_argument("--repetitions", type=int, default=50, help="每個項目的量測次數")
+    parser.add_argument("--warmup", type=int, default=5, help="每個項目的暖身次數")
+    parser.add_argument("--boots", type=int, default=5, help="開機/停止的量測次數")
+    parser.add_argument("--payload-sizes", type=int, nargs="+", default=[1, 16, 64, MAX_ECHO_PAYLOAD],
+                        help="echo 的 payload 長度（位元組）")
+    parser.add_argument("--output", default="reports/bench_overhead.json")
+    parser.add_argument("--compare", metavar="JSON", help="與先前保存的結果比較")
+    args = parser.parse_args()
+
+    if max(args.payload_sizes) > MAX_ECHO_PAYLOAD:
+        parser.error(f"payload 不能超過 {MAX_ECHO_PAYLOAD} 位元組（xv6 sh 的輸入緩衝區）")
+
+    harness = XV6TestHarness(xv6_path=args.xv6_path, launch=args.launch,
+                             isolate_disk=True, debug=False)
+    if not harness.start():
+        print("[ERROR] 無法啟動 xv6")
+        return 1
+    try:
+        results = bench_console(harness, args)
+    finally:
+        harness.stop()
+
+    try:
+        results.update(bench_lifecycle(args))
+    except RuntimeError as e:
+        print(f"[ERROR] {e}")
+        return 1
+
+    print("=== 框架額外開銷 ===")
+    for name, summary in results.items():
+        print_summary(name, summary)
+    overhead = results["noop_run_command"]["median"] - results["raw_roundtrip"]["median"]
+    print(f"\nrun_command() 相對直接 pexpect 的額外延遲: {overhead * 1000:.2f}ms")
+    for size in args.payload_sizes:
+        print(f"echo {size:>3}B: {results[f'echo_{size}B']['bytes_per_sec']:10.0f} bytes/sec")
+
+    save_results(args.output, results, {"repetitions": args.repetitions, "warmup": args.warmup,
+                                        "boots": args.boots, "launch": args.launch})
+    print(f"\n結果已保存到 {args.output}")
+    if args.compare:
+        print_comparison(args.compare, results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+私有磁碟建立方式比較
+比較完整複製 fs.img 與建立 qcow2 覆蓋層的延遲與磁碟用量
+
+用法:
+    python benchmarks/bench_overlay.py --repetitions 20
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+from bench_common import measure, print_summary, summarize
+from xv6_qemu import QEMU_IMG, allocated_bytes, create_overlay
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比較 fs.img 複本與 qcow2 覆蓋層")
+    parser.add_argument("--xv6-path", default="../xv6-riscv")
+    parser.add_argument("--repetitions", type=int, default=20)
+    args = parser.parse_args()
+
+    base = os.path.join(args.xv6_path, "fs.img")
+    if not os.path.isfile(base):
+        print(f"[ERROR] fs.img 不存在: {base}")
+        return 1
+    if shutil.which(QEMU_IMG) is None:
+        print(f"[ERROR] 找不到 {QEMU_IMG}")
+        return 1
+
+    work_dir = tempfile.mkdtemp(prefix="xv6-bench-")
+    copy_path = os.path.join(work_dir, "fs.img")
+    overlay_path = os.path.join(work_dir, "fs.qcow2")
+    try:
+        def copy():
+            shutil.copyfile(base, copy_path)
+            os.remove(copy_path)
+
+        def overlay():
+            create_overlay(base, overlay_path)
+            os.remove(overlay_path)
+
+        results = {
+            "copy": summarize(measure(copy, args.repetitions, warmup=1)),
+            "overlay": summarize(measure(overlay, args.repetitions, warmup=1)),
+        }
+
+        shutil.copyfile(base, copy_path)
+        create_overlay(base, overlay_path)
+        sizes = {"copy": allocated_bytes(copy_path), "overlay": allocated_bytes(overlay_path)}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"=== fs.img: {os.path.getsize(base) / (1 << 20):.1f} MB ===")
+    print_summary("完整複本", results["copy"])
+    print_summary("qcow2 覆蓋層", results["overlay"])
+    print(f"\n每個 VM 的磁碟用量: 複本 {sizes['copy'] / 1024:.0f} KB, "
+          f"覆蓋層 {sizes['overlay'] / 1024:.0f} KB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
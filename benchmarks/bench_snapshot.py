@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+快照開機效能比較
+比較冷開機（make qemu）與快照還原（-loadvm）的 boots/sec
+
+用法:
+    python benchmarks/bench_snapshot.py --boots 5
+"""
+
+import argparse
+import sys
+
+from bench_common import measure, print_summary, summarize
+from xv6_harness import XV6TestHarness
+
+
+def boot_once(harness: XV6TestHarness) -> None:
+    """啟動並停止一次 xv6"""
+    if not harness.start():
+        raise RuntimeError("無法啟動 xv6")
+    harness.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比較冷開機與快照還原的開機速度")
+    parser.add_argument("--xv6-path", default="../xv6-riscv")
+    parser.add_argument("--boots", type=int, default=5, help="每種模式的開機次數")
+    args = parser.parse_args()
+
+    cold = XV6TestHarness(xv6_path=args.xv6_path)
+    snap = XV6TestHarness(xv6_path=args.xv6_path, use_snapshot=True)
+
+    # 快照第一次使用時需要冷開機建立，暖身一次把建立成本排除在外
+    cold_samples = measure(lambda: boot_once(cold), args.boots)
+    snap_samples = measure(lambda: boot_once(snap), args.boots, warmup=1)
+
+    cold_summary = summarize(cold_samples)
+    snap_summary = summarize(snap_samples)
+
+    print("=== xv6 開機效能 ===")
+    print_summary("冷開機 (make qemu)", cold_summary)
+    print_summary("快照還原 (-loadvm)", snap_summary)
+
+    cold_rate = 1 / cold_summary["mean"]
+    snap_rate = 1 / snap_summary["mean"]
+    print(f"\n冷開機:   {cold_rate:.2f} boots/sec")
+    print(f"快照還原: {snap_rate:.2f} boots/sec")
+    print(f"加速倍數: {snap_rate / cold_rate:.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,346 @@
+"""
+xv6 非同步測試框架
+以非阻塞 PTY 搭配 asyncio 驅動 QEMU，單一 event loop 即可同時控制大量 VM
+（模糊測試、長時間壓力測試），不需要每個 VM 一條執行緒
+"""
+
+import asyncio
+import codecs
+import os
+import re
+import shutil
+import signal
+import tempfile
+import termios
+import time
+from typing import List, Optional, Pattern, Tuple, Union
+
+from xv6_harness import XV6TestHarness
+from xv6_qemu import build_qemu_command
+from xv6_snapshot import XV6Snapshot
+
+
+class AsyncXV6TestHarness:
+    """xv6 非同步測試框架：介面與 XV6TestHarness 相同，但所有操作都是 coroutine"""
+
+    def __init__(self,
+                 xv6_path: str = "../xv6-riscv",
+                 timeout: int = 30,
+                 debug: bool = False,
+                 use_snapshot: bool = False,
+                 cache_dir: Optional[str] = None):
+        """
+        初始化非同步測試框架
+
+        每個實例都使用自己的 fs.img 複本（或快照複本），多個 VM 可以同時執行
+
+        Args:
+            xv6_path: xv6-riscv 原始碼路徑
+            timeout: 預設命令超時時間（秒）
+            debug: 是否啟用除錯模式（顯示所有互動）
+            use_snapshot: 是否從開機完成的 QEMU 快照還原
+            cache_dir: 快照等快取檔案的存放目錄，None 則使用預設值
+        """
+        self.xv6_path = os.path.abspath(xv6_path)
+        self.timeout = timeout
+        self.debug = debug
+        self.boot_timeout = 60  # 啟動超時時間
+        self.snapshot = XV6Snapshot(self.xv6_path, cache_dir, self.boot_timeout, debug) \
+            if use_snapshot else None
+
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self._master_fd: Optional[int] = None
+        self._work_dir: Optional[str] = None
+        self._buffer = ""
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._data_event: Optional[asyncio.Event] = None
+        self._eof = False
+
+    async def start(self) -> bool:
+        """
+        啟動 xv6 在 QEMU 中
+
+        Returns:
+            bool: 啟動成功返回 True，否則返回 False
+        """
+        try:
+            if not os.path.isfile(os.path.join(self.xv6_path, "kernel", "kernel")):
+                raise FileNotFoundError(
+                    f"xv6 kernel 未編譯，請先執行: cd {self.xv6_path} && make"
+                )
+
+            self._work_dir = tempfile.mkdtemp(prefix="xv6-")
+            if self.snapshot:
+                # 建立快照需要冷開機，放到執行緒中避免阻塞 event loop
+                image = await asyncio.get_running_loop().run_in_executor(
+                    None, self.snapshot.clone, self._work_dir)
+                cmd = self.snapshot.qemu_command(image)
+            else:
+                image = os.path.join(self._work_dir, "fs.img")
+                shutil.copyfile(os.path.join(self.xv6_path, "fs.img"), image)
+                cmd = build_qemu_command(self.xv6_path, drive=image)
+
+            await self._spawn(cmd)
+
+            if self.snapshot:
+                # 從快照還原：送出空行讓 shell 重新印出提示符
+                self._write("\n")
+            await self._expect(re.compile(r"\$ "), self.boot_timeout)
+
+            if self.debug:
+                print("[DEBUG] xv6 啟動成功，shell 已就緒")
+            return True
+
+        except asyncio.TimeoutError:
+            print(f"[ERROR] xv6 啟動超時（{self.boot_timeout}秒）")
+        except EOFError:
+            print("[ERROR] xv6 進程意外終止")
+            print(f"[ERROR] 輸出: {self._buffer}")
+        except Exception as e:
+            print(f"[ERROR] 啟動 xv6 失敗: {e}")
+        await self.stop()
+        return False
+
+    async def _spawn(self, cmd: List[str]) -> None:
+        """在新的 PTY 上執行 QEMU，並向 event loop 註冊非阻塞讀取"""
+        if self.debug:
+            print(f"[DEBUG] 執行命令: {' '.join(cmd)}")
+
+        master, slave = os.openpty()
+        # 關閉 PTY 回顯，QEMU 接手前寫入的內容才不會被重複
+        attrs = termios.tcgetattr(slave)
+        attrs[3] &= ~termios.ECHO
+        termios.tcsetattr(slave, termios.TCSANOW, attrs)
+
+        try:
+            self.process = await asyncio.create_subprocess_exec(
+                *cmd, stdin=slave, stdout=slave, stderr=slave,
+                cwd=self.xv6_path, start_new_session=True)
+        finally:
+            os.close(slave)
+
+        os.set_blocking(master, False)
+        self._master_fd = master
+        # Event 必須在執行中的 event loop 內建立
+        self._data_event = asyncio.Event()
+        self._eof = False
+        self._buffer = ""
+        asyncio.get_running_loop().add_reader(master, self._on_readable)
+
+    def _on_readable(self) -> None:
+        """event loop 回呼：PTY 有資料可讀"""
+        try:
+            data = os.read(self._master_fd, 65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            # 子行程關閉 PTY 時會得到 EIO
+            data = b""
+
+        if not data:
+            self._eof = True
+            asyncio.get_running_loop().remove_reader(self._master_fd)
+        else:
+            self._buffer += self._decoder.decode(data)
+        self._data_event.set()
+
+    def _write(self, text: str) -> None:
+        """寫入 PTY（命令都很短，不會塞滿核心緩衝區）"""
+        os.write(self._master_fd, text.encode())
+
+    async def _expect(self,
+                      pattern: Union[str, Pattern],
+                      timeout: float) -> Tuple[str, str]:
+        """
+        等待字串（字面比對）或已編譯的正規表達式出現
+
+        Args:
+            pattern: 字串或 re.compile() 的結果
+            timeout: 超時時間（秒）
+
+        Returns:
+            Tuple[str, str]: (比對位置之前的內容, 比對到的內容)
+
+        Raises:
+            asyncio.TimeoutError: 超時
+            EOFError: QEMU 已結束
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            if isinstance(pattern, str):
+                index = self._buffer.find(pattern)
+                match = (index, index + len(pattern)) if index >= 0 else None
+            else:
+                found = pattern.search(self._buffer)
+                match = found.span() if found else None
+
+            if match:
+                before = self._buffer[:match[0]]
+                after = self._buffer[match[0]:match[1]]
+                self._buffer = self._buffer[match[1]:]
+                return before, after
+
+            if self._eof:
+                raise EOFError()
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            self._data_event.clear()
+            await asyncio.wait_for(self._data_event.wait(), remaining)
+
+    async def run_command(self,
+                          command: str,
+                          timeout: Optional[int] = None) -> Tuple[bool, str]:
+        """
+        在 xv6 shell 中執行命令並獲取輸出
+
+        Args:
+            command: 要執行的命令
+            timeout: 命令超時時間（秒），None 則使用預設值
+
+        Returns:
+            Tuple[bool, str]: (是否成功, 輸出內容)
+        """
+        return (await self.run_commands([command], timeout))[0]
+
+    async def run_commands(self,
+                           commands: List[str],
+                           timeout: Optional[int] = None) -> List[Tuple[bool, str]]:
+        """
+        批次執行多個命令（與 XV6TestHarness.run_commands 相同的結束標記協定）
+
+        Args:
+            commands: 要執行的命令列表
+            timeout: 每個命令的超時時間（秒），None 則使用預設值
+
+        Returns:
+            List[Tuple[bool, str]]: 每個命令的 (是否成功, 輸出內容)
+        """
+        if not self.process:
+            return [(False, "Error: xv6 未啟動")] * len(commands)
+
+        if timeout is None:
+            timeout = self.timeout
+
+        nonce = os.urandom(4).hex()
+        framed = [(command,) + XV6TestHarness._sentinel(nonce, i)
+                  for i, command in enumerate(commands)]
+        results: List[Tuple[bool, str]] = []
+
+        try:
+            for chunk in XV6TestHarness._chunk_commands(framed):
+                if self.debug:
+                    for command, _, _ in chunk:
+                        print(f"[DEBUG] 執行命令: {command}")
+                self._write("".join(f"{command}\n{marker_cmd}\n"
+                                    for command, marker_cmd, _ in chunk))
+
+                echoes = [line for command, marker_cmd, _ in chunk
+                          for line in (command, marker_cmd)]
+                for command, _, marker in chunk:
+                    before, _ = await self._expect(marker, timeout)
+                    output = XV6TestHarness._clean_framed_output(before, echoes)
+                    if self.debug:
+                        print(f"[DEBUG] 輸出:\n{output}")
+                    results.append((True, output))
+
+                await self._expect("$ ", timeout)
+
+        except asyncio.TimeoutError:
+            results.append((False, f"命令超時: {commands[len(results)]}"))
+        except EOFError:
+            results.append((False, "xv6 進程意外終止"))
+        except Exception as e:
+            results.append((False, f"執行命令失敗: {e}"))
+
+        if len(results) < len(commands) and self.debug:
+            print(f"[DEBUG] {results[-1][1]}")
+
+        results.extend([(False, "批次中斷：先前的命令失敗")] * (len(commands) - len(results)))
+        return results
+
+    async def expect_output(self,
+                            pattern: str,
+                            timeout: Optional[int] = None) -> Tuple[bool, str]:
+        """
+        等待特定輸出模式出現（使用正規表達式）
+
+        Args:
+            pattern: 要匹配的正規表達式模式
+            timeout: 超時時間（秒）
+
+        Returns:
+            Tuple[bool, str]: (是否匹配成功, 匹配到的內容)
+        """
+        if not self.process:
+            return False, "Error: xv6 未啟動"
+
+        if timeout is None:
+            timeout = self.timeout
+
+        try:
+            _, matched = await self._expect(re.compile(pattern), timeout)
+            return True, matched
+        except asyncio.TimeoutError:
+            return False, f"未在 {timeout} 秒內找到模式: {pattern}"
+        except Exception as e:
+            return False, f"等待輸出失敗: {e}"
+
+    async def check_file_exists(self, filename: str) -> bool:
+        """
+        檢查檔案是否存在於 xv6 檔案系統中
+
+        Args:
+            filename: 檔案名稱
+
+        Returns:
+            bool: 檔案存在返回 True
+        """
+        success, output = await self.run_command("ls")
+        if not success:
+            return False
+        return filename in output.split()
+
+    async def stop(self) -> bool:
+        """
+        停止 xv6/QEMU
+
+        Returns:
+            bool: 成功停止返回 True
+        """
+        try:
+            if self._master_fd is not None:
+                if not self._eof:
+                    asyncio.get_running_loop().remove_reader(self._master_fd)
+                os.close(self._master_fd)
+                self._master_fd = None
+
+            if self.process:
+                if self.process.returncode is None:
+                    self.process.send_signal(signal.SIGKILL)
+                await self.process.wait()
+                self.process = None
+
+            if self.debug:
+                print("[DEBUG] xv6 已停止")
+            return True
+
+        except Exception as e:
+            if self.debug:
+                print(f"[DEBUG] 停止 xv6 時發生錯誤: {e}")
+            return False
+
+        finally:
+            if self._work_dir:
+                shutil.rmtree(self._work_dir, ignore_errors=True)
+                self._work_dir = None
+
+    async def __aenter__(self):
+        """支援 async with 語句的上下文管理"""
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """自動清理資源"""
+        await self.stop()
@@ -0,0 +1,265 @@
+"""
+xv6 建置快取模組
+以 xv6 原始碼內容的雜湊值作為鍵值快取 kernel 與 fs.img，
+雜湊相同時直接取用快取，不同時才以平行 make 重新編譯
+
+用法:
+    python src/xv6_build.py                 # 確保 ../xv6-riscv 已建置
+    python src/xv6_build.py --list          # 列出快取內容
+"""
+
+import argparse
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from xv6_qemu import DEFAULT_CACHE_DIR
+
+
+# 納入雜湊計算的原始碼副檔名與檔名
+SOURCE_EXTENSIONS = (".c", ".h", ".S", ".ld", ".pl")
+SOURCE_NAMES = ("Makefile", "README")
+# 由 make 產生、不應納入雜湊的檔案（相對於 xv6 目錄）
+GENERATED_FILES = ("user/usys.S",)
+
+# 建置產物（相對於 xv6 目錄）-> 快取中的檔名
+ARTIFACTS = {
+    "kernel/kernel": "kernel",
+    "fs.img": "fs.img",
+}
+
+# 行程內快取: 檔案 stat 簽章 -> 內容雜湊，避免每次 start() 都重新讀取所有原始碼
+_hash_cache: Dict[str, str] = {}
+
+
+def _file_digest(path: str) -> str:
+    """計算單一檔案的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class XV6BuildManager:
+    """以原始碼雜湊管理 xv6 建置產物的快取"""
+
+    def __init__(self,
+                 xv6_path: str = "../xv6-riscv",
+                 cache_dir: Optional[str] = None,
+                 max_cache_bytes: int = 1 << 30,
+                 jobs: Optional[int] = None,
+                 debug: bool = False):
+        """
+        初始化建置管理器
+
+        Args:
+            xv6_path: xv6-riscv 原始碼路徑
+            cache_dir: 快取目錄，None 則使用預設快取目錄
+            max_cache_bytes: 快取大小上限（位元組），超過時依最久未使用淘汰
+            jobs: make 平行工作數，None 則使用 CPU 核心數
+            debug: 是否啟用除錯模式
+        """
+        self.xv6_path = os.path.abspath(xv6_path)
+        self.cache_dir = os.path.join(cache_dir or DEFAULT_CACHE_DIR, "builds")
+        self.max_cache_bytes = max_cache_bytes
+        self.jobs = jobs or os.cpu_count() or 1
+        self.debug = debug
+
+    def _source_files(self) -> List[str]:
+        """列出納入雜湊計算的原始碼（相對路徑，已排序）"""
+        files = []
+        for root, dirs, names in os.walk(self.xv6_path):
+            dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+            for name in names:
+                if not (name.endswith(SOURCE_EXTENSIONS) or name in SOURCE_NAMES):
+                    continue
+                rel = os.path.relpath(os.path.join(root, name), self.xv6_path)
+                if rel not in GENERATED_FILES:
+                    files.append(rel)
+        return sorted(files)
+
+    def source_hash(self) -> str:
+        """
+        計算 xv6 原始碼的內容雜湊
+
+        Returns:
+            str: SHA-256 十六進位字串
+        """
+        files = self._source_files()
+        stats = []
+        for rel in files:
+            st = os.stat(os.path.join(self.xv6_path, rel))
+            stats.append(f"{rel}:{st.st_size}:{st.st_mtime_ns}")
+        signature = hashlib.sha1("\n".join(stats).encode()).hexdigest()
+        if signature in _hash_cache:
+            return _hash_cache[signature]
+
+        digest = hashlib.sha256()
+        for rel in files:
+            digest.update(rel.encode() + b"\0")
+            with open(os.path.join(self.xv6_path, rel), "rb") as f:
+                digest.update(f.read())
+            digest.update(b"\0")
+        _hash_cache[signature] = digest.hexdigest()
+        return _hash_cache[signature]
+
+    def _entry_dir(self, source_hash: str) -> str:
+        """快取項目目錄"""
+        return os.path.join(self.cache_dir, source_hash)
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """以檔案鎖保護快取，避免平行 worker 同時建置或淘汰"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(os.path.join(self.cache_dir, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _read_meta(self, entry: str) -> Optional[Dict]:
+        """讀取快取項目的 meta.json，項目不完整時返回 None"""
+        try:
+            with open(os.path.join(entry, "meta.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, entry: str, meta: Dict) -> None:
+        """寫入快取項目的 meta.json"""
+        with open(os.path.join(entry, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+
+    def ensure_built(self) -> Optional[str]:
+        """
+        確保 xv6 目錄中的 kernel 與 fs.img 對應目前的原始碼
+
+        快取命中時直接把產物複製回 xv6 目錄；未命中時以 make -j 編譯並存入快取
+
+        Returns:
+            Optional[str]: 原始碼雜湊（可用來標記測試結果屬於哪個建置），失敗返回 None
+        """
+        source_hash = self.source_hash()
+        with self._locked():
+            entry = self._entry_dir(source_hash)
+            meta = self._read_meta(entry)
+            if meta is not None:
+                if self.debug:
+                    print(f"[DEBUG] 建置快取命中: {source_hash[:12]}")
+                self._restore(entry, meta)
+            else:
+                if self.debug:
+                    print(f"[DEBUG] 建置快取未命中，重新編譯: {source_hash[:12]}")
+                if not self._build():
+                    return None
+                meta = self._store(entry, source_hash)
+
+            meta["last_used"] = time.time()
+            self._write_meta(entry, meta)
+            self._evict(keep=source_hash)
+        return source_hash
+
+    def _build(self) -> bool:
+        """以平行 make 編譯 kernel 與 fs.img"""
+        result = subprocess.run(
+            ["make", "-C", self.xv6_path, f"-j{self.jobs}"] + list(ARTIFACTS),
+            capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            print(f"[ERROR] xv6 編譯失敗:\n{result.stdout[-2000:]}{result.stderr[-2000:]}")
+            return False
+        return True
+
+    def _store(self, entry: str, source_hash: str) -> Dict:
+        """把編譯產物存入快取（先寫暫存目錄再改名）"""
+        tmp_entry = f"{entry}.{os.getpid()}.tmp"
+        os.makedirs(tmp_entry, exist_ok=True)
+
+        digests = {}
+        for rel, name in ARTIFACTS.items():
+            src = os.path.join(self.xv6_path, rel)
+            # copy2 保留修改時間，還原後快照與 QEMU 命令列快取的鍵值不會改變
+            shutil.copy2(src, os.path.join(tmp_entry, name))
+            digests[name] = _file_digest(src)
+
+        meta = {"source_hash": source_hash, "digests": digests,
+                "created": time.time(), "last_used": time.time()}
+        self._write_meta(tmp_entry, meta)
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(tmp_entry, entry)
+        return meta
+
+    def _restore(self, entry: str, meta: Dict) -> None:
+        """把快取的產物複製回 xv6 目錄（內容相同的檔案不重複複製）"""
+        for rel, name in ARTIFACTS.items():
+            dest = os.path.join(self.xv6_path, rel)
+            if os.path.isfile(dest) and _file_digest(dest) == meta["digests"][name]:
+                continue
+            shutil.copy2(os.path.join(entry, name), dest)
+
+    def entries(self) -> List[Tuple[str, int, float]]:
+        """
+        列出快取項目
+
+        Returns:
+            List[Tuple[str, int, float]]: (原始碼雜湊, 大小位元組, 最後使用時間)，最近使用的在前
+        """
+        result = []
+        if not os.path.isdir(self.cache_dir):
+            return result
+        for name in os.listdir(self.cache_dir):
+            entry = os.path.join(self.cache_dir, name)
+            meta = self._read_meta(entry)
+            if meta is None:
+                continue
+            size = sum(os.path.getsize(os.path.join(entry, f)) for f in os.listdir(entry))
+            result.append((name, size, meta.get("last_used", 0.0)))
+        return sorted(result, key=lambda item: item[2], reverse=True)
+
+    def _evict(self, keep: str) -> None:
+        """依最久未使用（LRU）淘汰快取項目，直到總大小低於上限"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for name, size, _ in reversed(entries):
+            if total <= self.max_cache_bytes:
+                break
+            if name == keep:
+                continue
+            if self.debug:
+                print(f"[DEBUG] 淘汰建置快取: {name[:12]}")
+            shutil.rmtree(self._entry_dir(name), ignore_errors=True)
+            total -= size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="以內容雜湊快取 xv6 建置產物")
+    parser.add_argument("--xv6-path", default="../xv6-riscv")
+    parser.add_argument("--list", action="store_true", help="列出快取內容")
+    parser.add_argument("--max-cache-mb", type=int, default=1024, help="快取大小上限（MB）")
+    args = parser.parse_args()
+
+    manager = XV6BuildManager(args.xv6_path, max_cache_bytes=args.max_cache_mb << 20, debug=True)
+    if args.list:
+        for name, size, last_used in manager.entries():
+            print(f"{name[:12]}  {size / (1 << 20):7.1f} MB  "
+                  f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(last_used))}")
+        return 0
+
+    source_hash = manager.ensure_built()
+    if source_hash is None:
+        return 1
+    print(f"xv6 建置: {source_hash[:12]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+"""
+xv6 console 紀錄模組
+取代逐行 print 的除錯輸出：每個框架實例把 console 收發的原始內容連同時間戳記
+存進固定大小的環狀緩衝區，並串流寫入每個測試各自的 gzip 壓縮日誌，
+測試失敗時只把最後一段 console 內容附加到報告中
+"""
+
+import gzip
+import itertools
+import json
+import os
+import re
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Dict, List, Optional, Set, Tuple
+
+from xv6_metrics import current_test
+
+
+# 每個實例環狀緩衝區保留的字元數
+DEFAULT_RING_CHARS = 256 * 1024
+
+# gzip 壓縮等級（日誌以寫入速度為優先）
+COMPRESS_LEVEL = 1
+
+# 紀錄方向：讀到的 console 輸出、送出的輸入、框架的註記
+READ, SENT, NOTE = "<", ">", "#"
+
+# 所有實例（附加失敗報告時依測試尋找）
+_logs: "weakref.WeakSet[ConsoleLog]" = weakref.WeakSet()
+_lock = threading.Lock()
+_ids = itertools.count(1)
+_spool_dir: Optional[str] = None
+# 這個階段已開啟過的日誌路徑：第一次開啟時覆寫，之後才附加（編號每個階段從 1 開始，
+# 檔名會與先前階段的日誌相同）
+_opened: Set[str] = set()
+
+
+def configure(spool_dir: Optional[str]) -> None:
+    """
+    設定每個測試的 gzip 日誌目錄
+
+    Args:
+        spool_dir: 日誌目錄，None 則只保留環狀緩衝區
+    """
+    global _spool_dir
+    if spool_dir:
+        os.makedirs(spool_dir, exist_ok=True)
+    with _lock:
+        _opened.clear()
+    _spool_dir = spool_dir
+
+
+def _safe_name(test: str) -> str:
+    """把測試 node id 轉成檔名"""
+    return re.sub(r"[^\w.-]+", "_", test).strip("_") or "session"
+
+
+class _Channel:
+    """pexpect 的 logfile_read / logfile_send：寫入 ConsoleLog 並轉送給其他類檔案物件"""
+
+    def __init__(self, log: "ConsoleLog", direction: str, others: Tuple):
+        self._log = log
+        self._direction = direction
+        self._others = others
+
+    def write(self, data) -> None:
+        for other in self._others:
+            other.write(data)
+        if isinstance(data, bytes):
+            data = data.decode("utf-8", "replace")
+        self._log.record(self._direction, data)
+
+    def flush(self) -> None:
+        pass
+
+
+class ConsoleLog:
+    """
+    單一框架實例的 console 紀錄
+
+    每筆紀錄是 (時間, 方向, 內容, 測試)；環狀緩衝區超過 ring_chars 時丟棄最舊的紀錄。
+    以 configure() 設定目錄後，紀錄同時寫入目前測試的
+    <目錄>/<測試>.<實例編號>.log.gz，每行是 "秒數 方向 JSON 字串"
+    """
+
+    def __init__(self, ring_chars: int = DEFAULT_RING_CHARS):
+        """
+        Args:
+            ring_chars: 環狀緩衝區保留的字元數
+        """
+        self.id = next(_ids)
+        self.ring_chars = ring_chars
+        self._ring: deque = deque()
+        self._ring_length = 0
+        self._started = time.time()
+        self._spool = None
+        self._spool_test: Optional[str] = None
+        self.spool_paths: Dict[str, str] = {}  # 測試 -> 日誌路徑
+        with _lock:
+            _logs.add(self)
+
+    def channel(self, direction: str, *others) -> _Channel:
+        """
+        建立可設為 pexpect logfile_read / logfile_send 的類檔案物件
+
+        Args:
+            direction: READ 或 SENT
+            *others: 同時要寫入的其他類檔案物件（例如 ByteCounter）
+        """
+        return _Channel(self, direction, others)
+
+    def record(self, direction: str, text: str) -> None:
+        """
+        記錄一段 console 內容
+
+        Args:
+            direction: READ、SENT 或 NOTE
+            text: 內容
+        """
+        if not text:
+            return
+        now = time.time()
+        test = current_test.get()
+        self._ring.append((now, direction, text, test))
+        self._ring_length += len(text)
+        while self._ring_length > self.ring_chars and len(self._ring) > 1:
+            self._ring_length -= len(self._ring.popleft()[2])
+
+        if _spool_dir and test:
+            if test != self._spool_test:
+                self._open_spool(test)
+            self._spool.write(f"{now - self._started:.6f} {direction} "
+                              f"{json.dumps(text, ensure_ascii=False)}\n")
+
+    def note(self, message: str) -> None:
+        """記錄框架的註記（取代除錯用的 print）"""
+        self.record(NOTE, message + "\n")
+
+    def _open_spool(self, test: str) -> None:
+        """
+        切換到另一個測試的日誌檔：這個階段第一次開啟時覆寫先前階段留下的同名檔案，
+        同一個測試再次使用時以新的 gzip 成員附加
+        """
+        self.close_spool()
+        path = os.path.join(_spool_dir, f"{_safe_name(test)}.{self.id}.log.gz")
+        with _lock:
+            mode = "at" if path in _opened else "wt"
+            _opened.add(path)
+        self._spool = gzip.open(path, mode, encoding="utf-8", compresslevel=COMPRESS_LEVEL)
+        self._spool_test = test
+        self.spool_paths[test] = path
+
+    def close_spool(self) -> None:
+        """關閉目前的日誌檔"""
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
+            self._spool_test = None
+
+    def entries(self, test: Optional[str] = None) -> List[Tuple[float, str, str, str]]:
+        """
+        環狀緩衝區中的紀錄
+
+        Args:
+            test: 只取這個測試期間的紀錄，None 則取全部
+        """
+        return [entry for entry in list(self._ring) if test is None or entry[3] == test]
+
+    def tail(self, max_chars: int, test: Optional[str] = None, since: Optional[float] = None) -> str:
+        """
+        最後一段 console 畫面（讀到的輸出與框架註記，換行已正規化）
+
+        Args:
+            max_chars: 最多返回的字元數
+            test: 只取這個測試期間的紀錄，None 則取全部
+            since: 只取這個時間（time.time()）之後的紀錄，None 則不限
+
+        Returns:
+            str: console 內容
+        """
+        parts: List[str] = []
+        length = 0
+        for timestamp, direction, text, _ in reversed(self.entries(test)):
+            if since is not None and timestamp < since:
+                break
+            if direction == SENT:
+                continue
+            if direction == NOTE:
+                text = f"[harness] {text}"
+            parts.append(text)
+            length += len(text)
+            if length >= max_chars:
+                break
+        return "".join(reversed(parts)).replace("\r\n", "\n")[-max_chars:]
+
+
+def logs_for_test(test: str) -> List[ConsoleLog]:
+    """在這個測試期間有紀錄的實例"""
+    with _lock:
+        logs = list(_logs)
+    return sorted((log for log in logs if log.entries(test) or test in log.spool_paths),
+                  key=lambda log: log.id)
+
+
+def close_spools(test: str) -> List[str]:
+    """
+    測試結束：關閉這個測試的日誌檔
+
+    Returns:
+        List[str]: 這個測試的日誌路徑
+    """
+    with _lock:
+        logs = list(_logs)
+    paths = []
+    for log in logs:
+        if log._spool_test == test:
+            log.close_spool()
+        if test in log.spool_paths:
+            paths.append(log.spool_paths.pop(test))
+    return paths
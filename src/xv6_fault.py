@@ -0,0 +1,292 @@
+"""
+xv6 kernel 錯誤偵測模組
+每次從 console 讀到輸出時逐段掃描 panic 與 usertrap 訊息，整理成 KernelFault；
+訊息必須位於行首，且不是輸入的回顯（echo panic: x 或 cat kernel/trap.c 不算錯誤）。
+panic 之後 kernel 停止，不會再有任何輸出：panic 訊息之後還有輸出就只是一般的命令輸出，
+安靜 PANIC_SETTLE 秒之後才算確定。
+harness 等待命令輸出時同時等待錯誤訊息的開頭，確定是錯誤時立即讓命令失敗，而不是等到超時。
+也記錄最後一次輸出的時間，供 harness 判斷沒有輸出的卡住
+
+用法:
+    success, output = xv6.run_command("usertests", timeout=300)
+    if not success and xv6.last_fault:
+        print(xv6.last_fault.kind, xv6.last_fault.registers, xv6.last_fault.commands)
+"""
+
+import re
+import time
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+# kernel 錯誤訊息（kernel/printf.c 的 panic() 與 kernel/trap.c 的 usertrap()），
+# 都要求位於行首且訊息行已經完整（讀到換行），暫存器不會被截斷
+FAULT_PATTERNS = {
+    "panic": re.compile(r"(?m)^panic: ([^\r\n]*)\r?\n"),
+    "usertrap": re.compile(r"(?m)^usertrap\(\): unexpected scause (0x[0-9a-fA-F]+) pid=(\d+)\r?\n"
+                           r"\s*sepc=(0x[0-9a-fA-F]+) stval=(0x[0-9a-fA-F]+)\r?\n"),
+}
+# 錯誤訊息的開頭（harness 與結束標記一起以字面比對等待）。只用來及早喚醒：
+# 串流模式逐行比對時行首的換行已被取走，無法在字面比對中要求行首；
+# 是否位於行首、是否為回顯由 FaultWatcher 判斷
+TRIGGERS = {
+    "panic": "panic: ",
+    "usertrap": "usertrap(): ",
+}
+# kerneltrap() 在 panic 之前印出的暫存器："scause=0x%lx sepc=0x%lx stval=0x%lx"
+REGISTER_PATTERN = re.compile(r"\b(scause|sepc|stval)[= ](0x[0-9a-fA-F]+)")
+
+# 預設讓命令立即失敗的錯誤種類；usertests 會刻意觸發 usertrap，執行它時應只保留 "panic"
+DEFAULT_FATAL_FAULTS = ("panic", "usertrap")
+# 掃描時保留的輸出長度（錯誤訊息與前面的暫存器行跨越多次讀取時仍能比對）
+SCAN_WINDOW = 1024
+# KernelFault 附帶的最近命令數
+LAST_COMMANDS = 8
+# 等待回顯的命令數上限（run_commands() 一個區塊的命令會一起回顯）
+ECHO_LINES = 64
+# panic 訊息之後這麼多秒沒有任何輸出才算確定（之後還有輸出表示 kernel 仍在執行）
+PANIC_SETTLE = 0.5
+
+
+class KernelFault(Exception):
+    """
+    kernel 錯誤或卡住
+
+    Attributes:
+        kind: "panic"、"usertrap" 或 "hang"（超過 silence_timeout 沒有輸出）
+        message: 錯誤訊息
+        registers: scause、sepc、stval（有印出時）
+        commands: 發生前最後執行的命令（由舊到新）
+        console: 錯誤前後的 console 輸出
+        offset: 錯誤訊息在 console 輸出中的位置（自 reset() 起的字元數），卡住時為 None
+    """
+
+    def __init__(self,
+                 kind: str,
+                 message: str,
+                 registers: Optional[Dict[str, str]] = None,
+                 commands: Sequence[str] = (),
+                 console: str = "",
+                 offset: Optional[int] = None):
+        super().__init__(f"{kind}: {message}")
+        self.kind = kind
+        self.message = message
+        self.registers = registers or {}
+        self.commands = tuple(commands)
+        self.console = console
+        self.offset = offset
+
+    def as_dict(self) -> Dict:
+        """可序列化成 JSON 的內容"""
+        return {"kind": self.kind, "message": self.message, "registers": self.registers,
+                "commands": list(self.commands), "console": self.console}
+
+
+class FaultWatcher:
+    """
+    串接在 pexpect 的 logfile_read：每次讀取時掃描錯誤訊息
+
+    致命的錯誤保留在 pending，由 harness 取出並讓命令失敗；
+    讀取端本身不拋出例外，pexpect 的緩衝區與比對不受影響
+    """
+
+    def __init__(self, forward=None, fatal: Sequence[str] = DEFAULT_FATAL_FAULTS):
+        """
+        Args:
+            forward: 同時寫入的類檔案物件（例如 ConsoleLog 的 channel）
+            fatal: 讓命令立即失敗的錯誤種類，其他種類只記錄在 faults
+        """
+        self.forward = forward
+        self.fatal = set(fatal)
+        self.faults: List[KernelFault] = []
+        self.pending: Optional[KernelFault] = None
+        self.last_output = time.monotonic()
+        self._commands: deque = deque(maxlen=LAST_COMMANDS)
+        self._echoes: deque = deque(maxlen=ECHO_LINES)  # 已送出、尚未看到回顯的命令
+        self._window = ""
+        self._line_start = True  # _window 是否從行首開始
+        # 最後記錄、之後還沒有輸出的 panic 與它取代的待處理錯誤
+        self._unsettled: Optional[Tuple[KernelFault, Optional[KernelFault]]] = None
+        self.position = 0   # 自 reset() 起讀到的字元數
+
+    def reset(self, forward=None) -> None:
+        """VM 重新啟動或還原後清除錯誤狀態"""
+        if forward is not None:
+            self.forward = forward
+        self.pending = None
+        self.last_output = time.monotonic()
+        self._echoes.clear()
+        self._window = ""
+        self._line_start = True
+        self._unsettled = None
+        self.position = 0
+
+    def command(self, command: str) -> None:
+        """記錄送出的命令（console 回顯這一行時不會被當成錯誤訊息）"""
+        self._commands.append(command)
+        self._echoes.append(command.strip())
+
+    @property
+    def commands(self) -> Tuple[str, ...]:
+        return tuple(self._commands)
+
+    @property
+    def triggers(self) -> Dict[str, str]:
+        """致命錯誤種類 -> 訊息開頭"""
+        return {kind: text for kind, text in TRIGGERS.items() if kind in self.fatal}
+
+    def silent_for(self) -> float:
+        """距離最後一次讀到輸出的秒數"""
+        return time.monotonic() - self.last_output
+
+    def write(self, data) -> None:
+        if self.forward is not None:
+            self.forward.write(data)
+        if not data:
+            return
+        self.last_output = time.monotonic()
+        # panic 之後 kernel 已停止：還有輸出表示那一行只是一般的命令輸出
+        if self._unsettled is not None:
+            self._retract(*self._unsettled)
+
+        base = self.position - len(self._window)
+        self.position += len(data)
+        text = self._window + data
+        consumed = 0
+        found = []
+        for kind, pattern in FAULT_PATTERNS.items():
+            for match in pattern.finditer(text):
+                if match.start() == 0 and not self._line_start:
+                    continue
+                consumed = max(consumed, match.end())
+                line = match.group(0).split("\n", 1)[0].strip()
+                if line in self._echoes:
+                    # 輸入的回顯，不是 kernel 的輸出
+                    self._echoes.remove(line)
+                    continue
+                if kind == "panic" and match.end() < len(text):
+                    continue
+                found.append((match.start(), kind, match))
+        for start, kind, match in sorted(found, key=lambda item: item[0]):
+            self._record(kind, match, text[:start], base + start)
+
+        # 已比對的訊息不再保留，避免重複記錄；記住保留的視窗是否從行首開始
+        rest = text[consumed:]
+        cut = max(0, len(rest) - SCAN_WINDOW)
+        if cut:
+            self._line_start = rest[cut - 1] == "\n"
+        elif consumed:
+            self._line_start = True
+        self._window = rest[cut:]
+
+    def _retract(self, fault: KernelFault, replaced: Optional[KernelFault]) -> None:
+        """撤回後來確定不是 kernel 錯誤的 panic，恢復它取代的待處理錯誤"""
+        self._unsettled = None
+        if self.pending is fault:
+            self.pending = replaced
+        if fault in self.faults:
+            self.faults.remove(fault)
+
+    def awaiting(self) -> bool:
+        """
+        掃描視窗的結尾是否可能是還沒讀完的致命錯誤訊息（行首是錯誤訊息的開頭）
+
+        Returns:
+            bool: 需要再讀取才能判斷時為 True
+        """
+        lines = self._window.split("\n")
+        tail = lines[-1]
+        if tail and (len(lines) > 1 or self._line_start):
+            if any(text.startswith(tail) or tail.startswith(text)
+                   for text in self.triggers.values()):
+                return True
+        # usertrap 的訊息有兩行
+        return "usertrap" in self.fatal and len(lines) >= 2 and \
+            (len(lines) > 2 or self._line_start) and lines[-2].startswith(TRIGGERS["usertrap"])
+
+    def confirmed(self) -> Optional[KernelFault]:
+        """
+        已確定的待處理致命錯誤（不取出）
+
+        Returns:
+            Optional[KernelFault]: panic 要在訊息之後 PANIC_SETTLE 秒沒有任何輸出才算確定；
+                                   沒有或尚未確定時為 None
+        """
+        fault = self.pending
+        if fault is not None and fault.kind == "panic" and self.silent_for() < PANIC_SETTLE:
+            return None
+        return fault
+
+    def settle_time(self) -> Optional[float]:
+        """
+        距離待處理的 panic 確定還要等待的秒數
+
+        Returns:
+            Optional[float]: 秒數，沒有尚未確定的 panic 時為 None
+        """
+        if self.pending is None or self.pending.kind != "panic":
+            return None
+        return max(0.0, PANIC_SETTLE - self.silent_for())
+
+    def _record(self, kind: str, match: "re.Match", before: str, offset: int) -> None:
+        if kind == "usertrap":
+            scause, pid, sepc, stval = match.groups()
+            message = f"unexpected scause {scause} pid={pid}"
+            registers = {"scause": scause, "sepc": sepc, "stval": stval}
+        else:
+            message = match.group(1).strip()
+            # kerneltrap() 的暫存器行緊接在 panic 之前
+            registers = dict(REGISTER_PATTERN.findall(before[-200:]))
+        fault = KernelFault(kind, message, registers, self.commands,
+                            (before + match.group(0))[-SCAN_WINDOW:].replace("\r\n", "\n"), offset)
+        self.faults.append(fault)
+        if kind == "panic":
+            self._unsettled = (fault, self.pending)
+        # panic 取代尚未處理的其他錯誤（kernel 已停止，之後只會看到 panic）
+        if kind in self.fatal and (self.pending is None or
+                                   kind == "panic" and self.pending.kind != "panic"):
+            self.pending = fault
+
+    def begin(self) -> None:
+        """
+        命令開始前呼叫：kernel 已經 panic 時不必送出命令
+
+        Raises:
+            KernelFault: 已確定、尚未 reset() 的 panic
+        """
+        fault = self.confirmed()
+        if fault is not None and fault.kind == "panic":
+            raise fault
+
+    def take(self) -> Optional[KernelFault]:
+        """
+        取出待處理的致命錯誤
+
+        panic 之後 kernel 已停止，錯誤保留到 reset()，之後的命令都會立即失敗；
+        usertrap 只結束了該行程，取出後即清除
+
+        Returns:
+            Optional[KernelFault]: 錯誤，沒有則為 None
+        """
+        fault = self.pending
+        if fault is not None and fault.kind != "panic":
+            self.pending = None
+        return fault
+
+    def incomplete(self, kind: str) -> KernelFault:
+        """錯誤訊息開頭出現後沒有等到完整訊息時的錯誤"""
+        fault = KernelFault(kind, "訊息不完整", {}, self.commands,
+                            self._window[-SCAN_WINDOW:].replace("\r\n", "\n"))
+        self.faults.append(fault)
+        return fault
+
+    def hang(self, timeout: float) -> KernelFault:
+        """建立沒有輸出的卡住錯誤"""
+        fault = KernelFault("hang", f"{timeout:g} 秒沒有任何輸出", {}, self.commands,
+                            self._window[-SCAN_WINDOW:].replace("\r\n", "\n"))
+        self.faults.append(fault)
+        return fault
+
+    def flush(self) -> None:
+        if self.forward is not None:
+            self.forward.flush()
@@ -0,0 +1,279 @@
+"""
+xv6 檔案系統映像讀取模組
+在主機端以 mmap 直接解析 xv6 的 fs.img（superblock、inode、目錄項與資料區塊），
+VM 停止或閒置在 shell 提示符時即可讀取檔案內容，不必透過 console 逐一 cat
+
+格式對應 xv6-riscv 的 kernel/fs.h 與 kernel/log.c
+"""
+
+import mmap
+import posixpath
+import struct
+from collections import namedtuple
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+# kernel/fs.h 與 kernel/param.h
+BSIZE = 1024                    # 區塊大小
+FSMAGIC = 0x10203040            # superblock magic
+ROOTINO = 1                     # 根目錄 inode 編號
+NDIRECT = 12                    # 直接區塊數
+NINDIRECT = BSIZE // 4          # 間接區塊可容納的區塊數
+DIRSIZ = 14                     # 目錄項檔名長度上限
+MAXFILE = NDIRECT + NINDIRECT   # 單一檔案的區塊數上限
+
+# kernel/stat.h
+T_DIR = 1
+T_FILE = 2
+T_DEVICE = 3
+
+# struct superblock: magic, size, nblocks, ninodes, nlog, logstart, inodestart, bmapstart
+SUPERBLOCK = struct.Struct("<8I")
+# struct dinode: short type, major, minor, nlink; uint size; uint addrs[NDIRECT+1]
+DINODE = struct.Struct(f"<4hI{NDIRECT + 1}I")
+# struct dirent: ushort inum; char name[DIRSIZ]
+DIRENT = struct.Struct(f"<H{DIRSIZ}s")
+ADDR = struct.Struct("<I")
+
+IPB = BSIZE // DINODE.size     # 每個區塊的 inode 數
+
+SuperBlock = namedtuple("SuperBlock", "magic size nblocks ninodes nlog logstart inodestart bmapstart")
+Inode = namedtuple("Inode", "inum type major minor nlink size addrs")
+
+
+class XV6FileSystem:
+    """以 mmap 唯讀解析 xv6 fs.img"""
+
+    def __init__(self, image_path: str, replay_log: bool = True):
+        """
+        開啟 fs.img
+
+        Args:
+            image_path: raw 格式的 fs.img 路徑
+            replay_log: 是否套用日誌中已提交但尚未寫回的區塊
+                        （VM 在交易寫回途中被終止時，xv6 下次開機會重播日誌）
+
+        Raises:
+            ValueError: 不是 xv6 檔案系統映像
+        """
+        self.image_path = image_path
+        with open(image_path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+        if len(self._view) < 2 * BSIZE:
+            self.close()
+            raise ValueError(f"映像太小，不是 xv6 檔案系統: {image_path}")
+        self.superblock = SuperBlock(*SUPERBLOCK.unpack_from(self._view, BSIZE))
+        if self.superblock.magic != FSMAGIC:
+            self.close()
+            raise ValueError(f"superblock magic 不符（0x{self.superblock.magic:08x}）: {image_path}")
+
+        # 區塊編號 -> 日誌中的區塊編號
+        self._log_blocks: Dict[int, int] = self._read_log() if replay_log else {}
+
+    def _read_log(self) -> Dict[int, int]:
+        """讀取日誌標頭（struct logheader: int n; int block[LOGSIZE]）"""
+        logstart = self.superblock.logstart
+        if self.superblock.nlog == 0:
+            return {}
+        (count,) = ADDR.unpack_from(self._view, logstart * BSIZE)
+        count = min(count, self.superblock.nlog - 1)
+        return {ADDR.unpack_from(self._view, logstart * BSIZE + 4 * (i + 1))[0]: logstart + 1 + i
+                for i in range(count)}
+
+    def block(self, blockno: int) -> memoryview:
+        """
+        取得區塊內容（零複製）
+
+        Args:
+            blockno: 區塊編號
+
+        Returns:
+            memoryview: 長度 BSIZE 的唯讀切片
+        """
+        blockno = self._log_blocks.get(blockno, blockno)
+        return self._view[blockno * BSIZE:(blockno + 1) * BSIZE]
+
+    def inode(self, inum: int) -> Inode:
+        """
+        讀取 inode
+
+        Args:
+            inum: inode 編號
+
+        Returns:
+            Inode: inode 內容（type 為 0 表示未使用）
+        """
+        if not 0 < inum < self.superblock.ninodes:
+            raise ValueError(f"inode 編號超出範圍: {inum}")
+        data = self.block(self.superblock.inodestart + inum // IPB)
+        fields = DINODE.unpack_from(data, (inum % IPB) * DINODE.size)
+        return Inode(inum, *fields[:5], fields[5:])
+
+    def _data_blocks(self, inode: Inode) -> List[int]:
+        """依序列出 inode 的資料區塊編號（對應 kernel/fs.c 的 bmap）"""
+        count = (inode.size + BSIZE - 1) // BSIZE
+        blocks = list(inode.addrs[:min(count, NDIRECT)])
+        if count > NDIRECT:
+            indirect = self.block(inode.addrs[NDIRECT])
+            blocks.extend(ADDR.unpack_from(indirect, 4 * i)[0]
+                          for i in range(min(count - NDIRECT, NINDIRECT)))
+        return blocks
+
+    def iter_chunks(self, inode: Inode) -> Iterator[memoryview]:
+        """
+        依序產生 inode 資料內容的 memoryview 片段（零複製）
+
+        Args:
+            inode: 要讀取的 inode
+
+        Yields:
+            memoryview: 每個資料區塊中屬於檔案的部分
+        """
+        remaining = inode.size
+        for blockno in self._data_blocks(inode):
+            chunk = min(remaining, BSIZE)
+            # 區塊編號 0 表示尚未配置（稀疏），xv6 讀取時會得到零
+            yield self.block(blockno)[:chunk] if blockno else memoryview(bytes(chunk))
+            remaining -= chunk
+
+    def read_inode(self, inode: Inode) -> bytes:
+        """讀取 inode 的完整內容"""
+        return b"".join(self.iter_chunks(inode))
+
+    def readdir(self, inode: Inode) -> List[Tuple[str, int]]:
+        """
+        列出目錄項
+
+        Args:
+            inode: 目錄的 inode
+
+        Returns:
+            List[Tuple[str, int]]: (檔名, inode 編號)，包含 "." 與 ".."，不含已刪除的項目
+        """
+        if inode.type != T_DIR:
+            raise NotADirectoryError(f"inode {inode.inum} 不是目錄")
+        entries = []
+        for chunk in self.iter_chunks(inode):
+            for offset in range(0, len(chunk) - DIRENT.size + 1, DIRENT.size):
+                inum, name = DIRENT.unpack_from(chunk, offset)
+                if inum:
+                    entries.append((name.split(b"\0", 1)[0].decode("utf-8", "replace"), inum))
+        return entries
+
+    def lookup(self, path: str) -> Optional[Inode]:
+        """
+        依路徑找到 inode（路徑以根目錄為基準）
+
+        Args:
+            path: 例如 "/README" 或 "dir/file"
+
+        Returns:
+            Optional[Inode]: 找不到時返回 None
+        """
+        inode = self.inode(ROOTINO)
+        for name in path.split("/"):
+            if not name:
+                continue
+            if inode.type != T_DIR:
+                return None
+            # xv6 比對檔名時只看前 DIRSIZ 個字元
+            name = name[:DIRSIZ]
+            inum = next((i for n, i in self.readdir(inode) if n == name), None)
+            if inum is None:
+                return None
+            inode = self.inode(inum)
+        return inode
+
+    def exists(self, path: str) -> bool:
+        """檢查路徑是否存在"""
+        return self.lookup(path) is not None
+
+    def read_file(self, path: str) -> bytes:
+        """
+        讀取檔案內容
+
+        Args:
+            path: 檔案路徑
+
+        Returns:
+            bytes: 檔案內容
+
+        Raises:
+            FileNotFoundError: 檔案不存在
+            IsADirectoryError: 路徑是目錄
+        """
+        inode = self.lookup(path)
+        if inode is None:
+            raise FileNotFoundError(path)
+        if inode.type == T_DIR:
+            raise IsADirectoryError(path)
+        return self.read_inode(inode)
+
+    def listdir(self, path: str = "/") -> List[str]:
+        """
+        列出目錄中的檔名（不含 "." 與 ".."）
+
+        Raises:
+            FileNotFoundError: 目錄不存在
+            NotADirectoryError: 路徑不是目錄
+        """
+        inode = self.lookup(path)
+        if inode is None:
+            raise FileNotFoundError(path)
+        return [name for name, _ in self.readdir(inode) if name not in (".", "..")]
+
+    def walk(self, path: str = "/") -> Iterator[Tuple[str, List[str], List[str]]]:
+        """
+        以 os.walk 的形式走訪目錄樹
+
+        Yields:
+            Tuple[str, List[str], List[str]]: (目錄路徑, 子目錄名稱, 其他檔名)
+        """
+        inode = self.lookup(path)
+        if inode is None:
+            raise FileNotFoundError(path)
+        pending = [(posixpath.join("/", path.strip("/")), inode)]
+        while pending:
+            dirpath, inode = pending.pop()
+            dirnames, filenames = [], []
+            for name, inum in self.readdir(inode):
+                if name in (".", ".."):
+                    continue
+                child = self.inode(inum)
+                if child.type == T_DIR:
+                    dirnames.append(name)
+                    pending.append((posixpath.join(dirpath, name), child))
+                else:
+                    filenames.append(name)
+            yield dirpath, dirnames, filenames
+
+    def tree(self, path: str = "/") -> Dict[str, bytes]:
+        """
+        讀取目錄樹中所有一般檔案
+
+        Returns:
+            Dict[str, bytes]: 絕對路徑 -> 檔案內容
+        """
+        files = {}
+        for dirpath, _, filenames in self.walk(path):
+            for name in filenames:
+                full = posixpath.join(dirpath, name)
+                inode = self.lookup(full)
+                if inode.type == T_FILE:
+                    files[full] = self.read_inode(inode)
+        return files
+
+    def close(self) -> None:
+        """釋放 mmap（之前取得的 memoryview 必須先釋放）"""
+        if self._mmap is not None:
+            self._view.release()
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,574 @@
+"""
+xv6 shell 模糊測試引擎
+依文法產生 shell 命令序列（重導向、管線、序列、路徑、參數數量、檔名字元集），
+保留產生新行為的輸入作為語料庫並加以變異，以多個 VM 平行執行，
+kernel panic 時立即中止該案例並保存重現輸入
+
+用法:
+    python src/xv6_fuzz.py --workers 4 --duration 600
+    python src/xv6_fuzz.py --workers 2 --cases 500 --corpus fuzz/corpus --crashes fuzz/crashes
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import string
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from xv6_fs import DIRSIZ
+from xv6_pool import XV6HarnessPool
+
+
+# xv6 sh 的輸入緩衝區是 100 個字元（user/sh.c getcmd），產生的命令行不超過這個長度
+MAX_LINE = 90
+# 每個案例的命令數上限
+MAX_CASE_LINES = 8
+
+# 程式 -> (最少, 最多) 參數數量；不會長時間執行或需要互動的程式
+PROGRAMS: Dict[str, Tuple[int, int]] = {
+    "echo": (0, 6),
+    "cat": (1, 3),
+    "ls": (0, 2),
+    "rm": (1, 3),
+    "mkdir": (1, 2),
+    "ln": (2, 2),
+    "wc": (1, 3),
+    "grep": (2, 3),
+    "sleep": (1, 1),
+}
+# 沒有檔案參數時會讀取標準輸入的程式（不在管線右側時會吃掉後續的 console 輸入）
+STDIN_READERS = {"cat": 0, "wc": 0, "grep": 1}   # 程式 -> 非檔案參數的數量
+
+# shell 運算子（user/sh.c 的 symbols 與 ">>"）
+OPERATORS = {"|", ";", "&", "<", ">", ">>", "(", ")"}
+REDIRECTS = ("<", ">", ">>")
+
+# 檔名字元集
+NAME_ALPHABETS = (
+    string.ascii_lowercase,
+    string.ascii_lowercase + string.digits,
+    string.ascii_letters + string.digits + "._-",
+    string.digits,
+    ".",
+)
+# 檔名長度：偏重 DIRSIZ 附近的邊界值
+NAME_LENGTHS = (1, 2, 3, 5, 8, DIRSIZ - 1, DIRSIZ, DIRSIZ + 1, 20)
+
+
+class ShellGrammar:
+    """依文法產生 xv6 shell 命令行"""
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        # 每個案例共用一小組名稱，讓命令之間會操作同一些檔案
+        self.names: List[str] = []
+
+    def new_case(self) -> None:
+        """開始新的案例（重新選擇共用的名稱）"""
+        self.names = [self.name() for _ in range(self.rng.randint(2, 5))]
+
+    def name(self) -> str:
+        """隨機檔名"""
+        alphabet = self.rng.choice(NAME_ALPHABETS)
+        return "".join(self.rng.choice(alphabet) for _ in range(self.rng.choice(NAME_LENGTHS)))
+
+    def path(self) -> str:
+        """隨機路徑：多數使用案例共用的名稱，偶爾是特殊路徑或多層路徑"""
+        rng = self.rng
+        roll = rng.random()
+        if roll < 0.6 and self.names:
+            return rng.choice(self.names)
+        if roll < 0.7:
+            return rng.choice([".", "..", "/", "//", "./", "../.."])
+        parts = [rng.choice(self.names) if self.names and rng.random() < 0.5 else self.name()
+                 for _ in range(rng.randint(1, 3))]
+        prefix = rng.choice(["", "/", "./", "../"])
+        return prefix + "/".join(parts)
+
+    def word(self) -> str:
+        """echo/grep 用的字"""
+        if self.rng.random() < 0.3:
+            return self.path()
+        return self.name()
+
+    def command(self, in_pipe: bool = False) -> List[str]:
+        """
+        單一命令（程式、參數與重導向）
+
+        Args:
+            in_pipe: 是否在管線右側（標準輸入來自管線，讀取標準輸入的程式可以不帶檔案）
+        """
+        rng = self.rng
+        program = rng.choice(list(PROGRAMS))
+        low, high = PROGRAMS[program]
+        if in_pipe and program in STDIN_READERS:
+            low = STDIN_READERS[program]
+        count = rng.randint(low, max(low, high))
+
+        if program == "sleep":
+            args = [str(rng.randint(0, 3))]
+        elif program in ("echo", "grep"):
+            args = [self.word() for _ in range(count)]
+        else:
+            args = [self.path() for _ in range(count)]
+
+        tokens = [program] + args
+        for _ in range(rng.choice((0, 0, 0, 1, 1, 2))):
+            tokens += [rng.choice(REDIRECTS), self.path()]
+        return tokens
+
+    def pipeline(self) -> List[str]:
+        """以 | 連接的命令"""
+        tokens = self.command()
+        for _ in range(self.rng.choice((0, 0, 0, 1, 1, 2))):
+            tokens += ["|"] + self.command(in_pipe=True)
+        return tokens
+
+    def line(self) -> str:
+        """一行命令：以 ; 或 & 連接的管線，偶爾以括號包起來"""
+        rng = self.rng
+        for _ in range(20):
+            tokens = self.pipeline()
+            for _ in range(rng.choice((0, 0, 1, 1, 2))):
+                tokens += [rng.choice((";", ";", ";", "&"))] + self.pipeline()
+            if rng.random() < 0.1:
+                tokens = ["("] + tokens + [")"]
+            line = " ".join(tokens)
+            if is_safe(line):
+                return line
+        return "echo " + self.name()
+
+    def case(self) -> List[str]:
+        """一個案例：數行命令"""
+        self.new_case()
+        return [self.line() for _ in range(self.rng.randint(1, MAX_CASE_LINES))]
+
+
+def is_safe(line: str) -> bool:
+    """
+    檢查命令行能否安全地在 console 上執行
+
+    不能超過 sh 的輸入緩衝區，且讀取標準輸入的程式必須有檔案參數、輸入重導向，
+    或在管線右側；否則它會讀走後面排隊的 console 輸入，案例只能等到超時
+
+    Args:
+        line: 命令行
+
+    Returns:
+        bool: 可以執行返回 True
+    """
+    if not line.strip() or len(line) > MAX_LINE:
+        return False
+    tokens = line.split()
+    previous = None
+    i = 0
+    while i < len(tokens):
+        # 找出一個命令的範圍（到下一個 | ; & ( ) 為止）
+        j = i
+        while j < len(tokens) and tokens[j] not in ("|", ";", "&", "(", ")"):
+            j += 1
+        segment = tokens[i:j]
+        if segment and segment[0] in STDIN_READERS and previous != "|":
+            args, redirected, k = [], False, 1
+            while k < len(segment):
+                if segment[k] in REDIRECTS:
+                    redirected = redirected or segment[k] == "<"
+                    k += 2
+                else:
+                    args.append(segment[k])
+                    k += 1
+            if not redirected and len(args) <= STDIN_READERS[segment[0]]:
+                return False
+        if j < len(tokens):
+            previous = tokens[j]
+        i = j + 1
+    return True
+
+
+class Mutator:
+    """變異語料庫中的案例"""
+
+    def __init__(self, rng: random.Random, grammar: ShellGrammar):
+        self.rng = rng
+        self.grammar = grammar
+
+    def mutate(self, case: Sequence[str], other: Optional[Sequence[str]] = None) -> List[str]:
+        """
+        產生一個變異後的案例
+
+        Args:
+            case: 原始案例
+            other: 用於拼接的另一個案例
+
+        Returns:
+            List[str]: 新案例（每一行都通過 is_safe）
+        """
+        rng = self.rng
+        # 沿用原案例中的名稱，讓新插入的命令與原本的命令操作同一些檔案
+        self.grammar.names = [t for line in case for t in line.split()
+                              if t not in OPERATORS and t not in PROGRAMS][:8] or self.grammar.names
+        lines = list(case)
+        for _ in range(rng.randint(1, 3)):
+            lines = self._mutate_once(lines, other)
+        lines = [line for line in lines if is_safe(line)][:MAX_CASE_LINES]
+        return lines or [self.grammar.line()]
+
+    def _mutate_once(self, lines: List[str], other: Optional[Sequence[str]]) -> List[str]:
+        rng = self.rng
+        operation = rng.randrange(7)
+        index = rng.randrange(len(lines)) if lines else 0
+
+        if operation == 0 or not lines:
+            lines.insert(index, self.grammar.line())
+        elif operation == 1 and len(lines) > 1:
+            del lines[index]
+        elif operation == 2:
+            lines.insert(index, lines[index])
+        elif operation == 3 and other:
+            start = rng.randrange(len(other))
+            lines[index:index] = list(other[start:start + rng.randint(1, 3)])
+        else:
+            tokens = lines[index].split()
+            position = rng.randrange(len(tokens))
+            if operation == 4 and tokens[position] not in OPERATORS:
+                tokens[position] = self.grammar.path()
+            elif operation == 5:
+                # 附加運算子：管線、重導向或序列
+                choice = rng.randrange(3)
+                if choice == 0:
+                    tokens += ["|"] + self.grammar.command(in_pipe=True)
+                elif choice == 1:
+                    tokens += [rng.choice(REDIRECTS), self.grammar.path()]
+                else:
+                    tokens += [";"] + self.grammar.pipeline()
+            else:
+                # 檔名長度邊界
+                length = rng.choice((DIRSIZ - 1, DIRSIZ, DIRSIZ + 1))
+                if tokens[position] not in OPERATORS and position:
+                    tokens[position] = (tokens[position] * length)[:length]
+            lines[index] = " ".join(tokens)
+        return lines
+
+
+def _normalize(line: str, command_tokens: Set[str]) -> str:
+    """把輸出行轉成行為特徵：去掉命令中出現的名稱與數字"""
+    words = [("_" if word in command_tokens else re.sub(r"\d+", "N", word))
+             for word in line.split()[:4]]
+    return " ".join(words)
+
+
+def features(case: Sequence[str], results: Sequence[Tuple[bool, str]]) -> Set[str]:
+    """
+    案例的行為特徵（沒有覆蓋率資訊時，以輸出的形狀代替）
+
+    Args:
+        case: 命令列表
+        results: run_commands() 的結果
+
+    Returns:
+        Set[str]: 特徵，例如 "cat|cannot open _"
+    """
+    found = set()
+    for line, (success, output) in zip(case, results):
+        tokens = line.split()
+        program = tokens[0] if tokens else ""
+        if not success:
+            found.add(f"{program}|失敗")
+            continue
+        command_tokens = set(tokens)
+        for out_line in output.splitlines()[:20]:
+            found.add(f"{program}|{_normalize(out_line, command_tokens)}")
+    return found
+
+
+def case_id(case: Sequence[str]) -> str:
+    """案例內容的雜湊（檔名用）"""
+    return hashlib.sha1("\n".join(case).encode()).hexdigest()[:16]
+
+
+class Corpus:
+    """產生過新行為特徵的案例集合，可保存在目錄中（每個案例一個檔案，一行一個命令）"""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory
+        self.cases: List[Tuple[str, ...]] = []
+        self.features: Set[str] = set()
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            for name in sorted(os.listdir(directory)):
+                with open(os.path.join(directory, name)) as f:
+                    case = tuple(line for line in f.read().splitlines() if is_safe(line))
+                if case:
+                    self.cases.append(case)
+
+    def add(self, case: Sequence[str], found: Set[str]) -> bool:
+        """
+        案例產生了新的特徵時加入語料庫
+
+        Returns:
+            bool: 是否加入
+        """
+        with self._lock:
+            if found <= self.features:
+                return False
+            self.features |= found
+            self.cases.append(tuple(case))
+        if self.directory:
+            with open(os.path.join(self.directory, case_id(case) + ".txt"), "w") as f:
+                f.write("\n".join(case) + "\n")
+        return True
+
+    def choice(self, rng: random.Random) -> Optional[Tuple[str, ...]]:
+        with self._lock:
+            return rng.choice(self.cases) if self.cases else None
+
+    def __len__(self) -> int:
+        return len(self.cases)
+
+
+def execute_case(harness,
+                 case: Sequence[str],
+                 timeout: float) -> Tuple[List[Tuple[bool, str]], Optional[Dict]]:
+    """
+    執行一個案例並判斷是否當機
+
+    kernel 錯誤由 harness 的 FaultWatcher 偵測，出現時 run_commands() 立即返回
+
+    Args:
+        harness: 已啟動的 XV6TestHarness
+        case: 命令列表
+        timeout: 每個命令的超時時間（秒）
+
+    Returns:
+        Tuple[List[Tuple[bool, str]], Optional[Dict]]: (run_commands() 的結果, 當機紀錄)；
+            沒有當機時當機紀錄為 None，否則包含 kind（panic/usertrap/hang/exit）、case、
+            command_index、command、panic、registers 與 console（這個案例的 console 結尾內容）
+    """
+    harness.last_fault = None
+    started = time.time()
+    results = harness.run_commands(list(case), timeout=timeout)
+    completed = sum(1 for success, _ in results if success)
+
+    fault = harness.last_fault
+    if fault is not None:
+        kind = fault.kind
+    elif completed < len(case):
+        # QEMU 已結束（例如 kernel 關機）時是 exit，仍在執行但命令沒有完成則是卡住
+        kind = "hang" if harness.is_running() else "exit"
+    else:
+        return results, None
+
+    return results, {"kind": kind, "case": list(case), "command_index": completed,
+                     "command": case[completed] if completed < len(case) else None,
+                     "panic": f"panic: {fault.message}" if kind == "panic" else None,
+                     "registers": fault.registers if fault else {},
+                     "console": harness.console_log.tail(4096, since=started)}
+
+
+class FuzzEngine:
+    """以多個 VM 平行執行的模糊測試引擎"""
+
+    def __init__(self,
+                 pool: XV6HarnessPool,
+                 workers: int = 2,
+                 seed: Optional[int] = None,
+                 corpus: Optional[Corpus] = None,
+                 crash_dir: Optional[str] = None,
+                 case_timeout: float = 5,
+                 recycle_every: int = 100,
+                 generate_ratio: float = 0.3):
+        """
+        初始化引擎
+
+        Args:
+            pool: 提供已開機 VM 的池（每個 worker 借用一台）
+            workers: 平行執行的 worker（VM）數量
+            seed: 亂數種子，None 則隨機
+            corpus: 語料庫，None 則使用只存在記憶體中的新語料庫
+            crash_dir: 保存當機/卡住案例的目錄，None 則不保存
+            case_timeout: 每個命令的超時時間（秒）
+            recycle_every: 每個 VM 執行這麼多案例後換一台新的（避免檔案系統狀態與空間持續累積）
+            generate_ratio: 直接依文法產生新案例（而不是變異語料庫）的比例
+        """
+        self.pool = pool
+        self.workers = workers
+        self.seed = seed if seed is not None else random.randrange(1 << 32)
+        self.corpus = corpus if corpus is not None else Corpus()
+        self.crash_dir = crash_dir
+        self.case_timeout = case_timeout
+        self.recycle_every = recycle_every
+        self.generate_ratio = generate_ratio
+        self.crashes: List[Dict] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._stats = {"cases": 0, "commands": 0, "panics": 0, "usertraps": 0, "hangs": 0,
+                       "exits": 0, "vm_boots": 0}
+        self._started = 0.0
+
+    def run(self,
+            duration: Optional[float] = None,
+            max_cases: Optional[int] = None,
+            progress_interval: Optional[float] = None) -> Dict[str, float]:
+        """
+        執行模糊測試直到時間或案例數達到上限
+
+        Args:
+            duration: 執行秒數，None 表示不限
+            max_cases: 案例數上限，None 表示不限（兩者都是 None 時只執行一輪 workers 個案例）
+            progress_interval: 每隔這麼多秒印出進度，None 則不印
+
+        Returns:
+            Dict[str, float]: stats() 的結果
+        """
+        if duration is None and max_cases is None:
+            max_cases = self.workers
+        self._started = time.time()
+        deadline = self._started + duration if duration is not None else None
+        self._stop.clear()
+
+        threads = [threading.Thread(target=self._worker, args=(i, deadline, max_cases),
+                                    name=f"xv6-fuzz-{i}", daemon=True)
+                   for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=progress_interval or 1.0)
+                if progress_interval:
+                    print(f"[FUZZ] {format_stats(self.stats())}")
+        except KeyboardInterrupt:
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+        return self.stats()
+
+    def stop(self) -> None:
+        """要求所有 worker 在目前的案例之後停止"""
+        self._stop.set()
+
+    def _next_case_allowed(self, deadline: Optional[float], max_cases: Optional[int]) -> bool:
+        if self._stop.is_set() or (deadline is not None and time.time() >= deadline):
+            return False
+        with self._lock:
+            if max_cases is not None and self._stats["cases"] >= max_cases:
+                return False
+            # 先佔用名額，多個 worker 不會超過 max_cases
+            self._stats["cases"] += 1
+        return True
+
+    def _worker(self, index: int, deadline: Optional[float], max_cases: Optional[int]) -> None:
+        rng = random.Random(self.seed + index)
+        grammar = ShellGrammar(rng)
+        mutator = Mutator(rng, grammar)
+        harness, executed = None, 0
+
+        try:
+            while self._next_case_allowed(deadline, max_cases):
+                if harness is None:
+                    harness = self.pool.acquire()
+                    if harness is None:
+                        print("[ERROR] 模糊測試無法取得 VM")
+                        self._stop.set()
+                        break
+                    with self._lock:
+                        self._stats["vm_boots"] += 1
+                    executed = 0
+
+                parent = self.corpus.choice(rng)
+                if parent is None or rng.random() < self.generate_ratio:
+                    case = grammar.case()
+                else:
+                    case = mutator.mutate(parent, self.corpus.choice(rng))
+
+                results, crash = execute_case(harness, case, self.case_timeout)
+                executed += 1
+                with self._lock:
+                    self._stats["commands"] += sum(1 for success, _ in results if success)
+
+                if crash:
+                    self._record_crash(crash)
+                else:
+                    self.corpus.add(case, features(case, results))
+
+                # 當機後 VM 不能再用；定期換新 VM 讓每個案例的起始狀態接近乾淨
+                if crash or executed >= self.recycle_every:
+                    self.pool.release(harness)
+                    harness = None
+        finally:
+            if harness is not None:
+                self.pool.release(harness)
+
+    def _record_crash(self, crash: Dict) -> None:
+        """記錄並保存當機案例"""
+        crash["seed"] = self.seed
+        kind = crash["kind"]
+        with self._lock:
+            self.crashes.append(crash)
+            self._stats[kind + "s"] += 1
+        if self.crash_dir:
+            os.makedirs(self.crash_dir, exist_ok=True)
+            path = os.path.join(self.crash_dir, f"{kind}-{case_id(crash['case'])}.json")
+            with open(path, "w") as f:
+                json.dump(crash, f, indent=2, ensure_ascii=False)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        目前的統計
+
+        Returns:
+            Dict[str, float]: 案例數、命令數、當機/卡住數、語料庫大小、經過時間與 execs/sec
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats["corpus"] = len(self.corpus)
+        stats["features"] = len(self.corpus.features)
+        stats["elapsed"] = time.time() - self._started if self._started else 0.0
+        stats["execs_per_sec"] = stats["cases"] / stats["elapsed"] if stats["elapsed"] else 0.0
+        return stats
+
+
+def format_stats(stats: Dict[str, float]) -> str:
+    """一行統計摘要"""
+    return (f"cases={stats['cases']} ({stats['execs_per_sec']:.1f} execs/sec, "
+            f"{stats['execs_per_sec'] * 3600:.0f}/hour) commands={stats['commands']} "
+            f"corpus={stats['corpus']} features={stats['features']} "
+            f"panics={stats['panics']} usertraps={stats['usertraps']} hangs={stats['hangs']} "
+            f"exits={stats['exits']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="xv6 shell 模糊測試")
+    parser.add_argument("--xv6-path", default="../xv6-riscv")
+    parser.add_argument("--workers", type=int, default=2, help="平行執行的 VM 數量")
+    parser.add_argument("--duration", type=float, help="執行秒數")
+    parser.add_argument("--cases", type=int, help="案例數上限")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--timeout", type=float, default=5, help="每個命令的超時時間（秒）")
+    parser.add_argument("--corpus", default=os.path.join("fuzz", "corpus"), help="語料庫目錄")
+    parser.add_argument("--crashes", default=os.path.join("fuzz", "crashes"), help="當機案例目錄")
+    args = parser.parse_args()
+
+    corpus = Corpus(args.corpus)
+    with XV6HarnessPool(size=args.workers, xv6_path=args.xv6_path,
+                        refill_concurrency=args.workers) as pool:
+        engine = FuzzEngine(pool, workers=args.workers, seed=args.seed, corpus=corpus,
+                            crash_dir=args.crashes, case_timeout=args.timeout)
+        print(f"[FUZZ] seed={engine.seed} 語料庫 {len(corpus)} 個案例")
+        stats = engine.run(duration=args.duration, max_cases=args.cases, progress_interval=10)
+
+    print(f"[FUZZ] 完成: {format_stats(stats)}")
+    for crash in engine.crashes:
+        print(f"[FUZZ] {crash['kind']}: {crash['command']!r} {crash['panic'] or ''}")
+    return 1 if engine.crashes else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,11 +3,186 @@ xv6 測試框架核心模組
 使用 pexpect 控制 QEMU 中運行的 xv6 作業系統
 """
 
+import functools
 import pexpect
 import time
 import os
+import re
+import shutil
 import signal
-from typing import Optional, List, Tuple
+import subprocess
+import tempfile
+import uuid
+from typing import Any, Callable, Dict, Iterator, Optional, List, Sequence, Set, Tuple, Union
+
+from xv6_build import XV6BuildManager
+from xv6_console import READ, SENT, ConsoleLog
+from xv6_fault import DEFAULT_FATAL_FAULTS, FaultWatcher, KernelFault
+from xv6_fs import XV6FileSystem
+from xv6_metrics import REGISTRY, ByteCounter, current_test
+from xv6_output import CommandOutput, OutputSink
+from xv6_parse import PARSERS, parse_ls
+from xv6_profile import CONSOLE_MARKERS, OPTIONAL_PHASES, BootProfile, record as record_boot
+from xv6_qemu import QEMU_IMG, allocated_bytes, build_qemu_command, create_overlay
+from xv6_snapshot import SNAPSHOT_TAG, XV6Snapshot
+from xv6_timeouts import AdaptiveTimeouts
+
+
+# 命令結束標記的前綴
+SENTINEL_PREFIX = "__XV6_END_"
+
+# xv6 console 輸入緩衝區大小（kernel/console.c 的 INPUT_BUF_SIZE），
+# shell 尚未讀取的輸入超過這個大小時字元會被丟棄，批次送出時每次寫入不能超過
+CONSOLE_INPUT_BUF = 128
+
+# 有界輸出模式下 pexpect 每次讀取的最大位元組數與比對提示符時搜尋的視窗大小
+BOUNDED_MAXREAD = 8192
+BOUNDED_SEARCH_WINDOW = 4096
+
+# 看到 kernel 錯誤訊息的開頭後，等待訊息其餘部分（暫存器等）與 panic 確定的最長時間（秒）
+FAULT_MESSAGE_TIMEOUT = 2
+# 等待錯誤訊息時每次讀取的最長時間（秒）
+FAULT_POLL_INTERVAL = 0.1
+
+# 不會修改檔案系統的命令；其他命令（rm、mkdir、ln、usertests 等）與含輸出重導向的
+# 命令都會讓目錄列表快取失效
+READ_ONLY_COMMANDS = {"", "ls", "cat", "echo", "grep", "wc"}
+
+
+def _instrumented(op: str) -> Callable:
+    """
+    記錄框架呼叫的延遲與 console 收發量到 xv6_metrics.REGISTRY
+
+    只記錄最外層的呼叫（例如 check_file_exists 內部的 run_command 不會重複計算），
+    標籤包含呼叫名稱與目前執行中的測試
+    """
+    def decorator(method: Callable) -> Callable:
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if self._call_depth:
+                return method(self, *args, **kwargs)
+
+            self._call_depth += 1
+            sent, received = self._bytes_sent.bytes, self._bytes_received.bytes
+            started = time.perf_counter()
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self._call_depth -= 1
+                labels = {"op": op, "test": current_test.get()}
+                REGISTRY.observe("xv6_call_seconds", time.perf_counter() - started, **labels)
+                REGISTRY.inc("xv6_call_bytes_sent_total",
+                             self._bytes_sent.bytes - sent, **labels)
+                REGISTRY.inc("xv6_call_bytes_received_total",
+                             self._bytes_received.bytes - received, **labels)
+        return wrapper
+    return decorator
+
+
+class CommandStream:
+    """
+    stream_command() 的回傳值：逐行迭代命令輸出，迭代結束後可查詢執行結果
+
+    只能迭代一次：命令在第一次迭代時才送出，再次迭代會拋出 RuntimeError，
+    而不是把命令再送給 xv6 一次
+
+    Attributes:
+        success: 命令是否正常結束（迭代結束前為 None）
+        aborted: 是否因 abort_if 條件成立而中止
+        error: 失敗原因
+        line_count: 已產生的行數
+    """
+
+    def __init__(self,
+                 harness: "XV6TestHarness",
+                 command: str,
+                 timeout: float,
+                 on_line: Optional[Callable[[str], None]],
+                 abort_if: Optional[Callable[[str], bool]],
+                 fatal_faults: Optional[Sequence[str]] = None):
+        self.harness = harness
+        self.command = command
+        self.timeout = timeout
+        self.on_line = on_line
+        self.abort_if = abort_if
+        self.fatal_faults = fatal_faults
+        self.success: Optional[bool] = None
+        self.aborted = False
+        self.error = ""
+        self.line_count = 0
+        self._consumed = False
+
+    def __iter__(self) -> Iterator[str]:
+        if self._consumed:
+            raise RuntimeError(f"命令串流只能迭代一次: {self.command}")
+        self._consumed = True
+        return self._lines()
+
+    def _lines(self) -> Iterator[str]:
+        harness = self.harness
+        process = harness.process
+        if not process:
+            self.success, self.error = False, "Error: xv6 未啟動"
+            return
+
+        marker_cmd, marker = harness._sentinel(uuid.uuid4().hex[:8], 0)
+        echoes = [self.command, marker_cmd]
+        deadline = time.time() + self.timeout
+        # 只在這個命令執行期間改變致命錯誤種類，結束後恢復 harness 的設定
+        fatal = harness.watcher.fatal
+        if self.fatal_faults is not None:
+            harness.watcher.fatal = set(self.fatal_faults)
+
+        try:
+            harness._debug(f"串流執行命令: {self.command}")
+            harness.watcher.command(self.command)
+            harness.watcher.begin()
+            process.send(f"{self.command}\n{marker_cmd}\n")
+            started = time.perf_counter()
+
+            while True:
+                # 每次只取一行，pexpect 緩衝區不會隨輸出總量增長
+                index = harness._expect_exact(["\n", marker], deadline)
+                if index == 1:
+                    harness._observe_command(self.command, time.perf_counter() - started)
+                    break
+
+                line = process.before.rstrip("\r")
+                if line in echoes:
+                    echoes.remove(line)
+                    continue
+
+                self.line_count += 1
+                if self.on_line:
+                    self.on_line(line)
+                yield line
+
+                if self.abort_if and self.abort_if(line):
+                    # xv6 沒有中斷前景程式的方式（沒有 Ctrl-C），只能直接關閉 VM
+                    self.aborted = True
+                    self.success, self.error = False, f"中止: {line}"
+                    harness._debug(f"串流中止，關閉 xv6: {line}")
+                    harness.stop()
+                    return
+
+            # 消耗標記之後的 shell 提示符
+            harness._expect_exact("$ ", deadline)
+            self.success = True
+
+        except pexpect.TIMEOUT:
+            self.success, self.error = False, f"命令超時: {self.command}"
+        except pexpect.EOF:
+            self.success, self.error = False, "xv6 進程意外終止"
+        except KernelFault as fault:
+            harness.last_fault = fault
+            self.success, self.error = False, f"kernel 錯誤: {fault}"
+            if fault.kind == "usertrap":
+                harness._resync(marker, max(0, deadline - time.time()))
+        finally:
+            harness.watcher.fatal = fatal
+
+        if self.error:
+            harness._debug(self.error)
 
 
 class XV6TestHarness:
@@ -16,34 +191,139 @@ class XV6TestHarness:
     def __init__(self,
                  xv6_path: str = "../xv6-riscv",
                  timeout: int = 30,
-                 debug: bool = False):
+                 debug: bool = False,
+                 use_snapshot: bool = False,
+                 cache_dir: Optional[str] = None,
+                 isolate_disk: bool = False,
+                 launch: str = "direct",
+                 auto_build: bool = False,
+                 disk_overlay: bool = False,
+                 fs_image: Optional[str] = None,
+                 output_limit: Optional[int] = None,
+                 output_spill_dir: Optional[str] = None,
+                 fatal_faults: Sequence[str] = DEFAULT_FATAL_FAULTS,
+                 silence_timeout: Optional[float] = None,
+                 timeouts: Optional[AdaptiveTimeouts] = None):
         """
         初始化測試框架
 
         Args:
             xv6_path: xv6-riscv 原始碼路徑
             timeout: 預設命令超時時間（秒）
-            debug: 是否啟用除錯模式（顯示所有互動）
+            debug: 是否啟用除錯模式（以 print 顯示所有互動；不論是否啟用，
+                   互動都會記錄在 console_log）
+            use_snapshot: 是否從開機完成的 QEMU 快照還原（第一次會冷開機建立快照）
+            cache_dir: 快照等快取檔案的存放目錄，None 則使用預設值
+            isolate_disk: 是否使用 fs.img 的私有複本（多個 VM 同時執行時必須啟用）
+            launch: 啟動方式，"direct" 直接執行 QEMU（命令列由 Makefile 解析並快取），
+                    "make" 使用 make qemu
+            auto_build: 啟動前是否透過建置快取確保 kernel/fs.img 與原始碼一致
+            disk_overlay: 私有磁碟改用 qcow2 覆蓋層（backing file 為原始 fs.img），
+                          建立時間與 fs.img 大小無關；找不到 qemu-img 時退回完整複本。
+                          啟用時隱含 isolate_disk
+            fs_image: 以指定的 fs.img（例如 xv6_mkfs.build_image() 預先放好測試檔案的映像）
+                      取代 xv6 目錄中的 fs.img，None 則使用 xv6 目錄中的 fs.img
+            output_limit: 有界輸出模式，每個命令在記憶體中只保留輸出的最後這麼多字元，
+                          輸出以 CommandOutput 返回（含完整長度與 SHA-256）；None 則保留完整輸出
+            output_spill_dir: 有界輸出模式下把完整輸出寫到這個目錄的暫存檔
+                              （CommandOutput.spill_path），None 則只保留最後一段
+            fatal_faults: console 出現這些 kernel 錯誤（見 xv6_fault.FAULT_PATTERNS）時
+                          目前的命令立即失敗，錯誤記錄在 last_fault；
+                          執行會刻意觸發 usertrap 的 usertests 時應只保留 ("panic",)
+            silence_timeout: 等待命令時超過這麼多秒沒有任何輸出就視為卡住並立即失敗，
+                             None 則只依命令超時判斷
+            timeouts: 自適應超時：命令有足夠的歷史耗時樣本時，以觀察到的 p99 推算超時，
+                      取代預設的 timeout（呼叫端明確指定的超時只會被延長），
+                      完成的命令耗時也會加入統計；
+                      None 則一律使用指定的超時
         """
+        if launch not in ("direct", "make"):
+            raise ValueError(f"不支援的啟動方式: {launch}")
+        if fs_image and (use_snapshot or launch == "make"):
+            raise ValueError("fs_image 只能搭配直接啟動 QEMU，且不能與快照同時使用")
+
         self.xv6_path = os.path.abspath(xv6_path)
         self.timeout = timeout
         self.debug = debug
         # 我宣告一個叫做 self.process 的變數，它一開始是空的 (None)，但在未來它應該要存放一個 pexpect.spawn 類型的物件。
         self.process: Optional[pexpect.spawn] = None 
         self.boot_timeout = 60  # 啟動超時時間
+        self.use_snapshot = use_snapshot
+        self.snapshot = XV6Snapshot(self.xv6_path, cache_dir, self.boot_timeout, debug) \
+            if use_snapshot else None
+        self.isolate_disk = isolate_disk or disk_overlay
+        self.disk_overlay = disk_overlay
+        self.fs_image = os.path.abspath(fs_image) if fs_image else \
+            os.path.join(self.xv6_path, "fs.img")
+        self.launch = launch
+        self.cache_dir = cache_dir
+        self.auto_build = auto_build
+        self.build_hash: Optional[str] = None  # 目前使用的建置（原始碼雜湊），auto_build 時設定
+        self._work_dir: Optional[str] = None  # 單一實例的暫存目錄（快照、磁碟複本等）
+        self._listings: Dict[str, Set[str]] = {}  # 目錄 -> 檔名集合，供 check_file_exists 使用
+        self._stats = {"ls_round_trips": 0, "listing_cache_hits": 0, "listing_invalidations": 0}
+        self._disk_image: Optional[str] = None  # 私有磁碟映像（複本或覆蓋層）
+        self._disk_stats = {"disk_setup_seconds": 0.0, "disk_bytes": 0}
+        self.boot_profile: Optional[BootProfile] = None  # 最近一次 start() 的各階段時間
+        # console 收發量（經由 console_log 的 logfile_send / logfile_read 統計）與巢狀呼叫深度
+        self._bytes_sent = ByteCounter()
+        self._bytes_received = ByteCounter()
+        self._call_depth = 0
+        self._chunk_marker = ""  # run_commands() 目前區塊的最後一個結束標記
+        self.output_limit = output_limit
+        self.output_spill_dir = output_spill_dir
+        # console 收發內容與框架註記的環狀紀錄（取代逐行 print，失敗時附加到測試報告）
+        self.console_log = ConsoleLog()
+        # 掃描讀到的輸出中的 kernel 錯誤，最近一次讓命令失敗的錯誤記錄在 last_fault
+        self.watcher = FaultWatcher(fatal=fatal_faults)
+        self.silence_timeout = silence_timeout
+        self.last_fault: Optional[KernelFault] = None
+        self.timeouts = timeouts
 
+    def _debug(self, message: str) -> None:
+        """記錄框架註記到 console_log，除錯模式下同時印出"""
+        self.console_log.note(message)
+        if self.debug:
+            print(f"[DEBUG] {message}")
+
+    def _error(self, message: str) -> None:
+        """記錄並印出錯誤"""
+        self.console_log.note(f"錯誤: {message}")
+        print(f"[ERROR] {message}")
+
+    @_instrumented("start")
     def start(self) -> bool:
         """
         啟動 xv6 在 QEMU 中
 
+        各階段的時間點記錄在 self.boot_profile（也會加入 xv6_profile 的全域紀錄）
+
         Returns:
             bool: 啟動成功返回 True，否則返回 False
         """
+        mode = "snapshot" if self.use_snapshot else "isolated" if self.isolate_disk else self.launch
+        self.boot_profile = profile = BootProfile(mode)
+        profile.waiting_for = "build_check"
+        try:
+            return self._start(profile)
+        finally:
+            record_boot(profile)
+            self._debug(f"開機階段: {profile.format()}")
+
+    def _start(self, profile: BootProfile) -> bool:
+        """start() 的實作，依序標記各開機階段"""
         try:
             # 確認 xv6 目錄存在
             if not os.path.isdir(self.xv6_path):
                 raise FileNotFoundError(f"xv6 目錄不存在: {self.xv6_path}")
 
+            # 依原始碼雜湊取用快取的建置產物，必要時重新編譯
+            if self.auto_build:
+                manager = XV6BuildManager(self.xv6_path, self.cache_dir, debug=self.debug)
+                self.build_hash = manager.ensure_built()
+                if self.build_hash is None:
+                    raise RuntimeError("xv6 編譯失敗")
+
             # 確認 kernel 已編譯
             kernel_path = os.path.join(self.xv6_path, "kernel", "kernel")
             if not os.path.isfile(kernel_path):
@@ -51,103 +331,608 @@ class XV6TestHarness:
                     f"xv6 kernel 未編譯，請先執行: cd {self.xv6_path} && make"
                 )
 
-            # 啟動 QEMU
-            # 使用 make qemu-gdb 可以不掛在前台，或直接用 qemu 命令
-            cmd = f"make -C {self.xv6_path} qemu"
+            # 直接執行 QEMU 時不會經過 make，fs.img 也必須已經產生
+            if self.launch == "direct" and not os.path.isfile(self.fs_image):
+                raise FileNotFoundError(
+                    f"fs.img 不存在，請先執行: cd {self.xv6_path} && make fs.img"
+                )
+            profile.mark("build_check")
+            profile.waiting_for = "spawn"
 
-            if self.debug:
-                print(f"[DEBUG] 執行命令: {cmd}")
+            if self.use_snapshot:
+                # 從快照還原：VM 已停在 shell 等待輸入，送出空行讓 shell 重新印出提示符
+                self.process = self._spawn_from_snapshot()
+                self.process.sendline("")
+            elif self.isolate_disk:
+                # 每個實例使用自己的 fs.img 複本，避免多個 QEMU 搶同一個映像的寫入鎖
+                self.process = self._spawn_with_private_disk()
+            elif self.launch == "direct":
+                # 直接執行 QEMU，不經過 make 的相依性檢查與 shell
+                self.process = self._spawn_qemu(build_qemu_command(self.xv6_path,
+                                                                   drive=self.fs_image))
+            else:
+                # 啟動 QEMU
+                # 使用 make qemu-gdb 可以不掛在前台，或直接用 qemu 命令
+                cmd = f"make -C {self.xv6_path} qemu"
+
+                self._debug(f"執行命令: {cmd}")
+
+                # spawn QEMU 進程
+                self.process = pexpect.spawn(
+                    cmd,
+                    timeout=self.boot_timeout,
+                    encoding='utf-8',
+                    echo=False
+                )
 
-            # spawn QEMU 進程
-            self.process = pexpect.spawn(
-                cmd,
-                timeout=self.boot_timeout,
-                encoding='utf-8',
-                echo=False
-            )
+            profile.mark("spawn")
+            self.process.logfile_send = self.console_log.channel(SENT, self._bytes_sent)
+            self.watcher.reset(self.console_log.channel(READ, self._bytes_received))
+            self.process.logfile_read = self.watcher
+            if self.output_limit is not None:
+                # 比對只搜尋最後一段視窗，不隨累積的輸出變長
+                self.process.maxread = BOUNDED_MAXREAD
+                self.process.searchwindowsize = BOUNDED_SEARCH_WINDOW
 
-            # 等待 shell 提示符 '$'
-            # xv6 啟動後會顯示 "init: starting sh" 然後是 '$'
-            self.process.expect(r'\$ ', timeout=self.boot_timeout)
+            # 依序等待開機訊息，最後是 shell 提示符 '$'
+            # xv6 啟動後會顯示 "init: starting sh" 然後是 '$'；
+            # 從快照還原時只會看到提示符，沒出現的階段直接略過
+            remaining = list(CONSOLE_MARKERS.items())
+            deadline = time.time() + self.boot_timeout
+            while remaining:
+                expected = [phase for phase, _ in remaining if phase not in OPTIONAL_PHASES]
+                profile.waiting_for = "prompt" if self.use_snapshot else expected[0]
+                index = self.process.expect([pattern for _, pattern in remaining],
+                                            timeout=max(0, deadline - time.time()))
+                profile.mark(remaining[index][0])
+                remaining = remaining[index + 1:]
+            self._listings.clear()
 
-            if self.debug:
-                print("[DEBUG] xv6 啟動成功，shell 已就緒")
+            self._debug("xv6 啟動成功，shell 已就緒")
 
             return True
 
         except pexpect.TIMEOUT:
-            print(f"[ERROR] xv6 啟動超時（{self.boot_timeout}秒）")
+            self._error(f"xv6 啟動超時（{self.boot_timeout}秒），卡在 {profile.waiting_for}")
+            self._error(f"開機階段: {profile.format()}")
             return False
         except pexpect.EOF:
-            print("[ERROR] xv6 進程意外終止")
+            self._error("xv6 進程意外終止")
             if self.process:
-                print(f"[ERROR] 輸出: {self.process.before}")
+                self._error(f"輸出: {self.process.before}")
             return False
         except Exception as e:
-            print(f"[ERROR] 啟動 xv6 失敗: {e}")
+            self._error(f"啟動 xv6 失敗: {e}")
             return False
 
+    def _spawn_from_snapshot(self) -> pexpect.spawn:
+        """
+        複製快照映像並以 -loadvm 還原 VM
+
+        Returns:
+            pexpect.spawn: QEMU 進程
+        """
+        self._work_dir = tempfile.mkdtemp(prefix="xv6-")
+        image = self.snapshot.clone(self._work_dir)
+        self._disk_image = image
+        self.boot_profile.mark("disk_setup")
+        return self._spawn_qemu(self.snapshot.qemu_command(image))
+
+    def _spawn_with_private_disk(self) -> pexpect.spawn:
+        """
+        在實例暫存目錄建立 fs.img 的 qcow2 覆蓋層或完整複本，並直接啟動 QEMU
+
+        Returns:
+            pexpect.spawn: QEMU 進程
+        """
+        self._work_dir = tempfile.mkdtemp(prefix="xv6-")
+        base = self.fs_image
+        started = time.perf_counter()
+        if self.disk_overlay and shutil.which(QEMU_IMG):
+            image, drive_format = os.path.join(self._work_dir, "fs.qcow2"), "qcow2"
+            create_overlay(base, image)
+        else:
+            if self.disk_overlay:
+                self._debug(f"找不到 {QEMU_IMG}，改用 fs.img 完整複本")
+            image, drive_format = os.path.join(self._work_dir, "fs.img"), "raw"
+            shutil.copyfile(base, image)
+        self._disk_image = image
+        self.boot_profile.mark("disk_setup")
+        self._disk_stats = {"disk_setup_seconds": time.perf_counter() - started,
+                            "disk_bytes": allocated_bytes(image)}
+        self._debug(f"私有磁碟: {image} "
+                    f"({self._disk_stats['disk_setup_seconds'] * 1000:.1f}ms, "
+                    f"{self._disk_stats['disk_bytes']} bytes)")
+        return self._spawn_qemu(build_qemu_command(self.xv6_path, drive=image,
+                                                   drive_format=drive_format))
+
+    def _spawn_qemu(self, cmd: List[str]) -> pexpect.spawn:
+        """
+        直接執行 QEMU（不經過 make）
+
+        Args:
+            cmd: QEMU 參數列表
+
+        Returns:
+            pexpect.spawn: QEMU 進程
+        """
+        self._debug(f"執行命令: {' '.join(cmd)}")
+
+        return pexpect.spawn(
+            cmd[0], cmd[1:],
+            cwd=self.xv6_path,
+            timeout=self.boot_timeout,
+            encoding='utf-8',
+            echo=False
+        )
+
+    @_instrumented("run_command")
     def run_command(self,
                     command: str,
-                    timeout: Optional[int] = None) -> Tuple[bool, str]:
+                    timeout: Optional[int] = None,
+                    parse: Union[str, Callable[[str], Any], None] = None) -> Tuple[bool, Any]:
         """
         在 xv6 shell 中執行命令並獲取輸出
 
         Args:
             command: 要執行的命令
-            timeout: 命令超時時間（秒），None 則使用預設值
+            timeout: 命令超時時間（秒），None 則使用預設值；
+                     設定 timeouts 且有足夠樣本時，預設值改用歷史耗時推算的超時，
+                     指定的值只會被延長
+            parse: 解析輸出的方式，"ls"、"wc"、"usertests"（見 xv6_parse.PARSERS）
+                   或任意接受輸出字串的函數；None 則返回原始輸出
 
         Returns:
-            Tuple[bool, str]: (是否成功, 輸出內容)
+            Tuple[bool, Any]: (是否成功, 輸出內容)；指定 parse 且成功時第二項是解析結果，
+                              失敗時仍是錯誤訊息字串
+
+        Example:
+            success, listing = xv6.run_command("ls", parse="ls")
+            assert listing["README"].is_file
         """
+        if isinstance(parse, str) and parse not in PARSERS:
+            raise ValueError(f"不支援的解析器: {parse}")
         if not self.process:
             return False, "Error: xv6 未啟動"
 
-        if timeout is None:
-            timeout = self.timeout
+        parser = PARSERS[parse] if isinstance(parse, str) else parse
 
-        try:
-            if self.debug:
-                print(f"[DEBUG] 執行命令: {command}")
+        # 單一命令就是只有一個命令的批次：命令後面接一個結束標記，
+        # 以字面比對標記判斷完成，不會被輸出中的 "$ " 提前結束
+        success, output = self.run_commands([command], timeout)[0]
+        if success and parser is not None:
+            return True, parser(output)
+        return success, output
 
-            # 發送命令
-            self.process.sendline(command)
+    def stream_command(self,
+                       command: str,
+                       timeout: Optional[int] = None,
+                       on_line: Optional[Callable[[str], None]] = None,
+                       abort_if: Optional[Callable[[str], bool]] = None,
+                       fatal_faults: Optional[Sequence[str]] = None) -> CommandStream:
+        """
+        執行長時間命令並在輸出到達時逐行取得（例如 usertests）
 
-            # 等待命令執行完成，shell 提示符再次出現
-            self.process.expect(r'\$ ', timeout=timeout)
+        輸出不會累積在記憶體中。abort_if 成立時會直接關閉 VM
+        （xv6 無法中斷前景程式），之後需要重新 start()。
+        提前停止迭代時命令仍在 xv6 中執行
 
-            # 獲取輸出（在提示符之前的內容）
-            output = self.process.before
+        Args:
+            command: 要執行的命令
+            timeout: 整個命令的超時時間（秒），None 則使用預設值；
+                     設定 timeouts 且有足夠樣本時，預設值改用歷史耗時推算的超時，
+                     指定的值只會被延長
+            on_line: 每收到一行時呼叫的函數
+            abort_if: 判斷是否中止的函數，對某一行返回 True 時中止
+            fatal_faults: 只在這個命令執行期間取代 harness 的 fatal_faults，
+                          例如 usertests 會刻意觸發 usertrap，應傳入 ("panic",)；
+                          None 則使用 harness 的設定
 
-            # 清理輸出：移除命令本身的回顯
-            lines = output.split('\n')
-            # command in line[0]: 只有當「我的指令 (command)」出現在「第一行 (lines[0])」裡面時，才刪除
-            if lines and command in lines[0]:
-                lines = lines[1:]  # 移除第一行（命令回顯）
+        Returns:
+            CommandStream: 可迭代的輸出行，迭代結束後以 success/aborted/error 查詢結果
 
-            clean_output = '\n'.join(lines).strip()
+        Example:
+            stream = xv6.stream_command("usertests", timeout=300,
+                                        abort_if=lambda line: "FAILED" in line,
+                                        fatal_faults=("panic",))
+            for line in stream:
+                print(line)
+            assert stream.success
+        """
+        explicit = timeout is not None
+        if timeout is None:
+            timeout = self.timeout
+        self._invalidate_listings([command])
+        return CommandStream(self, command, self._command_timeout(command, timeout, explicit),
+                             on_line, abort_if, fatal_faults)
 
-            if self.debug:
-                print(f"[DEBUG] 輸出:\n{clean_output}")
+    @_instrumented("run_commands")
+    def run_commands(self,
+                     commands: List[str],
+                     timeout: Optional[int] = None) -> List[Tuple[bool, str]]:
+        """
+        批次執行多個命令，以結束標記分隔各命令的輸出
+
+        每個命令後面接一個 echo 結束標記，多個命令合併成一次寫入，
+        再依序等待各標記出現。注意：會讀取標準輸入的命令（例如不帶參數的 cat）
+        會吃掉後面排隊的命令，不適合批次執行
+
+        Args:
+            commands: 要執行的命令列表
+            timeout: 每個命令的超時時間（秒），None 則使用預設值；
+                     設定 timeouts 且有足夠樣本的命令，預設值改用歷史耗時推算的超時，
+                     指定的值只會被延長
+
+        Returns:
+            List[Tuple[bool, str]]: 每個命令的 (是否成功, 輸出內容)
+        """
+        if not self.process:
+            return [(False, "Error: xv6 未啟動")] * len(commands)
+
+        explicit = timeout is not None
+        if timeout is None:
+            timeout = self.timeout
 
-            return True, clean_output
+        self._invalidate_listings(commands)
+        nonce = uuid.uuid4().hex[:8]
+        framed = [(command,) + self._sentinel(nonce, i) for i, command in enumerate(commands)]
+        results: List[Tuple[bool, str]] = []
 
+        try:
+            self.watcher.begin()
+            self._run_framed(framed, timeout, results, explicit)
         except pexpect.TIMEOUT:
-            error_msg = f"命令超時: {command}"
-            if self.debug:
-                print(f"[DEBUG] {error_msg}")
-            return False, error_msg
+            results.append((False, f"命令超時: {commands[len(results)]}"))
         except pexpect.EOF:
-            error_msg = "xv6 進程意外終止"
-            if self.debug:
-                print(f"[DEBUG] {error_msg}")
-            return False, error_msg
+            results.append((False, "xv6 進程意外終止"))
+        except KernelFault as fault:
+            # kernel 已經 panic 或卡住，不必等到超時
+            self.last_fault = fault
+            results.append((False, f"kernel 錯誤: {fault}"))
+            if fault.kind == "usertrap":
+                self._resync(self._chunk_marker, timeout)
         except Exception as e:
-            error_msg = f"執行命令失敗: {e}"
-            if self.debug:
-                print(f"[DEBUG] {error_msg}")
-            return False, error_msg
+            results.append((False, f"執行命令失敗: {e}"))
+
+        if len(results) < len(commands):
+            self._debug(results[-1][1])
+
+        # 中斷後 console 狀態不明，剩下的命令視為失敗
+        results.extend([(False, "批次中斷：先前的命令失敗")] * (len(commands) - len(results)))
+        return results
+
+    def _run_framed(self,
+                    framed: List[Tuple[str, str, str]],
+                    timeout: float,
+                    results: List[Tuple[bool, str]],
+                    explicit: bool = False) -> None:
+        """
+        run_commands() 的實作：分區塊送出命令並依序收集輸出到 results
+
+        Raises:
+            pexpect.TIMEOUT: 命令超時
+            pexpect.EOF: QEMU 已結束
+            KernelFault: console 出現 kernel 錯誤，或超過 silence_timeout 沒有輸出
+        """
+        for chunk in self._chunk_commands(framed):
+            # 命令失敗但 shell 仍在執行時，以區塊最後一個標記重新同步
+            self._chunk_marker = chunk[-1][2]
+            payload = "".join(f"{command}\n{marker_cmd}\n" for command, marker_cmd, _ in chunk)
+            for command, _, _ in chunk:
+                self._debug(f"執行命令: {command}")
+                self.watcher.command(command)
+
+            # 一次寫入整個區塊
+            self.process.send(payload)
+            command_started = time.perf_counter()
+
+            # console 會立即回顯整個區塊的輸入，回顯行在第一次出現時移除
+            echoes = [line for command, marker_cmd, _ in chunk
+                      for line in (command, marker_cmd)]
+            for command, _, marker in chunk:
+                limit = self._command_timeout(command, timeout, explicit)
+                if self.output_limit is None:
+                    # 字面比對結束標記，不需要以正規表達式掃描整個緩衝區
+                    self._expect_exact(marker, time.time() + limit)
+                    output = self._clean_framed_output(self.process.before, echoes)
+                else:
+                    output = self._read_bounded(marker, echoes, limit)
+                # 每個命令的延遲：從上一個結束標記（或送出）到這個結束標記
+                now = time.perf_counter()
+                self._observe_command(command, now - command_started)
+                command_started = now
+                if self.debug:
+                    print(f"[DEBUG] 輸出:\n{output}")
+                results.append((True, output))
+
+            # 消耗最後一個標記之後的 shell 提示符
+            self._expect_exact("$ ", time.time() + timeout)
+
+    def _command_timeout(self, command: str, timeout: float, explicit: bool = False) -> float:
+        """
+        命令的超時：設定 timeouts 且有足夠的歷史樣本時以耗時統計推算，否則為 timeout；
+        呼叫端明確指定的超時（explicit）只會被延長
+        """
+        if self.timeouts is None:
+            return timeout
+        limit = self.timeouts.timeout_for(command, timeout, explicit)
+        if limit != timeout:
+            self._debug(f"自適應超時: {command} -> {limit:.1f}s（指定 {timeout}s）")
+        return limit
+
+    def _observe_command(self, command: str, seconds: float) -> None:
+        """記錄完成的命令耗時到延遲指標與自適應超時的統計"""
+        argv = command.split()
+        REGISTRY.observe("xv6_command_seconds", seconds, command=argv[0] if argv else "")
+        if self.timeouts is not None:
+            self.timeouts.observe(command, seconds)
+
+    def _expect_exact(self, pattern: Union[str, List[str]], deadline: float) -> int:
+        """
+        字面比對等待輸出，同時以 silence_timeout 偵測沒有輸出的卡住
+
+        Args:
+            pattern: 要比對的文字（或文字列表）
+            deadline: 截止時間（time.time()）
+
+        Returns:
+            int: 比對到的項目索引
+
+        Raises:
+            pexpect.TIMEOUT: 超過截止時間
+            KernelFault: 超過 silence_timeout 沒有任何輸出
+        """
+        patterns = [pattern] if isinstance(pattern, str) else list(pattern)
+        # 同時等待致命錯誤訊息的開頭；輸出中先出現的先比對到，
+        # 錯誤之前已完成的命令仍然會看到自己的結束標記
+        triggers = self.watcher.triggers
+        # 誤判的錯誤訊息開頭（例如 echo panic: x 的輸出）之前的內容，比對成功後放回 before
+        skipped = ""
+        while True:
+            remaining = max(0, deadline - time.time())
+            # 有 silence_timeout 時每次最多等到「再沒有輸出就算卡住」的時間點，然後檢查；
+            # 有尚未確定的 panic 時最多等到它確定
+            wait = remaining if self.silence_timeout is None else \
+                min(remaining, max(0, self.silence_timeout - self.watcher.silent_for()))
+            settle = self.watcher.settle_time()
+            if settle is not None:
+                wait = min(wait, settle)
+            try:
+                index = self.process.expect_exact(patterns + list(triggers.values()), timeout=wait)
+            except pexpect.TIMEOUT:
+                self._check_fault()
+                if time.time() >= deadline:
+                    raise
+                continue
+            if index < len(patterns):
+                self.process.before = skipped + self.process.before
+                return index
+            skipped += self.process.before + self.process.after
+            fault = self._await_fault(list(triggers)[index - len(patterns)])
+            if fault is not None:
+                raise fault
+
+    def _await_fault(self, kind: str) -> Optional[KernelFault]:
+        """
+        錯誤訊息開頭出現後，繼續讀取（不消耗 pexpect 緩衝區）直到 FaultWatcher 能判斷：
+        訊息完整且確定（panic 之後沒有輸出）時是錯誤；不在行首、是輸入的回顯
+        或 panic 之後還有輸出時只是一般輸出。最多等待 FAULT_MESSAGE_TIMEOUT 秒
+
+        Args:
+            kind: 錯誤種類
+
+        Returns:
+            Optional[KernelFault]: 錯誤，不是錯誤時為 None
+        """
+        watcher = self.watcher
+        limit = time.time() + FAULT_MESSAGE_TIMEOUT
+        while True:
+            if watcher.confirmed() is not None:
+                return watcher.take()
+            if watcher.pending is None and not watcher.awaiting():
+                return None
+            remaining = limit - time.time()
+            if remaining <= 0:
+                return watcher.incomplete(kind)
+            settle = watcher.settle_time()
+            try:
+                # 只有 TIMEOUT 的模式列表：讀入的輸出留在緩衝區，同時經過 watcher 掃描
+                self.process.expect([pexpect.TIMEOUT], timeout=min(
+                    remaining, FAULT_POLL_INTERVAL if settle is None else settle))
+            except pexpect.EOF:
+                # QEMU 已結束，不會再有輸出
+                if watcher.pending is not None:
+                    return watcher.take()
+                if watcher.awaiting():
+                    return watcher.incomplete(kind)
+                raise
+
+    def _resync(self, marker: str, timeout: float) -> None:
+        """
+        命令因 usertrap 失敗後 shell 仍在執行：讀到已送出的最後一個結束標記與提示符，
+        讓下一個命令不會收到這次剩下的輸出
 
+        Args:
+            marker: 已送出的最後一個結束標記
+            timeout: 最長等待時間（秒）
+        """
+        try:
+            self.process.expect_exact(marker, timeout=timeout)
+            self.process.expect_exact("$ ", timeout=timeout)
+        except (pexpect.TIMEOUT, pexpect.EOF):
+            self._debug("usertrap 之後無法重新同步 shell")
+
+    def _check_silence(self) -> None:
+        """超過 silence_timeout 沒有輸出時拋出 KernelFault"""
+        if self.silence_timeout is not None and self.watcher.silent_for() >= self.silence_timeout:
+            raise self.watcher.hang(self.silence_timeout)
+
+    def _check_fault(self) -> None:
+        """等待中沒有新輸出時拋出已確定的致命錯誤，或超過 silence_timeout 的卡住"""
+        if self.watcher.confirmed() is not None:
+            raise self.watcher.take()
+        self._check_silence()
+
+    @staticmethod
+    def _sentinel(nonce: str, index: int) -> Tuple[str, str]:
+        """
+        產生命令結束標記
+
+        標記命令以 tab 分隔兩段，echo 輸出時會以空白連接；
+        console 回顯的是含 tab 的原始輸入，因此只有真正的 echo 輸出會符合標記文字
+
+        Args:
+            nonce: 本次呼叫的隨機字串
+            index: 命令序號
+
+        Returns:
+            Tuple[str, str]: (要送出的標記命令, xv6 印出的標記文字)
+        """
+        return (f"echo {SENTINEL_PREFIX}{nonce}\t{index}__",
+                f"{SENTINEL_PREFIX}{nonce} {index}__")
+
+    @staticmethod
+    def _chunk_commands(framed: List[Tuple[str, str, str]]) -> List[List[Tuple[str, str, str]]]:
+        """
+        把命令分組，讓每次寫入的位元組數不超過 console 輸入緩衝區
+
+        Args:
+            framed: (命令, 標記命令, 標記文字) 列表
+
+        Returns:
+            List[List[Tuple[str, str, str]]]: 分組後的列表（單一命令過長時自成一組）
+        """
+        chunks: List[List[Tuple[str, str, str]]] = []
+        current: List[Tuple[str, str, str]] = []
+        size = 0
+        for item in framed:
+            item_size = len(f"{item[0]}\n{item[1]}\n".encode())
+            if current and size + item_size > CONSOLE_INPUT_BUF:
+                chunks.append(current)
+                current, size = [], 0
+            current.append(item)
+            size += item_size
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _read_bounded(self, marker: str, echoes: List[str], timeout: float) -> CommandOutput:
+        """
+        有界輸出模式：邊讀邊處理直到結束標記，記憶體中只保留輸出的最後一段
+
+        不使用 expect_exact，pexpect 不會累積整段輸出；
+        標記之後已讀到的內容放回 pexpect 的緩衝區，供後續比對
+
+        Args:
+            marker: 結束標記文字
+            echoes: 尚未移除的輸入回顯行
+            timeout: 超時時間（秒）
+
+        Returns:
+            CommandOutput: 輸出的最後 output_limit 個字元與完整輸出的統計
+
+        Raises:
+            pexpect.TIMEOUT: 超時前沒有看到結束標記
+            pexpect.EOF: QEMU 已結束
+            KernelFault: console 出現 kernel 錯誤，或超過 silence_timeout 沒有輸出
+        """
+        sink = OutputSink(self.output_limit,
+                          lambda raw: self._clean_framed_output(raw, echoes),
+                          lambda text: self._strip_echoes(text, echoes),
+                          self.output_spill_dir)
+        process = self.process
+        pending, process.buffer = process.buffer, ""
+        # 標記可能跨越兩次讀取，保留最後 len(marker) - 1 個字元與下一段一起搜尋
+        keep = len(marker) - 1
+        deadline = time.time() + timeout
+        try:
+            while True:
+                index = pending.find(marker)
+                fault = self.watcher.confirmed()
+                if index >= 0:
+                    # pending 的結尾就是目前讀到的位置；錯誤訊息在標記之前才屬於這個命令
+                    marker_offset = self.watcher.position - (len(pending) - index)
+                    if fault is not None and fault.offset is not None and \
+                            fault.offset < marker_offset:
+                        raise self.watcher.take()
+                    sink.feed(pending[:index])
+                    process.buffer = pending[index + len(marker):]
+                    return sink.finish()
+                if fault is not None:
+                    raise self.watcher.take()
+                if len(pending) > keep:
+                    sink.feed(pending[:-keep])
+                    pending = pending[-keep:]
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise pexpect.TIMEOUT(f"等待 {marker} 超時")
+                if self.silence_timeout is not None:
+                    remaining = min(remaining,
+                                    max(0, self.silence_timeout - self.watcher.silent_for()))
+                settle = self.watcher.settle_time()
+                if settle is not None:
+                    remaining = min(remaining, settle)
+                try:
+                    pending += process.read_nonblocking(BOUNDED_MAXREAD, timeout=remaining)
+                except pexpect.TIMEOUT:
+                    self._check_fault()
+        except (pexpect.TIMEOUT, pexpect.EOF, KernelFault):
+            sink.discard()
+            raise
+
+    @staticmethod
+    def _clean_framed_output(raw: str, echoes: List[str]) -> str:
+        """
+        從兩個結束標記之間的原始輸出取出命令輸出
+
+        Args:
+            raw: pexpect 的 before 內容
+            echoes: 尚未移除的輸入回顯行（找到後會從列表中移除）
+
+        Returns:
+            str: 清理後的輸出
+        """
+        text = XV6TestHarness._strip_echoes(raw.replace("\r\n", "\n"), echoes)
+        # 執行標記命令前的 shell 提示符
+        if text.endswith("$ "):
+            text = text[:-2]
+        return text.strip()
+
+    @staticmethod
+    def _strip_echoes(text: str, echoes: List[str]) -> str:
+        """
+        移除輸出開頭的換行、shell 提示符與輸入回顯行
+
+        Args:
+            text: 已正規化換行的輸出
+            echoes: 尚未移除的輸入回顯行（找到後會從列表中移除）
+
+        Returns:
+            str: 移除後的輸出（結尾不處理）
+        """
+        # 前一個標記行的換行與 shell 提示符
+        if text.startswith("\n"):
+            text = text[1:]
+        if text.startswith("$ "):
+            text = text[2:]
+
+        # 常見情況：回顯依序出現在開頭，直接切掉，不必逐行拆解
+        while echoes and text.startswith(echoes[0] + "\n"):
+            text = text[len(echoes[0]) + 1:]
+            echoes.pop(0)
+
+        # 回顯與命令輸出交錯時才逐行過濾
+        if any(echo and echo in text for echo in echoes):
+            lines = []
+            for line in text.split("\n"):
+                if line in echoes:
+                    echoes.remove(line)
+                else:
+                    lines.append(line)
+            text = "\n".join(lines)
+        return text
+
+    @_instrumented("expect_output")
     def expect_output(self,
                       pattern: str,
                       timeout: Optional[int] = None) -> Tuple[bool, str]:
@@ -168,31 +953,132 @@ class XV6TestHarness:
             timeout = self.timeout
 
         try:
-            self.process.expect(pattern, timeout=timeout)
+            self.watcher.begin()
+            triggers = self.watcher.triggers
+            deadline = time.time() + timeout
+            while True:
+                index = self.process.expect(
+                    [pattern] + [re.escape(text) for text in triggers.values()],
+                    timeout=max(0, deadline - time.time()))
+                if index == 0:
+                    break
+                fault = self._await_fault(list(triggers)[index - 1])
+                if fault is not None:
+                    raise fault
             matched = self.process.after
             return True, matched
         except pexpect.TIMEOUT:
             return False, f"未在 {timeout} 秒內找到模式: {pattern}"
+        except KernelFault as fault:
+            self.last_fault = fault
+            return False, f"kernel 錯誤: {fault}"
         except Exception as e:
             return False, f"等待輸出失敗: {e}"
 
+    @_instrumented("check_file_exists")
     def check_file_exists(self, filename: str) -> bool:
         """
         檢查檔案是否存在於 xv6 檔案系統中
 
+        目錄列表會快取，直到透過框架執行可能修改檔案系統的命令為止
+
         Args:
-            filename: 檔案名稱
+            filename: 檔案名稱（可包含目錄，例如 "dir/file"）
 
         Returns:
             bool: 檔案存在返回 True
         """
-        success, output = self.run_command("ls")
+        return self.check_files_exist([filename])[filename]
+
+    @_instrumented("check_files_exist")
+    def check_files_exist(self, filenames: List[str]) -> Dict[str, bool]:
+        """
+        一次檢查多個檔案是否存在（每個目錄最多執行一次 ls）
+
+        Args:
+            filenames: 檔案名稱列表
+
+        Returns:
+            Dict[str, bool]: 檔案名稱 -> 是否存在
+        """
+        result = {}
+        for filename in filenames:
+            directory, name = os.path.split(filename.rstrip("/"))
+            listing = self._list_directory(directory or ".")
+            result[filename] = listing is not None and name in listing
+        return result
+
+    def stats(self) -> Dict[str, float]:
+        """
+        取得框架統計
+
+        Returns:
+            Dict[str, float]: ls_round_trips（實際執行的 ls 次數）、listing_cache_hits、
+                              listing_invalidations、round_trips_saved（快取省下的來回次數）、
+                              disk_setup_seconds（建立私有磁碟的耗時）與
+                              disk_bytes（私有磁碟實際佔用的空間）
+        """
+        if self._disk_image and os.path.exists(self._disk_image):
+            self._disk_stats["disk_bytes"] = allocated_bytes(self._disk_image)
+        stats = dict(self._stats)
+        stats["round_trips_saved"] = stats["listing_cache_hits"]
+        stats.update(self._disk_stats)
+        return stats
+
+    def _list_directory(self, directory: str) -> Optional[Set[str]]:
+        """取得目錄中的檔名集合（優先使用快取），ls 失敗時返回 None"""
+        if directory in self._listings:
+            self._stats["listing_cache_hits"] += 1
+            return self._listings[directory]
+
+        command = "ls" if directory == "." else f"ls {directory}"
+        success, output = self.run_command(command)
+        self._stats["ls_round_trips"] += 1
         if not success:
-            return False
+            return None
 
-        # 檢查 ls 輸出中是否包含檔案名
-        return filename in output.split()
+        # 目錄不存在時輸出 "ls: cannot open ..."，不會產生有效的列
+        listing = {entry.name for entry in parse_ls(output)}
+        self._listings[directory] = listing
+        return listing
 
+    def _invalidate_listings(self, commands: List[str]) -> None:
+        """命令可能修改檔案系統時清除目錄列表快取"""
+        if self._listings and any(self._may_modify_fs(c) for c in commands):
+            self._listings.clear()
+            self._stats["listing_invalidations"] += 1
+
+    @staticmethod
+    def _may_modify_fs(command: str) -> bool:
+        """
+        判斷命令是否可能修改檔案系統
+
+        採保守判斷：含輸出重導向，或管線/序列中任一段不是已知的唯讀命令，都視為會修改
+
+        Args:
+            command: shell 命令
+
+        Returns:
+            bool: 可能修改返回 True
+        """
+        if ">" in command:
+            return True
+        for segment in re.split(r"[;|&()]", command):
+            words = segment.split()
+            if (words[0] if words else "") not in READ_ONLY_COMMANDS:
+                return True
+        return False
+
+    def is_running(self) -> bool:
+        """
+        QEMU 是否仍在執行（已讀到 EOF 或行程已結束時為 False）
+
+        Returns:
+            bool: xv6 是否仍在執行
+        """
+        return self.process is not None and not self.process.eof() and self.process.isalive()
+
+    @_instrumented("stop")
     def stop(self) -> bool:
         """
         停止 xv6/QEMU
@@ -204,8 +1090,7 @@ class XV6TestHarness:
             return True
 
         try:
-            if self.debug:
-                print("[DEBUG] 停止 xv6...")
+            self._debug("停止 xv6...")
 
             # QEMU 的退出組合鍵是 Ctrl-A X
             # 但在 pexpect 中我們直接終止進程更可靠
@@ -213,17 +1098,122 @@ class XV6TestHarness:
             # wait() 的作用：「收屍」。如果不做這一步，死掉的 QEMU 就會變成**「殭屍 (Zombie Process)」**
             self.process.wait()
 
-            if self.debug:
-                print("[DEBUG] xv6 已停止")
+            self._debug("xv6 已停止")
 
             self.process = None
+            self._cleanup_work_dir()
             return True
 
         except Exception as e:
-            if self.debug:
-                print(f"[DEBUG] 停止 xv6 時發生錯誤: {e}")
+            self._debug(f"停止 xv6 時發生錯誤: {e}")
             return False
 
+    @_instrumented("open_filesystem")
+    def open_filesystem(self) -> XV6FileSystem:
+        """
+        在主機端直接讀取 VM 的檔案系統，不經過 console
+
+        VM 執行中時會透過 QEMU monitor 暫停（stop 會把磁碟寫入與 qcow2 中繼資料寫回），
+        讀取完成後繼續執行。只應在沒有命令執行時呼叫；xv6 每個系統呼叫結束前都會提交日誌，
+        回到 shell 提示符時資料已經在磁碟上
+
+        Returns:
+            XV6FileSystem: 檔案系統讀取器，用完請 close()（或使用 with 語句）
+
+        Example:
+            xv6.run_command("echo hello > a.txt")
+            with xv6.open_filesystem() as fs:
+                assert fs.read_file("a.txt") == b"hello\n"
+        """
+        image = self._disk_image or self.fs_image
+        running = self.process is not None and self.process.isalive()
+        if running:
+            self._monitor("stop")
+        try:
+            if image.endswith(".qcow2"):
+                # qcow2 需先轉成 raw；-U 允許在 QEMU 持有映像鎖時讀取
+                view = os.path.join(self._work_dir, "fs-view.img")
+                subprocess.run([QEMU_IMG, "convert", "-U", "-f", "qcow2", "-O", "raw",
+                                image, view], check=True, capture_output=True)
+                image = view
+            return XV6FileSystem(image)
+        finally:
+            if running:
+                self._monitor("cont")
+
+    def _monitor(self, command: str) -> str:
+        """
+        在 QEMU monitor 執行命令（Ctrl-A c 切換，執行後切回 console）
+
+        Args:
+            command: monitor 命令，例如 "stop"
+
+        Returns:
+            str: 命令輸出
+        """
+        self.process.send("\x01c")
+        self.process.expect_exact("(qemu) ", timeout=self.timeout)
+        self.process.sendline(command)
+        self.process.expect_exact("(qemu) ", timeout=self.timeout)
+        output = self.process.before
+        self.process.send("\x01c")
+        self._debug(f"QEMU monitor: {command}")
+        return output.split("\n", 1)[-1].strip()
+
+    def restore_snapshot(self) -> bool:
+        """
+        在執行中的 QEMU 以 loadvm 還原開機完成的快照（記憶體與磁碟），不重新啟動 QEMU
+
+        kernel panic 或命令卡住後 monitor 仍可使用，因此也能用來回收當機的 VM
+
+        Returns:
+            bool: 還原後 shell 可以執行命令返回 True；未使用快照或還原失敗返回 False
+        """
+        if not self.use_snapshot or not self.process or not self.process.isalive():
+            return False
+        try:
+            output = self._monitor(f"loadvm {SNAPSHOT_TAG}")
+        except (pexpect.TIMEOUT, pexpect.EOF):
+            self._error("loadvm 沒有回應")
+            return False
+        if "Error" in output:
+            self._error(f"loadvm 失敗: {output}")
+            return False
+
+        # 還原前的輸出與 kernel 錯誤不再有意義；以結束標記確認 shell 已可使用
+        self.process.buffer = ""
+        self.watcher.reset()
+        self._listings.clear()
+        success, output = self.run_command("echo", timeout=self.boot_timeout)
+        if not success:
+            self._error(f"還原快照後 shell 沒有回應: {output}")
+        return success
+
+    def reset(self) -> bool:
+        """
+        丟棄 VM 狀態與磁碟變更並重新啟動
+
+        使用快照時直接在執行中的 QEMU 還原快照；
+        使用 disk_overlay 時只需刪除並重建覆蓋層，不必重新 mkfs 或複製 fs.img
+
+        Returns:
+            bool: 重新啟動成功返回 True
+        """
+        if self.restore_snapshot():
+            return True
+        self.stop()
+        return self.start()
+
+    def _cleanup_work_dir(self) -> None:
+        """刪除單一實例的暫存目錄"""
+        if self._disk_image and os.path.exists(self._disk_image):
+            # 保留最後的磁碟用量供 stats() 查詢
+            self._disk_stats["disk_bytes"] = allocated_bytes(self._disk_image)
+        self._disk_image = None
+        if self._work_dir:
+            shutil.rmtree(self._work_dir, ignore_errors=True)
+            self._work_dir = None
+
     def __enter__(self):
         """支援 with 語句的上下文管理"""
         self.start()
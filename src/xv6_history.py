@@ -0,0 +1,359 @@
+"""
+xv6 效能歷史資料庫
+把每次測試階段的測試耗時、命令延遲與開機時間存進本機 SQLite，
+以 xv6 的 git revision 與 kernel 雜湊作為鍵值，
+並以 Mann-Whitney U 檢定找出兩個 revision 之間顯著變慢的項目
+
+用法:
+    python src/xv6_history.py list
+    python src/xv6_history.py report <base> <head>     # revision 或 kernel 雜湊的前綴
+"""
+
+import argparse
+import hashlib
+import math
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+# 預設的資料庫位置（相對於專案根目錄，不受目前工作目錄影響）
+DEFAULT_HISTORY_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  "reports", "perf_history.sqlite")
+
+# 樣本種類：測試耗時、guest 命令延遲、開機階段
+KINDS = ("test", "command", "boot")
+
+# 每組至少需要的樣本數，太少時不做檢定
+MIN_SAMPLES = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    revision TEXT NOT NULL,
+    kernel_hash TEXT NOT NULL,
+    started REAL NOT NULL,
+    host TEXT,
+    worker TEXT
+);
+CREATE TABLE IF NOT EXISTS samples (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value REAL NOT NULL,
+    count INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS runs_revision ON runs(revision);
+CREATE INDEX IF NOT EXISTS runs_kernel_hash ON runs(kernel_hash);
+CREATE INDEX IF NOT EXISTS samples_run ON samples(run_id, kind, name);
+"""
+
+# 加權樣本：(值, 次數)
+Samples = List[Tuple[float, int]]
+
+
+def xv6_revision(xv6_path: str) -> str:
+    """
+    xv6 原始碼的 git revision
+
+    Returns:
+        str: commit 雜湊，工作目錄有未提交的修改時加上 "+dirty"，不是 git 倉庫時為 "unknown"
+    """
+    try:
+        head = subprocess.run(["git", "rev-parse", "HEAD"], cwd=xv6_path,
+                              capture_output=True, text=True, timeout=10)
+        if head.returncode != 0:
+            return "unknown"
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                cwd=xv6_path, capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+    return head.stdout.strip() + ("+dirty" if status.stdout.strip() else "")
+
+
+def kernel_hash(xv6_path: str) -> Optional[str]:
+    """kernel/kernel 的 SHA-256，尚未建置時返回 None"""
+    path = os.path.join(xv6_path, "kernel", "kernel")
+    if not os.path.isfile(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def weighted_median(samples: Samples) -> float:
+    """加權樣本的中位數"""
+    total = sum(count for _, count in samples)
+    if not total:
+        return 0.0
+    seen = 0
+    for value, count in sorted(samples):
+        seen += count
+        if seen * 2 >= total:
+            return value
+    return sorted(samples)[-1][0]
+
+
+def mann_whitney_u(a: Samples, b: Samples) -> Tuple[float, float]:
+    """
+    雙尾 Mann-Whitney U 檢定（常態近似，含同值校正與連續性校正）
+
+    樣本可以帶次數，直方圖的桶可以直接當成同值的樣本
+
+    Args:
+        a: 第一組 (值, 次數)
+        b: 第二組 (值, 次數)
+
+    Returns:
+        Tuple[float, float]: (a 的 U 統計量, p 值)
+    """
+    n_a = sum(count for _, count in a)
+    n_b = sum(count for _, count in b)
+    if not n_a or not n_b:
+        return 0.0, 1.0
+
+    # 合併成 值 -> [a 的次數, b 的次數]，同值取平均秩
+    merged: Dict[float, List[int]] = {}
+    for group, samples in ((0, a), (1, b)):
+        for value, count in samples:
+            merged.setdefault(value, [0, 0])[group] += count
+
+    rank_sum_a = 0.0
+    tie_term = 0
+    seen = 0
+    for value in sorted(merged):
+        count_a, count_b = merged[value]
+        ties = count_a + count_b
+        rank_sum_a += count_a * (seen + (ties + 1) / 2)
+        tie_term += ties ** 3 - ties
+        seen += ties
+
+    n = n_a + n_b
+    u_a = rank_sum_a - n_a * (n_a + 1) / 2
+    mean = n_a * n_b / 2
+    variance = n_a * n_b / 12 * ((n + 1) - tie_term / (n * (n - 1)))
+    if variance <= 0:
+        return u_a, 1.0
+    z = (abs(u_a - mean) - 0.5) / math.sqrt(variance)
+    return u_a, min(1.0, math.erfc(max(z, 0.0) / math.sqrt(2)))
+
+
+class PerfHistory:
+    """以 SQLite 保存的效能歷史"""
+
+    def __init__(self, db_path: str = DEFAULT_HISTORY_DB):
+        """
+        開啟（必要時建立）資料庫
+
+        Args:
+            db_path: SQLite 檔案路徑
+        """
+        self.db_path = db_path
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        # 平行執行時多個 worker 會同時寫入，等待鎖而不是立即失敗
+        self._conn = sqlite3.connect(db_path, timeout=30)
+        self._conn.executescript(SCHEMA)
+
+    def record_run(self,
+                   revision: str,
+                   kernel: str,
+                   samples: Dict[Tuple[str, str], Samples],
+                   worker: Optional[str] = None) -> int:
+        """
+        記錄一次測試階段
+
+        Args:
+            revision: xv6 的 git revision
+            kernel: kernel 雜湊
+            samples: (種類, 名稱) -> [(值, 次數)]，種類見 KINDS
+            worker: 平行執行時的 worker 編號
+
+        Returns:
+            int: run id
+        """
+        with self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO runs (revision, kernel_hash, started, host, worker) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (revision, kernel, time.time(), socket.gethostname(), worker))
+            run_id = cursor.lastrowid
+            self._conn.executemany(
+                "INSERT INTO samples (run_id, kind, name, value, count) VALUES (?, ?, ?, ?, ?)",
+                [(run_id, kind, name, value, count)
+                 for (kind, name), values in samples.items()
+                 for value, count in values])
+        return run_id
+
+    def _run_ids(self, ref: str) -> List[int]:
+        """revision 或 kernel 雜湊前綴相符的 run"""
+        rows = self._conn.execute(
+            "SELECT id FROM runs WHERE revision LIKE ? OR kernel_hash LIKE ?",
+            (ref + "%", ref + "%")).fetchall()
+        return [row[0] for row in rows]
+
+    def samples(self, ref: str) -> Dict[Tuple[str, str], Samples]:
+        """
+        取得某個 revision 的所有樣本
+
+        Args:
+            ref: revision 或 kernel 雜湊的前綴
+
+        Returns:
+            Dict[Tuple[str, str], Samples]: (種類, 名稱) -> [(值, 次數)]
+        """
+        run_ids = self._run_ids(ref)
+        result: Dict[Tuple[str, str], Samples] = {}
+        if not run_ids:
+            return result
+        placeholders = ",".join("?" * len(run_ids))
+        for kind, name, value, count in self._conn.execute(
+                f"SELECT kind, name, value, count FROM samples WHERE run_id IN ({placeholders})",
+                run_ids):
+            result.setdefault((kind, name), []).append((value, count))
+        return result
+
+    def recent_samples(self,
+                       kind: str,
+                       runs: int = 20,
+                       host: Optional[str] = None) -> Dict[str, Samples]:
+        """
+        取得最近幾次 run 中某種樣本（不分 revision）
+
+        Args:
+            kind: 樣本種類，見 KINDS
+            runs: 最近的 run 數
+            host: 只取這台主機的 run，None 則不限
+
+        Returns:
+            Dict[str, Samples]: 名稱 -> [(值, 次數)]
+        """
+        query = "SELECT id FROM runs"
+        params: List = []
+        if host is not None:
+            query += " WHERE host = ?"
+            params.append(host)
+        query += " ORDER BY started DESC LIMIT ?"
+        run_ids = [row[0] for row in self._conn.execute(query, params + [runs]).fetchall()]
+        result: Dict[str, Samples] = {}
+        if not run_ids:
+            return result
+        placeholders = ",".join("?" * len(run_ids))
+        for name, value, count in self._conn.execute(
+                f"SELECT name, value, count FROM samples "
+                f"WHERE kind = ? AND run_id IN ({placeholders})", [kind] + run_ids):
+            result.setdefault(name, []).append((value, count))
+        return result
+
+    def revisions(self) -> List[Tuple[str, str, int, float]]:
+        """
+        列出有紀錄的 revision
+
+        Returns:
+            List[Tuple[str, str, int, float]]: (revision, kernel 雜湊, run 數, 最後一次時間)，新的在前
+        """
+        return self._conn.execute(
+            "SELECT revision, kernel_hash, COUNT(*), MAX(started) FROM runs "
+            "GROUP BY revision, kernel_hash ORDER BY MAX(started) DESC").fetchall()
+
+    def compare(self,
+                base: str,
+                head: str,
+                alpha: float = 0.05,
+                min_change: float = 0.05) -> List[Dict]:
+        """
+        比較兩個 revision，找出顯著變慢或變快的項目
+
+        Args:
+            base: 基準 revision（或 kernel 雜湊前綴）
+            head: 要檢查的 revision
+            alpha: 顯著水準
+            min_change: 中位數相對變化至少要這麼大才標記（過濾統計上顯著但無意義的差異）
+
+        Returns:
+            List[Dict]: 每個兩邊都有足夠樣本的項目：kind/name/base_median/head_median/
+                        change/p_value/status（"regression"、"improvement" 或 "unchanged"），
+                        依變化幅度排序
+        """
+        base_samples = self.samples(base)
+        head_samples = self.samples(head)
+        results = []
+        for key in sorted(set(base_samples) & set(head_samples)):
+            a, b = base_samples[key], head_samples[key]
+            if (sum(count for _, count in a) < MIN_SAMPLES or
+                    sum(count for _, count in b) < MIN_SAMPLES):
+                continue
+            base_median, head_median = weighted_median(a), weighted_median(b)
+            change = (head_median - base_median) / base_median if base_median else 0.0
+            _, p_value = mann_whitney_u(a, b)
+
+            status = "unchanged"
+            if p_value < alpha and abs(change) >= min_change:
+                status = "regression" if change > 0 else "improvement"
+            results.append({"kind": key[0], "name": key[1],
+                            "base_median": base_median, "head_median": head_median,
+                            "change": change, "p_value": p_value, "status": status})
+        results.sort(key=lambda item: item["change"], reverse=True)
+        return results
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def format_report(results: List[Dict], show_all: bool = False) -> str:
+    """把 compare() 的結果排成表格（預設只列出有變化的項目）"""
+    rows = [r for r in results if show_all or r["status"] != "unchanged"]
+    lines = [f"{'狀態':<12}{'種類':<9}{'base':>10}{'head':>10}{'變化':>9}{'p':>9}  名稱"]
+    for r in rows:
+        lines.append(f"{r['status']:<12}{r['kind']:<9}{r['base_median']:>9.3f}s"
+                     f"{r['head_median']:>9.3f}s{r['change'] * 100:>+8.1f}%{r['p_value']:>9.4f}"
+                     f"  {r['name']}")
+    if not rows:
+        lines.append("（沒有顯著的變化）")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="xv6 效能歷史與回歸報告")
+    parser.add_argument("--db", default=os.environ.get("XV6_HISTORY_DB", DEFAULT_HISTORY_DB))
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="列出有紀錄的 revision")
+    report = sub.add_parser("report", help="比較兩個 revision")
+    report.add_argument("base", help="基準 revision 或 kernel 雜湊前綴")
+    report.add_argument("head", help="要檢查的 revision 或 kernel 雜湊前綴")
+    report.add_argument("--alpha", type=float, default=0.05, help="顯著水準")
+    report.add_argument("--min-change", type=float, default=0.05,
+                        help="中位數相對變化門檻（0.05 = 5%%）")
+    report.add_argument("--all", action="store_true", help="也列出沒有變化的項目")
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.db):
+        print(f"[ERROR] 資料庫不存在: {args.db}")
+        return 1
+
+    with PerfHistory(args.db) as history:
+        if args.command == "list":
+            for revision, kernel, runs, last in history.revisions():
+                print(f"{revision[:12]:<18} kernel={kernel[:12]}  runs={runs:<4} "
+                      f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(last))}")
+            return 0
+
+        results = history.compare(args.base, args.head, args.alpha, args.min_change)
+        print(format_report(results, args.all))
+        # 有回歸時以非零結束，方便在 CI 中使用
+        return 1 if any(r["status"] == "regression" for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
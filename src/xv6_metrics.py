@@ -0,0 +1,279 @@
+"""
+xv6 測試指標模組
+行程內的指標登錄：以 HDR 風格（對數-線性分桶）的直方圖記錄延遲，
+以計數器記錄傳輸位元組，測試結束時可輸出成 JSON 或 Prometheus 文字格式
+"""
+
+import contextvars
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+
+# 每個 2 的次方區間切成 2^SUB_BUCKET_BITS 個子桶，相對誤差約 2 / 2^SUB_BUCKET_BITS
+SUB_BUCKET_BITS = 7
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+# 直方圖內部以微秒為單位儲存
+UNIT = 1e-6
+
+# 輸出時的百分位數
+QUANTILES = (0.5, 0.9, 0.99)
+
+# 指標說明（Prometheus 的 HELP）
+HELP = {
+    "xv6_call_seconds": "Latency of XV6TestHarness calls",
+    "xv6_command_seconds": "Latency of individual guest commands",
+    "xv6_call_bytes_sent_total": "Bytes written to the xv6 console",
+    "xv6_call_bytes_received_total": "Bytes read from the xv6 console",
+}
+
+# 目前執行中的測試（conftest 設定；VM 池的背景執行緒看到的是空字串）
+current_test: contextvars.ContextVar = contextvars.ContextVar("xv6_current_test", default="")
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """
+    HDR 風格直方圖：值域不需要事先設定，記錄是 O(1)，記憶體與不同桶的數量成正比
+
+    小於 SUB_BUCKET_COUNT 的值各自一個桶；更大的值依最高位元決定區間，
+    區間內再以接下來的 SUB_BUCKET_BITS 個位元分桶
+    """
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    @staticmethod
+    def _index(units: int) -> int:
+        if units < SUB_BUCKET_COUNT:
+            return units
+        shift = units.bit_length() - SUB_BUCKET_BITS
+        return (shift << SUB_BUCKET_BITS) + (units >> shift)
+
+    @staticmethod
+    def _upper_bound(index: int) -> int:
+        """桶內的最大值（單位）"""
+        shift, mantissa = divmod(index, SUB_BUCKET_COUNT)
+        return ((mantissa + 1) << shift) - 1 if shift else index
+
+    def record(self, value: float, count: int = 1) -> None:
+        """記錄一個值（秒），count 為相同值的次數（例如從 buckets() 還原直方圖）"""
+        index = self._index(max(0, int(value / UNIT)))
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.count += count
+        self.total += value * count
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def percentile(self, pct: float) -> float:
+        """
+        百分位數（秒），誤差不超過桶寬
+
+        Args:
+            pct: 0 到 100
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, int(round(pct / 100 * self.count)))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self._upper_bound(index) * UNIT, self.max)
+        return self.max
+
+    def buckets(self) -> List[Tuple[float, int]]:
+        """
+        非空的桶
+
+        Returns:
+            List[Tuple[float, int]]: (桶的上界（秒）, 次數)，依值排序
+        """
+        return [(min(self._upper_bound(index) * UNIT, self.max), self.counts[index])
+                for index in sorted(self.counts)]
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def to_dict(self) -> Dict[str, float]:
+        result = {"count": self.count, "sum": self.total, "mean": self.mean,
+                  "min": self.min if self.count else 0.0, "max": self.max}
+        for q in QUANTILES:
+            result[f"p{int(q * 100)}"] = self.percentile(q * 100)
+        return result
+
+
+class ByteCounter:
+    """
+    類檔案物件，計算寫入的位元組數
+
+    可設為 pexpect 的 logfile_read / logfile_send，統計 console 的收發量
+    """
+
+    def __init__(self):
+        self.bytes = 0
+
+    def write(self, data) -> None:
+        self.bytes += len(data.encode("utf-8", "replace") if isinstance(data, str) else data)
+
+    def flush(self) -> None:
+        pass
+
+
+def _escape(value: str) -> str:
+    """Prometheus 標籤值跳脫"""
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class MetricsRegistry:
+    """執行緒安全的指標登錄：直方圖與計數器，各自以 (名稱, 標籤) 區分"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+
+    @staticmethod
+    def _key(labels: Dict[str, str]) -> LabelKey:
+        return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """
+        在直方圖中記錄一個值
+
+        Args:
+            name: 指標名稱
+            value: 值（秒）
+            **labels: 標籤
+        """
+        key = self._key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            series.setdefault(key, Histogram()).record(value)
+
+    def inc(self, name: str, amount: float = 1, **labels: str) -> None:
+        """
+        增加計數器
+
+        Args:
+            name: 指標名稱（慣例以 _total 結尾）
+            amount: 增加量
+            **labels: 標籤
+        """
+        key = self._key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def histogram(self, name: str, **labels: str) -> Optional[Histogram]:
+        """取得某個直方圖（不存在時返回 None）"""
+        with self._lock:
+            return self._histograms.get(name, {}).get(self._key(labels))
+
+    def series(self, name: str) -> List[Tuple[Dict[str, str], Histogram]]:
+        """某個直方圖指標的所有 (標籤, 直方圖)"""
+        with self._lock:
+            return [(dict(key), hist) for key, hist in self._histograms.get(name, {}).items()]
+
+    def top(self, name: str, label: str, limit: int = 10) -> List[Tuple[str, float, int]]:
+        """
+        依某個標籤加總直方圖，找出耗時最多的項目
+
+        Args:
+            name: 直方圖名稱
+            label: 分組的標籤（例如 "test" 或 "command"）
+            limit: 返回的項目數
+
+        Returns:
+            List[Tuple[str, float, int]]: (標籤值, 總秒數, 次數)，總秒數大的在前
+        """
+        totals: Dict[str, List[float]] = {}
+        with self._lock:
+            for key, hist in self._histograms.get(name, {}).items():
+                value = dict(key).get(label, "")
+                entry = totals.setdefault(value, [0.0, 0])
+                entry[0] += hist.total
+                entry[1] += hist.count
+        ranked = sorted(totals.items(), key=lambda item: item[1][0], reverse=True)
+        return [(value, total, int(count)) for value, (total, count) in ranked[:limit]]
+
+    def to_dict(self) -> Dict:
+        """全部指標轉成可序列化的 dict"""
+        with self._lock:
+            return {
+                "histograms": {name: [{"labels": dict(key), **hist.to_dict()}
+                                      for key, hist in series.items()]
+                               for name, series in self._histograms.items()},
+                "counters": {name: [{"labels": dict(key), "value": value}
+                                    for key, value in series.items()]
+                             for name, series in self._counters.items()},
+            }
+
+    def to_prometheus(self) -> str:
+        """
+        輸出 Prometheus 文字格式（直方圖以 summary 型別輸出百分位數）
+
+        Returns:
+            str: 可供 node_exporter textfile collector 讀取的內容
+        """
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} summary")
+                for key, hist in sorted(series.items()):
+                    for q in QUANTILES:
+                        lines.append(f"{name}{_format_labels(key, ('quantile', str(q)))} "
+                                     f"{hist.percentile(q * 100):.6f}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {hist.total:.6f}")
+                    lines.append(f"{name}_count{_format_labels(key)} {hist.count}")
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(key)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, directory: str, basename: str = "metrics") -> Tuple[str, str]:
+        """
+        寫出 JSON 與 Prometheus 兩種格式
+
+        Args:
+            directory: 輸出目錄
+            basename: 檔名（不含副檔名）
+
+        Returns:
+            Tuple[str, str]: (JSON 路徑, Prometheus 路徑)
+        """
+        os.makedirs(directory, exist_ok=True)
+        json_path = os.path.join(directory, f"{basename}.json")
+        prom_path = os.path.join(directory, f"{basename}.prom")
+        with open(json_path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        with open(prom_path, "w") as f:
+            f.write(self.to_prometheus())
+        return json_path, prom_path
+
+    def reset(self) -> None:
+        """清除所有指標"""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+# 行程共用的指標登錄
+REGISTRY = MetricsRegistry()
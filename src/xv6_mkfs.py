@@ -0,0 +1,470 @@
+"""
+xv6 檔案系統映像建置模組
+在主機端把檔案直接寫進 fs.img（依 mkfs 的方式配置 inode 與資料區塊），
+測試開機前就能準備好大量檔案或二進位檔，不必透過 console 逐一 echo
+
+格式對應 xv6-riscv 的 mkfs/mkfs.c 與 kernel/fs.c
+
+用法:
+    python src/xv6_mkfs.py out.img --base ../xv6-riscv/fs.img --tree fixtures/
+"""
+
+import argparse
+import errno
+import mmap
+import os
+import posixpath
+import shutil
+import sys
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from xv6_fs import (ADDR, BSIZE, DINODE, DIRENT, DIRSIZ, FSMAGIC, IPB, MAXFILE,
+                    NDIRECT, NINDIRECT, ROOTINO, SUPERBLOCK, T_DEVICE, T_DIR, T_FILE,
+                    Inode, SuperBlock, XV6FileSystem)
+
+
+# kernel/param.h 與 mkfs/mkfs.c 的預設值
+FSSIZE = 2000                   # 映像大小（區塊）
+NINODES = 200                   # inode 數量
+LOGSIZE = 30                    # 日誌區塊數（MAXOPBLOCKS * 3）
+
+BPB = BSIZE * 8                 # 每個 bitmap 區塊涵蓋的區塊數
+
+
+class XV6ImageBuilder:
+    """在既有的 raw fs.img 中新增目錄與檔案"""
+
+    def __init__(self, image_path: str):
+        """
+        開啟 fs.img 以寫入（會直接修改檔案，請先複製一份）
+
+        Args:
+            image_path: raw 格式的 fs.img 路徑
+
+        Raises:
+            ValueError: 不是 xv6 檔案系統映像
+        """
+        self.image_path = image_path
+        with open(image_path, "r+b") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0)
+
+        self.superblock = SuperBlock(*SUPERBLOCK.unpack_from(self._mmap, BSIZE))
+        if self.superblock.magic != FSMAGIC:
+            self.close()
+            raise ValueError(f"superblock magic 不符（0x{self.superblock.magic:08x}）: {image_path}")
+
+        # 配置游標：從上次配置的位置繼續往後找，避免每次都從頭掃描
+        self._next_inode = ROOTINO
+        self._next_block = self.superblock.bmapstart + self.superblock.size // BPB + 1
+        # 目錄 inode -> (檔名 -> inode 編號, 空目錄項位移)，避免每次新增檔案都掃描整個目錄
+        self._dirs: Dict[int, Tuple[Dict[str, int], List[int]]] = {}
+        self._install_log()
+
+    @classmethod
+    def create(cls,
+               image_path: str,
+               size: int = FSSIZE,
+               ninodes: int = NINODES,
+               nlog: int = LOGSIZE) -> "XV6ImageBuilder":
+        """
+        建立只有根目錄的空白映像（等同不帶檔案執行 mkfs）
+
+        Args:
+            image_path: 輸出路徑
+            size: 映像大小（區塊），需要更多空間時可加大
+            ninodes: inode 數量，需要大量檔案時可加大
+            nlog: 日誌區塊數（需與 kernel 的 LOGSIZE 相容）
+
+        Returns:
+            XV6ImageBuilder: 開啟中的建置器
+        """
+        nbitmap = size // BPB + 1
+        ninodeblocks = ninodes // IPB + 1
+        nmeta = 2 + nlog + ninodeblocks + nbitmap
+        if size <= nmeta:
+            raise ValueError(f"映像太小: {size} 個區塊，中繼資料就需要 {nmeta} 個")
+
+        with open(image_path, "wb") as f:
+            f.truncate(size * BSIZE)
+            f.seek(BSIZE)
+            f.write(SUPERBLOCK.pack(FSMAGIC, size, size - nmeta, ninodes, nlog,
+                                    2, 2 + nlog, 2 + nlog + ninodeblocks))
+
+        builder = cls(image_path)
+        # 中繼資料區塊（boot、superblock、日誌、inode、bitmap）標記為已使用
+        for blockno in range(nmeta):
+            builder._set_bit(blockno, True)
+
+        root = builder._ialloc(T_DIR)
+        builder._dirlink(root, ".", root)
+        builder._dirlink(root, "..", root)
+        return builder
+
+    # ---- 區塊與 inode 配置 ----
+
+    def _install_log(self) -> None:
+        """把已提交但尚未寫回的日誌區塊寫回原位（xv6 開機時的 recover_from_log）"""
+        sb = self.superblock
+        if sb.nlog == 0:
+            return
+        header = sb.logstart * BSIZE
+        (count,) = ADDR.unpack_from(self._mmap, header)
+        for i in range(min(count, sb.nlog - 1)):
+            (dest,) = ADDR.unpack_from(self._mmap, header + 4 * (i + 1))
+            src = (sb.logstart + 1 + i) * BSIZE
+            self._mmap[dest * BSIZE:(dest + 1) * BSIZE] = self._mmap[src:src + BSIZE]
+        ADDR.pack_into(self._mmap, header, 0)
+
+    def _bit_position(self, blockno: int) -> Tuple[int, int]:
+        """區塊在 bitmap 中的 (位元組位置, 遮罩)"""
+        bitmap_block = self.superblock.bmapstart + blockno // BPB
+        bit = blockno % BPB
+        return bitmap_block * BSIZE + bit // 8, 1 << (bit % 8)
+
+    def _set_bit(self, blockno: int, used: bool) -> None:
+        offset, mask = self._bit_position(blockno)
+        if used:
+            self._mmap[offset] |= mask
+        else:
+            self._mmap[offset] &= ~mask & 0xFF
+
+    def _balloc(self) -> int:
+        """配置一個清空的資料區塊"""
+        for blockno in range(self._next_block, self.superblock.size):
+            offset, mask = self._bit_position(blockno)
+            if not self._mmap[offset] & mask:
+                self._mmap[offset] |= mask
+                self._mmap[blockno * BSIZE:(blockno + 1) * BSIZE] = bytes(BSIZE)
+                self._next_block = blockno + 1
+                return blockno
+        raise OSError(errno.ENOSPC, f"fs.img 的資料區塊已用完（{self.superblock.size} 個區塊）")
+
+    def _bfree(self, blockno: int) -> None:
+        self._set_bit(blockno, False)
+        self._next_block = min(self._next_block, blockno)
+
+    def _inode_offset(self, inum: int) -> int:
+        return (self.superblock.inodestart + inum // IPB) * BSIZE + (inum % IPB) * DINODE.size
+
+    def _read_inode(self, inum: int) -> Inode:
+        fields = DINODE.unpack_from(self._mmap, self._inode_offset(inum))
+        return Inode(inum, *fields[:5], list(fields[5:]))
+
+    def _write_inode(self, inode: Inode) -> None:
+        DINODE.pack_into(self._mmap, self._inode_offset(inode.inum), inode.type, inode.major,
+                         inode.minor, inode.nlink, inode.size, *inode.addrs)
+
+    def _ialloc(self, kind: int, major: int = 0, minor: int = 0) -> int:
+        """配置一個 inode（nlink 為 1，與 mkfs 相同）"""
+        for inum in range(self._next_inode, self.superblock.ninodes):
+            if DINODE.unpack_from(self._mmap, self._inode_offset(inum))[0] == 0:
+                self._write_inode(Inode(inum, kind, major, minor, 1, 0, [0] * (NDIRECT + 1)))
+                self._next_inode = inum + 1
+                return inum
+        raise OSError(errno.ENOSPC, f"fs.img 的 inode 已用完（{self.superblock.ninodes} 個）")
+
+    def _bmap(self, inode: Inode, bn: int) -> int:
+        """第 bn 個資料區塊的區塊編號，尚未配置時配置（對應 kernel/fs.c 的 bmap）"""
+        if bn < NDIRECT:
+            if not inode.addrs[bn]:
+                inode.addrs[bn] = self._balloc()
+            return inode.addrs[bn]
+        bn -= NDIRECT
+        if bn >= NINDIRECT:
+            raise ValueError(f"超過 xv6 檔案大小上限（{MAXFILE * BSIZE} bytes）")
+        if not inode.addrs[NDIRECT]:
+            inode.addrs[NDIRECT] = self._balloc()
+        entry = inode.addrs[NDIRECT] * BSIZE + 4 * bn
+        (blockno,) = ADDR.unpack_from(self._mmap, entry)
+        if not blockno:
+            blockno = self._balloc()
+            ADDR.pack_into(self._mmap, entry, blockno)
+        return blockno
+
+    def _block_of(self, inode: Inode, bn: int) -> int:
+        """第 bn 個資料區塊的區塊編號，不配置區塊；尚未配置時返回 0"""
+        if bn < NDIRECT:
+            return inode.addrs[bn]
+        bn -= NDIRECT
+        if bn >= NINDIRECT or not inode.addrs[NDIRECT]:
+            return 0
+        (blockno,) = ADDR.unpack_from(self._mmap, inode.addrs[NDIRECT] * BSIZE + 4 * bn)
+        return blockno
+
+    def _truncate(self, inode: Inode) -> Inode:
+        """釋放 inode 的所有資料區塊"""
+        for blockno in inode.addrs[:NDIRECT]:
+            if blockno:
+                self._bfree(blockno)
+        if inode.addrs[NDIRECT]:
+            base = inode.addrs[NDIRECT] * BSIZE
+            for i in range(NINDIRECT):
+                (blockno,) = ADDR.unpack_from(self._mmap, base + 4 * i)
+                if blockno:
+                    self._bfree(blockno)
+            self._bfree(inode.addrs[NDIRECT])
+        return inode._replace(size=0, addrs=[0] * (NDIRECT + 1))
+
+    def _write_data(self, inum: int, data: bytes) -> None:
+        """以 data 取代 inode 的內容"""
+        if len(data) > MAXFILE * BSIZE:
+            raise ValueError(f"檔案 {len(data)} bytes 超過 xv6 上限（{MAXFILE * BSIZE} bytes）")
+        inode = self._truncate(self._read_inode(inum))
+        view = memoryview(data)
+        for bn, offset in enumerate(range(0, len(data), BSIZE)):
+            blockno = self._bmap(inode, bn)
+            chunk = view[offset:offset + BSIZE]
+            self._mmap[blockno * BSIZE:blockno * BSIZE + len(chunk)] = chunk
+        self._write_inode(inode._replace(size=len(data)))
+
+    # ---- 目錄 ----
+
+    def _entries(self, inum: int) -> Iterator[Tuple[int, int, str]]:
+        """列出目錄的 (目錄項位移, inode 編號, 檔名)，包含已刪除的空位；讀取不會配置區塊"""
+        inode = self._read_inode(inum)
+        for off in range(0, inode.size, DIRENT.size):
+            blockno = self._block_of(inode, off // BSIZE)
+            if not blockno:
+                # 損壞的映像中目錄有未配置的區塊：當作沒有目錄項
+                continue
+            entry_inum, name = DIRENT.unpack_from(self._mmap, blockno * BSIZE + off % BSIZE)
+            yield blockno * BSIZE + off % BSIZE, entry_inum, name.split(b"\0", 1)[0].decode()
+
+    def _dir_index(self, dir_inum: int) -> Tuple[Dict[str, int], List[int]]:
+        """目錄的檔名索引與空目錄項（第一次使用時掃描一次）"""
+        if dir_inum not in self._dirs:
+            names: Dict[str, int] = {}
+            free = []
+            for offset, inum, name in self._entries(dir_inum):
+                if inum:
+                    names.setdefault(name, inum)
+                else:
+                    free.append(offset)
+            self._dirs[dir_inum] = (names, free)
+        return self._dirs[dir_inum]
+
+    def _dirlookup(self, dir_inum: int, name: str) -> Optional[int]:
+        # xv6 比對檔名時只看前 DIRSIZ 個字元
+        return self._dir_index(dir_inum)[0].get(name[:DIRSIZ])
+
+    def _dirlink(self, dir_inum: int, name: str, inum: int) -> None:
+        """在目錄中加入目錄項（優先使用已刪除項目留下的空位）"""
+        encoded = name.encode()
+        if not encoded or len(encoded) > DIRSIZ or "/" in name:
+            raise ValueError(f"無效的 xv6 檔名（最多 {DIRSIZ} 個位元組）: {name!r}")
+
+        names, free = self._dir_index(dir_inum)
+        names[name] = inum
+        if free:
+            DIRENT.pack_into(self._mmap, free.pop(0), inum, encoded)
+            return
+
+        inode = self._read_inode(dir_inum)
+        blockno = self._bmap(inode, inode.size // BSIZE)
+        DIRENT.pack_into(self._mmap, blockno * BSIZE + inode.size % BSIZE, inum, encoded)
+        self._write_inode(inode._replace(size=inode.size + DIRENT.size))
+
+    def _resolve(self, path: str) -> Optional[int]:
+        inum = ROOTINO
+        for name in path.split("/"):
+            if not name:
+                continue
+            if self._read_inode(inum).type != T_DIR:
+                return None
+            inum = self._dirlookup(inum, name)
+            if inum is None:
+                return None
+        return inum
+
+    # ---- 公開介面 ----
+
+    def mkdir(self, path: str) -> int:
+        """
+        建立目錄（包含不存在的上層目錄），已存在時直接返回
+
+        Args:
+            path: 目錄路徑
+
+        Returns:
+            int: 目錄的 inode 編號
+        """
+        inum = ROOTINO
+        for name in path.split("/"):
+            if not name:
+                continue
+            child = self._dirlookup(inum, name)
+            if child is None:
+                child = self._ialloc(T_DIR)
+                self._dirlink(child, ".", child)
+                self._dirlink(child, "..", inum)
+                self._dirlink(inum, name, child)
+                # ".." 指回上層目錄（kernel/sysfile.c 的 create 同樣會增加 nlink）
+                parent = self._read_inode(inum)
+                self._write_inode(parent._replace(nlink=parent.nlink + 1))
+            elif self._read_inode(child).type != T_DIR:
+                raise NotADirectoryError(path)
+            inum = child
+        return inum
+
+    def _create(self, path: str, kind: int, major: int = 0, minor: int = 0) -> int:
+        """建立（或沿用既有的）檔案 inode"""
+        parent, name = posixpath.split(path.rstrip("/"))
+        dir_inum = self.mkdir(parent)
+        inum = self._dirlookup(dir_inum, name)
+        if inum is not None:
+            if self._read_inode(inum).type == T_DIR:
+                raise IsADirectoryError(path)
+            return inum
+        inum = self._ialloc(kind, major, minor)
+        self._dirlink(dir_inum, name, inum)
+        return inum
+
+    def add_file(self, path: str, data: bytes) -> int:
+        """
+        寫入檔案（上層目錄不存在時自動建立，檔案已存在時覆寫）
+
+        Args:
+            path: 檔案路徑
+            data: 檔案內容（最多 MAXFILE * BSIZE bytes）
+
+        Returns:
+            int: 檔案的 inode 編號
+        """
+        inum = self._create(path, T_FILE)
+        self._write_data(inum, data)
+        return inum
+
+    def add_device(self, path: str, major: int, minor: int = 0) -> int:
+        """建立裝置檔（例如 console 為 major 1）"""
+        return self._create(path, T_DEVICE, major, minor)
+
+    def add_files(self, files: Dict[str, bytes]) -> List[int]:
+        """
+        一次寫入多個檔案
+
+        Args:
+            files: 路徑 -> 內容
+
+        Returns:
+            List[int]: 各檔案的 inode 編號
+        """
+        return [self.add_file(path, data) for path, data in files.items()]
+
+    def add_tree(self, host_dir: str, dest: str = "/") -> int:
+        """
+        把主機上的目錄樹複製到映像中
+
+        Args:
+            host_dir: 主機目錄
+            dest: 映像中的目的目錄
+
+        Returns:
+            int: 寫入的檔案數
+        """
+        count = 0
+        for root, dirs, names in os.walk(host_dir):
+            dirs.sort()
+            rel = os.path.relpath(root, host_dir)
+            target = posixpath.join(dest, "" if rel == "." else rel.replace(os.sep, "/"))
+            self.mkdir(target)
+            for name in sorted(names):
+                with open(os.path.join(root, name), "rb") as f:
+                    self.add_file(posixpath.join(target, name), f.read())
+                count += 1
+        return count
+
+    def close(self) -> None:
+        """寫回並關閉映像"""
+        if self._mmap is not None:
+            self._mmap.flush()
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def _copy_filesystem(source: XV6FileSystem, builder: XV6ImageBuilder) -> None:
+    """把既有映像的目錄樹（檔案、目錄、裝置檔）複製到另一個映像"""
+    for dirpath, dirnames, filenames in source.walk():
+        builder.mkdir(dirpath)
+        for name in filenames:
+            path = posixpath.join(dirpath, name)
+            inode = source.lookup(path)
+            if inode.type == T_DEVICE:
+                builder.add_device(path, inode.major, inode.minor)
+            else:
+                builder.add_file(path, source.read_inode(inode))
+
+
+def build_image(dest: str,
+                base: Optional[str] = None,
+                files: Optional[Dict[str, bytes]] = None,
+                tree: Optional[str] = None,
+                size: Optional[int] = None,
+                ninodes: Optional[int] = None) -> str:
+    """
+    以 base 為基礎建立預先放好測試檔案的 fs.img
+
+    未指定 size/ninodes 時直接複製 base 再寫入；指定時以新的大小重新建立映像，
+    並把 base 的內容（user 程式等）搬過去，適合需要上千個檔案或大量資料的測試
+
+    Args:
+        dest: 輸出路徑
+        base: 原始 fs.img（通常是 xv6 目錄中的 fs.img），None 則建立空白映像
+        files: 要寫入的檔案（路徑 -> 內容）
+        tree: 要複製進去的主機目錄
+        size: 映像大小（區塊）
+        ninodes: inode 數量
+
+    Returns:
+        str: dest
+
+    Example:
+        image = build_image("/tmp/fs.img", base="../xv6-riscv/fs.img", ninodes=4000,
+                            size=20000, files={f"f{i}": b"x" for i in range(3000)})
+        harness = XV6TestHarness(fs_image=image, disk_overlay=True)
+    """
+    if base and size is None and ninodes is None:
+        shutil.copyfile(base, dest)
+        builder = XV6ImageBuilder(dest)
+    else:
+        source = XV6FileSystem(base) if base else None
+        if source:
+            size = size or source.superblock.size
+            ninodes = ninodes or source.superblock.ninodes
+        builder = XV6ImageBuilder.create(dest, size or FSSIZE, ninodes or NINODES)
+        if source:
+            with source:
+                _copy_filesystem(source, builder)
+
+    with builder:
+        if tree:
+            builder.add_tree(tree)
+        if files:
+            builder.add_files(files)
+    return dest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="建立預先放好檔案的 xv6 fs.img")
+    parser.add_argument("output", help="輸出的 fs.img 路徑")
+    parser.add_argument("--base", default="../xv6-riscv/fs.img", help="原始 fs.img")
+    parser.add_argument("--tree", help="要複製進映像的主機目錄")
+    parser.add_argument("--size", type=int, help="映像大小（區塊）")
+    parser.add_argument("--ninodes", type=int, help="inode 數量")
+    args = parser.parse_args()
+
+    build_image(args.output, base=args.base, tree=args.tree,
+                size=args.size, ninodes=args.ninodes)
+    with XV6FileSystem(args.output) as fs:
+        sb = fs.superblock
+        print(f"{args.output}: {sb.size} 個區塊, {sb.ninodes} 個 inode")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""
+xv6 命令輸出緩衝模組
+有界輸出模式：命令輸出邊讀邊處理，記憶體中只保留最後一段（tail），
+同時計算完整輸出的 SHA-256，需要時把完整輸出寫到暫存檔，
+cat 大檔案或 usertests 之類大量輸出的命令不會在記憶體中產生多份完整複本
+"""
+
+import hashlib
+import os
+import tempfile
+from typing import Callable, List, Optional
+
+
+# 開頭這麼多字元先暫存，移除輸入回顯後才開始串流處理
+HEAD_SIZE = 4096
+
+
+class CommandOutput(str):
+    """
+    有界輸出模式下的命令輸出：字串內容是輸出的最後 limit 個字元
+
+    Attributes:
+        total_length: 完整輸出的字元數
+        sha256: 完整輸出（UTF-8）的 SHA-256
+        truncated: 是否只保留了最後一段
+        spill_path: 完整輸出的暫存檔路徑（未啟用時為 None，由呼叫者負責刪除）
+    """
+
+    total_length: int
+    sha256: str
+    truncated: bool
+    spill_path: Optional[str]
+
+    def __new__(cls, text: str, total_length: int, sha256: str,
+                spill_path: Optional[str] = None):
+        output = super().__new__(cls, text)
+        output.total_length = total_length
+        output.sha256 = sha256
+        output.truncated = total_length > len(text)
+        output.spill_path = spill_path
+        return output
+
+
+class OutputSink:
+    """
+    逐段接收原始 console 輸出，只保留最後 limit 個字元
+
+    開頭 HEAD_SIZE 個字元會先暫存，整段輸出比這短時完全依照一般模式清理（clean），
+    結果與不限制輸出時相同；更長時以 strip_head 移除開頭的輸入回顯後開始串流，
+    結尾的空白與 shell 提示符會保留到 finish() 才決定是否屬於輸出
+    """
+
+    def __init__(self,
+                 limit: int,
+                 clean: Callable[[str], str],
+                 strip_head: Callable[[str], str],
+                 spill_dir: Optional[str] = None):
+        """
+        Args:
+            limit: 記憶體中保留的字元數
+            clean: 完整輸出夠短時使用的清理函數（與一般模式相同）
+            strip_head: 移除開頭輸入回顯與提示符的函數
+            spill_dir: 完整輸出暫存檔的目錄，None 則不保存完整輸出
+        """
+        self.limit = limit
+        self._clean = clean
+        self._strip_head = strip_head
+        self._spill_dir = spill_dir
+        self._head: Optional[List[str]] = []  # 串流開始後為 None
+        self._head_length = 0
+        self._pending = ""       # 尚未確定是否為輸出結尾的部分
+        self._tail: List[str] = []
+        self._tail_length = 0
+        self._total = 0
+        self._hash = hashlib.sha256()
+        self._spill = None
+        self._spill_path: Optional[str] = None
+
+    def feed(self, raw: str) -> None:
+        """接收一段原始輸出"""
+        if self._head is not None:
+            self._head.append(raw)
+            self._head_length += len(raw)
+            if self._head_length <= HEAD_SIZE:
+                return
+            # 開頭已足夠長：移除回顯後開始串流
+            text = self._strip_head("".join(self._head).replace("\r\n", "\n")).lstrip()
+            self._head = None
+            self._pending = ""
+            self._push(text)
+        else:
+            self._push(raw)
+
+    def _push(self, text: str) -> None:
+        """正規化換行並輸出確定屬於內容的部分，結尾的空白與提示符暫留"""
+        text = (self._pending + text).replace("\r\n", "\n")
+        body = text[:-2] if text.endswith("$ ") else text
+        cut = min(len(body.rstrip()), len(text) - 2)
+        # 暫留部分只會是空白；大量空白時照常輸出以維持記憶體上限
+        if len(text) - cut > self.limit:
+            cut = len(text) - self.limit
+        if cut > 0:
+            self._emit(text[:cut])
+            text = text[cut:]
+        self._pending = text
+
+    def _emit(self, text: str) -> None:
+        self._total += len(text)
+        data = text.encode("utf-8", "replace")
+        self._hash.update(data)
+        if self._spill_dir is not None:
+            if self._spill is None:
+                fd, self._spill_path = tempfile.mkstemp(prefix="xv6-output-", suffix=".txt",
+                                                        dir=self._spill_dir)
+                self._spill = os.fdopen(fd, "wb")
+            self._spill.write(data)
+
+        self._tail.append(text)
+        self._tail_length += len(text)
+        # 超過兩倍上限才合併裁切，每個字元平均只複製常數次
+        if self._tail_length > 2 * self.limit:
+            kept = "".join(self._tail)[-self.limit:]
+            self._tail, self._tail_length = [kept], len(kept)
+
+    def finish(self) -> CommandOutput:
+        """
+        輸出結束（已看到結束標記）
+
+        Returns:
+            CommandOutput: 最後 limit 個字元與完整輸出的統計
+        """
+        if self._head is not None:
+            # 整段輸出很短：與一般模式完全相同的清理
+            head, self._head = self._head, None
+            self._emit(self._clean("".join(head)))
+        else:
+            text = self._pending[:-2] if self._pending.endswith("$ ") else self._pending
+            if text.rstrip():
+                self._emit(text.rstrip())
+        self._pending = ""
+        if self._spill is not None:
+            self._spill.close()
+        tail = "".join(self._tail)[-self.limit:] if self.limit else ""
+        return CommandOutput(tail, self._total, self._hash.hexdigest(), self._spill_path)
+
+    def discard(self) -> None:
+        """放棄輸出（命令失敗時），刪除暫存檔"""
+        if self._spill is not None:
+            self._spill.close()
+            os.remove(self._spill_path)
+            self._spill = None
@@ -0,0 +1,377 @@
+"""
+xv6 平行測試執行器
+把收集到的測試分配給多個 pytest worker 行程，每個 worker 驅動自己的 QEMU 實例，
+每個 VM 都使用自己的 fs.img 複本，worker 之間不會互相破壞磁碟內容
+
+分配依歷史耗時（上次平行執行的 worker 紀錄與效能歷史資料庫）：同一個測試檔的測試
+併成一組，在同一個 worker 的 VM 池上執行，各組由長到短分給目前負載最小的 worker（LPT），
+結束時比較預測與實際的 makespan
+
+用法:
+    python src/xv6_parallel.py                     # worker 數量 = CPU 核心數
+    python src/xv6_parallel.py -n 4 tests/test_basic.py
+    python src/xv6_parallel.py -n 4 -- -m "not slow"   # -- 之後的參數轉交 pytest
+    python src/xv6_parallel.py --build             # 先透過建置快取確保 xv6 已建置
+    python src/xv6_parallel.py --durations old.json    # 另外載入 XV6_DURATIONS_FILE 格式的耗時
+"""
+
+import argparse
+import glob
+import heapq
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from xv6_build import XV6BuildManager
+from xv6_history import DEFAULT_HISTORY_DB, PerfHistory, weighted_median
+
+
+# 平行執行的報告目錄（每個 worker 的日誌與耗時紀錄）
+REPORT_DIR = os.path.join("reports", "parallel")
+
+# 從效能歷史資料庫載入最近幾次 run 的測試耗時（每個 worker 各自記錄一次 run）
+HISTORY_RUNS = 50
+
+# 沒有任何歷史耗時可以估計時，每個測試的預設耗時（秒）
+DEFAULT_TEST_SECONDS = 1.0
+
+# 同一個測試檔的一組測試最多佔理想單一 worker 負載（總耗時 / worker 數）的比例，
+# 超過時拆成多組，避免一個大測試檔讓單一 worker 拖到最後
+GROUP_FRACTION = 0.25
+
+
+def collect_tests(paths: List[str], pytest_args: Optional[List[str]] = None) -> List[str]:
+    """
+    使用 pytest --collect-only 收集測試的 node id
+
+    Args:
+        paths: 測試檔案或目錄
+        pytest_args: 額外的 pytest 參數（例如 -m "not slow"）
+
+    Returns:
+        List[str]: 測試 node id 列表
+    """
+    cmd = [sys.executable, "-m", "pytest", "--collect-only", "-qq",
+           "-p", "no:cacheprovider"] + (pytest_args or []) + paths
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    return [line.strip() for line in result.stdout.splitlines()
+            if "::" in line and not line.startswith(" ")]
+
+
+def _read_durations(path: str) -> Dict[str, Dict]:
+    """讀取 worker 寫出的測試耗時紀錄（conftest 的 XV6_DURATIONS_FILE）"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def load_durations(report_dir: str = REPORT_DIR,
+                   db_path: Optional[str] = None,
+                   files: Sequence[str] = (),
+                   runs: int = HISTORY_RUNS) -> Dict[str, float]:
+    """
+    載入每個測試的歷史耗時
+
+    依序合併（後者覆蓋前者）：效能歷史資料庫中最近幾次 run 的中位數、
+    report_dir 中上次平行執行的 worker 紀錄、files 指定的 XV6_DURATIONS_FILE 格式檔案
+
+    Args:
+        report_dir: 上次平行執行的報告目錄
+        db_path: 效能歷史資料庫，None 則使用 XV6_HISTORY_DB 或預設位置，空字串則不讀取
+        files: 額外的耗時紀錄（{node id: {"duration": 秒數}} 或 {node id: 秒數}）
+        runs: 從資料庫載入最近幾次 run
+
+    Returns:
+        Dict[str, float]: node id -> 秒數
+    """
+    if db_path is None:
+        db_path = os.environ.get("XV6_HISTORY_DB", DEFAULT_HISTORY_DB)
+    durations: Dict[str, float] = {}
+    if db_path and os.path.isfile(db_path):
+        with PerfHistory(db_path) as history:
+            for nodeid, samples in history.recent_samples("test", runs).items():
+                durations[nodeid] = weighted_median(samples)
+
+    paths = sorted(glob.glob(os.path.join(report_dir, "worker-*.json"))) + list(files)
+    for path in paths:
+        for nodeid, entry in _read_durations(path).items():
+            durations[nodeid] = entry["duration"] if isinstance(entry, dict) else float(entry)
+    return durations
+
+
+def estimate_durations(tests: List[str], durations: Dict[str, float]) -> Dict[str, float]:
+    """
+    每個測試的預測耗時
+
+    沒有紀錄的測試以同一個測試檔中有紀錄的測試的中位數估計，
+    整個檔案都沒有紀錄時使用所有紀錄的中位數，完全沒有紀錄時為 DEFAULT_TEST_SECONDS
+
+    Args:
+        tests: 測試 node id 列表
+        durations: load_durations() 的結果
+
+    Returns:
+        Dict[str, float]: node id -> 預測秒數
+    """
+    known = [durations[t] for t in tests if t in durations] or list(durations.values())
+    fallback = statistics.median(known) if known else DEFAULT_TEST_SECONDS
+    by_module: Dict[str, List[float]] = {}
+    for nodeid, seconds in durations.items():
+        by_module.setdefault(nodeid.split("::")[0], []).append(seconds)
+
+    estimates = {}
+    for test in tests:
+        if test in durations:
+            estimates[test] = durations[test]
+        else:
+            module = by_module.get(test.split("::")[0])
+            estimates[test] = statistics.median(module) if module else fallback
+    return estimates
+
+
+def group_tests(tests: List[str],
+                estimates: Dict[str, float],
+                max_seconds: float) -> List[List[str]]:
+    """
+    把同一個測試檔的測試併成一組
+
+    同一組在同一個 worker 上依原本的順序執行，共用測試檔的 fixture 與 worker 的預先開機
+    VM 池；一組的預測耗時超過 max_seconds 時依序拆成多組
+
+    Args:
+        tests: 測試 node id 列表（收集順序）
+        estimates: 每個測試的預測耗時
+        max_seconds: 一組的預測耗時上限（單一測試超過上限時自成一組）
+
+    Returns:
+        List[List[str]]: 各組的測試列表
+    """
+    modules: Dict[str, List[str]] = {}
+    for test in tests:
+        modules.setdefault(test.split("::")[0], []).append(test)
+
+    groups = []
+    for module_tests in modules.values():
+        current: List[str] = []
+        load = 0.0
+        for test in module_tests:
+            if current and load + estimates[test] > max_seconds:
+                groups.append(current)
+                current, load = [], 0.0
+            current.append(test)
+            load += estimates[test]
+        groups.append(current)
+    return groups
+
+
+def schedule(tests: List[str],
+             workers: int,
+             durations: Dict[str, float],
+             group: bool = True) -> Tuple[List[List[str]], List[float]]:
+    """
+    依預測耗時分配測試，使最晚結束的 worker 盡早結束（最小化 makespan）
+
+    各組由長到短依序分給目前預測負載最小的 worker（LPT，最差為最佳解的 4/3 倍）
+
+    Args:
+        tests: 測試 node id 列表
+        workers: worker 數量
+        durations: 歷史耗時（load_durations() 的結果）
+        group: 是否把同一個測試檔的測試併成一組，False 則逐一分配
+
+    Returns:
+        Tuple[List[List[str]], List[float]]: (每個 worker 的測試列表, 每個 worker 的預測耗時)，
+                                            不含空的 worker
+    """
+    estimates = estimate_durations(tests, durations)
+    workers = max(1, min(workers, len(tests)))
+    if group:
+        ideal = sum(estimates.values()) / workers
+        groups = group_tests(tests, estimates, max(ideal * GROUP_FRACTION, DEFAULT_TEST_SECONDS))
+    else:
+        groups = [[test] for test in tests]
+
+    # 穩定排序：耗時相同的組維持收集順序
+    sized = sorted(((sum(estimates[t] for t in g), i, g) for i, g in enumerate(groups)),
+                   key=lambda item: (-item[0], item[1]))
+    heap = [(0.0, worker) for worker in range(workers)]
+    buckets: List[List[str]] = [[] for _ in range(workers)]
+    loads = [0.0] * workers
+    for seconds, _, tests_in_group in sized:
+        load, worker = heapq.heappop(heap)
+        buckets[worker].extend(tests_in_group)
+        loads[worker] = load + seconds
+        heapq.heappush(heap, (loads[worker], worker))
+
+    assigned = [(bucket, load) for bucket, load in zip(buckets, loads) if bucket]
+    return [bucket for bucket, _ in assigned], [load for _, load in assigned]
+
+
+def run_parallel(paths: List[str],
+                 workers: Optional[int] = None,
+                 pytest_args: Optional[List[str]] = None,
+                 report_dir: str = REPORT_DIR,
+                 durations: Optional[Dict[str, float]] = None,
+                 group: bool = True) -> Dict:
+    """
+    平行執行測試
+
+    Args:
+        paths: 測試檔案或目錄
+        workers: worker 數量，None 則使用 CPU 核心數
+        pytest_args: 額外的 pytest 參數
+        report_dir: 報告輸出目錄
+        durations: 每個測試的歷史耗時，None 則以 load_durations() 載入
+        group: 是否把同一個測試檔的測試分到同一個 worker（見 schedule()）
+
+    Returns:
+        Dict: 執行摘要（各 worker 結果與預測耗時、預測與實際的 makespan、
+              wall-clock、序列估計時間與加速倍數）
+    """
+    workers = workers or os.cpu_count() or 1
+    pytest_args = pytest_args or []
+    tests = collect_tests(paths, pytest_args)
+    if durations is None:
+        durations = load_durations(report_dir)
+    buckets, predicted = schedule(tests, workers, durations, group)
+    os.makedirs(report_dir, exist_ok=True)
+    # 上次的 worker 紀錄已經載入；清除避免 worker 數變少時留下舊的檔案
+    for path in glob.glob(os.path.join(report_dir, "worker-*.json")):
+        os.remove(path)
+
+    start = time.time()
+    running = []
+    for worker_id, bucket in enumerate(buckets):
+        durations_file = os.path.join(report_dir, f"worker-{worker_id}.json")
+        log_path = os.path.join(report_dir, f"worker-{worker_id}.log")
+
+        env = dict(os.environ,
+                   XV6_WORKER_ID=str(worker_id),
+                   XV6_DURATIONS_FILE=durations_file)
+        # 每個 worker 已經是一個平行單位，預設只預先開機一台
+        env.setdefault("XV6_POOL_SIZE", "1")
+
+        cmd = [sys.executable, "-m", "pytest", "-p", "no:cacheprovider",
+               "-o", f"log_file={os.path.join(report_dir, f'worker-{worker_id}.pytest.log')}"]
+        cmd += pytest_args + bucket
+
+        log = open(log_path, "w")
+        process = subprocess.Popen(cmd, stdout=log, stderr=subprocess.STDOUT, env=env)
+        running.append({"id": worker_id, "tests": bucket, "process": process, "log": log,
+                        "durations_file": durations_file, "start": time.time(),
+                        "predicted": predicted[worker_id]})
+
+    # 輪詢等待，記錄每個 worker 的結束時間
+    results = []
+    while running:
+        for worker in list(running):
+            returncode = worker["process"].poll()
+            if returncode is None:
+                continue
+            worker["log"].close()
+            running.remove(worker)
+
+            recorded = _read_durations(worker["durations_file"])
+            outcomes = [entry["outcome"] for entry in recorded.values()]
+            results.append({
+                "worker": worker["id"],
+                "tests": len(worker["tests"]),
+                "returncode": returncode,
+                "predicted_time": worker["predicted"],
+                "wall_time": time.time() - worker["start"],
+                "test_time": sum(entry["duration"] for entry in recorded.values()),
+                "passed": outcomes.count("passed"),
+                "failed": outcomes.count("failed"),
+                "skipped": outcomes.count("skipped"),
+                "durations": {nodeid: entry["duration"] for nodeid, entry in recorded.items()},
+            })
+        time.sleep(0.1)
+
+    wall = time.time() - start
+    # 序列執行時間以所有測試耗時總和估計
+    serial = sum(result["test_time"] for result in results)
+    results.sort(key=lambda result: result["worker"])
+
+    summary = {
+        "workers": len(buckets),
+        "tests": len(tests),
+        "passed": sum(result["passed"] for result in results),
+        "failed": sum(result["failed"] for result in results),
+        "skipped": sum(result["skipped"] for result in results),
+        "wall_time": wall,
+        # makespan 以測試耗時計（不含 pytest 啟動與 VM 池開機），與預測直接比較
+        "predicted_makespan": max(predicted, default=0.0),
+        "makespan": max((result["test_time"] for result in results), default=0.0),
+        "known_durations": sum(1 for test in tests if test in durations),
+        "serial_time": serial,
+        "speedup": serial / wall if wall > 0 else 0.0,
+        "results": results,
+    }
+    with open(os.path.join(report_dir, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def print_summary(summary: Dict) -> None:
+    """印出平行執行摘要"""
+    print("=== xv6 平行測試結果 ===")
+    for result in summary["results"]:
+        print(f"worker {result['worker']:>2}: {result['tests']:>3} 個測試  "
+              f"passed={result['passed']} failed={result['failed']} "
+              f"skipped={result['skipped']}  {result['wall_time']:.1f}s  "
+              f"（測試 {result['test_time']:.1f}s，預測 {result['predicted_time']:.1f}s）")
+    print(f"\n總計: {summary['passed']} passed, {summary['failed']} failed, "
+          f"{summary['skipped']} skipped（共 {summary['tests']} 個測試，{summary['workers']} 個 worker）")
+    print(f"wall-clock: {summary['wall_time']:.1f}s  "
+          f"序列估計: {summary['serial_time']:.1f}s  "
+          f"加速: {summary['speedup']:.2f}x")
+    print(f"makespan: 實際 {summary['makespan']:.1f}s  預測 {summary['predicted_makespan']:.1f}s"
+          f"（{summary['known_durations']}/{summary['tests']} 個測試有歷史耗時）")
+
+
+def main():
+    argv = sys.argv[1:]
+    pytest_args: List[str] = []
+    if "--" in argv:
+        index = argv.index("--")
+        argv, pytest_args = argv[:index], argv[index + 1:]
+
+    parser = argparse.ArgumentParser(description="以多個 QEMU 實例平行執行 xv6 測試")
+    parser.add_argument("paths", nargs="*", default=["tests"], help="測試檔案或目錄")
+    parser.add_argument("-n", "--workers", type=int, default=None,
+                        help="worker 數量（預設為 CPU 核心數）")
+    parser.add_argument("--report-dir", default=REPORT_DIR, help="報告輸出目錄")
+    parser.add_argument("--build", action="store_true",
+                        help="執行前透過建置快取確保 xv6 已建置（只建置一次，worker 共用）")
+    parser.add_argument("--xv6-path", default="../xv6-riscv", help="xv6-riscv 原始碼路徑")
+    parser.add_argument("--durations", action="append", default=[],
+                        help="另外載入的測試耗時紀錄（XV6_DURATIONS_FILE 格式，可重複指定）")
+    parser.add_argument("--no-group", action="store_true",
+                        help="不把同一個測試檔的測試分到同一個 worker")
+    args = parser.parse_args(argv)
+
+    if args.build:
+        source_hash = XV6BuildManager(args.xv6_path, debug=True).ensure_built()
+        if source_hash is None:
+            return 1
+        print(f"xv6 建置: {source_hash[:12]}")
+
+    durations = load_durations(args.report_dir, files=args.durations)
+    summary = run_parallel(args.paths, args.workers, pytest_args, args.report_dir,
+                           durations, not args.no_group)
+    if not summary["tests"]:
+        print("[ERROR] 沒有收集到任何測試")
+        return 1
+
+    print_summary(summary)
+    return 0 if all(result["returncode"] == 0 for result in summary["results"]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
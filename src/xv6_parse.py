@@ -0,0 +1,189 @@
+"""
+xv6 命令輸出解析模組
+把 ls、wc、usertests 的輸出轉成精簡的結構化紀錄，取代在原始字串上做子字串比對；
+解析結果以輸出字串為鍵值快取，同一份輸出重複解析不會重新計算
+
+用法:
+    success, listing = xv6.run_command("ls", parse="ls")
+    assert "README" in listing and listing["README"].is_file
+"""
+
+import functools
+import re
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from xv6_fs import T_DEVICE, T_DIR, T_FILE
+
+
+# 解析結果快取的項目數
+CACHE_SIZE = 256
+
+
+@dataclass(frozen=True)
+class DirEntry:
+    """ls 的一列：名稱 類型 inode 大小"""
+    __slots__ = ("name", "type", "inum", "size")
+    name: str
+    type: int
+    inum: int
+    size: int
+
+    @property
+    def is_dir(self) -> bool:
+        return self.type == T_DIR
+
+    @property
+    def is_file(self) -> bool:
+        return self.type == T_FILE
+
+    @property
+    def is_device(self) -> bool:
+        return self.type == T_DEVICE
+
+
+class Listing:
+    """
+    ls 的解析結果：依輸出順序的 DirEntry，並可依名稱查詢
+
+    Example:
+        "README" in listing; listing["README"].size; listing.names
+    """
+    __slots__ = ("entries", "_by_name")
+
+    def __init__(self, entries: Tuple[DirEntry, ...]):
+        self.entries = entries
+        self._by_name = {entry.name: entry for entry in entries}
+
+    @property
+    def names(self) -> Tuple[str, ...]:
+        """不含 "." 與 ".." 的檔名"""
+        return tuple(entry.name for entry in self.entries if entry.name not in (".", ".."))
+
+    def get(self, name: str) -> Optional[DirEntry]:
+        return self._by_name.get(name)
+
+    def __getitem__(self, name: str) -> DirEntry:
+        return self._by_name[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._by_name
+
+    def __iter__(self) -> Iterator[DirEntry]:
+        return iter(self.entries)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __repr__(self) -> str:
+        return f"Listing({list(self._by_name)})"
+
+
+@dataclass(frozen=True)
+class WordCount:
+    """wc 的一列：行數 字數 位元組數 檔名（讀取標準輸入時檔名為空字串）"""
+    __slots__ = ("lines", "words", "bytes", "name")
+    lines: int
+    words: int
+    bytes: int
+    name: str
+
+
+@dataclass(frozen=True)
+class UsertestsResult:
+    """
+    usertests 的解析結果
+
+    Attributes:
+        results: (測試名稱, 是否通過) 依執行順序；沒有看到 OK/FAILED 的測試（中斷或當機）不列入
+        all_passed: 是否印出 "ALL TESTS PASSED"
+        incomplete: 最後開始但沒有結果的測試名稱
+    """
+    __slots__ = ("results", "all_passed", "incomplete")
+    results: Tuple[Tuple[str, bool], ...]
+    all_passed: bool
+    incomplete: Optional[str]
+
+    @property
+    def passed(self) -> Tuple[str, ...]:
+        return tuple(name for name, ok in self.results if ok)
+
+    @property
+    def failed(self) -> Tuple[str, ...]:
+        return tuple(name for name, ok in self.results if not ok)
+
+    def as_dict(self) -> Dict[str, bool]:
+        return dict(self.results)
+
+
+# ls: fmtname() 把名稱補空白到 DIRSIZ，後面是 類型 inode 大小
+_LS_LINE = re.compile(r"^(\S.*?)\s+(\d+) (\d+) (\d+)\s*$", re.MULTILINE)
+# wc: "%d %d %d %s"
+_WC_LINE = re.compile(r"^(\d+) (\d+) (\d+) ?(.*?)\s*$", re.MULTILINE)
+# usertests: "test <名稱>: " 之後是 OK 或 FAILED（中間可能夾雜 kernel 訊息）
+_USERTEST_START = re.compile(r"test (\w+): ")
+_USERTEST_RESULT = re.compile(r"\b(OK|FAILED)\b")
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def parse_ls(output: str) -> Listing:
+    """
+    解析 ls 輸出
+
+    "ls: cannot open ..." 等不符合格式的行會被略過
+
+    Args:
+        output: ls 的輸出
+
+    Returns:
+        Listing: 目錄項目
+    """
+    return Listing(tuple(DirEntry(name, int(type_), int(inum), int(size))
+                         for name, type_, inum, size in _LS_LINE.findall(output)))
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def parse_wc(output: str) -> Tuple[WordCount, ...]:
+    """
+    解析 wc 輸出
+
+    Args:
+        output: wc 的輸出（每個檔案一列）
+
+    Returns:
+        Tuple[WordCount, ...]: 每個檔案的計數
+    """
+    return tuple(WordCount(int(lines), int(words), int(nbytes), name)
+                 for lines, words, nbytes, name in _WC_LINE.findall(output))
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def parse_usertests(output: str) -> UsertestsResult:
+    """
+    解析 usertests 輸出
+
+    Args:
+        output: usertests 的輸出
+
+    Returns:
+        UsertestsResult: 每個測試的結果
+    """
+    starts = list(_USERTEST_START.finditer(output))
+    results = []
+    incomplete = None
+    for i, match in enumerate(starts):
+        end = starts[i + 1].start() if i + 1 < len(starts) else len(output)
+        verdict = _USERTEST_RESULT.search(output, match.end(), end)
+        if verdict:
+            results.append((match.group(1), verdict.group(1) == "OK"))
+        else:
+            incomplete = match.group(1)
+    return UsertestsResult(tuple(results), "ALL TESTS PASSED" in output, incomplete)
+
+
+# run_command(parse=...) 可以使用的解析器名稱
+PARSERS: Dict[str, Callable[[str], object]] = {
+    "ls": parse_ls,
+    "wc": parse_wc,
+    "usertests": parse_usertests,
+}
@@ -0,0 +1,229 @@
+"""
+xv6 預先開機 VM 池
+背景執行緒持續維持 N 個已停在 shell 提示符的 XV6TestHarness，
+測試取用時不必等待 QEMU 開機
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+
+from xv6_harness import XV6TestHarness
+
+
+class XV6HarnessPool:
+    """預先開機的 XV6TestHarness 池，每個實例只借出一次，用完即丟棄"""
+
+    def __init__(self,
+                 size: int = 2,
+                 harness_factory: Optional[Callable[[], XV6TestHarness]] = None,
+                 max_memory_mb: Optional[int] = None,
+                 vm_memory_mb: int = 128,
+                 refill_concurrency: int = 1,
+                 debug: bool = False,
+                 **harness_kwargs):
+        """
+        初始化 VM 池
+
+        Args:
+            size: 閒置待命的 VM 數量，0 表示不預先開機（取用時才開機）
+            harness_factory: 建立 harness 的函數，None 則以 harness_kwargs 建立 XV6TestHarness
+            max_memory_mb: 所有 VM（待命 + 開機中 + 使用中）的記憶體上限，None 表示不限制
+            vm_memory_mb: 單一 VM 的記憶體用量（對應 QEMU -m）
+            refill_concurrency: 同時在背景開機的 VM 數量上限
+            debug: 是否啟用除錯模式
+            **harness_kwargs: 傳給 XV6TestHarness 的參數；未指定時預設 isolate_disk=True、
+                              disk_overlay=True（多個 VM 同時開機不能共用同一個 fs.img）
+
+        Raises:
+            ValueError: harness_kwargs 關閉了私有磁碟（池中的 VM 會共用同一個 fs.img）
+        """
+        self.size = size
+        self.debug = debug
+        # 池中的 VM 會同時執行，預設讓每個實例使用自己的 fs.img 覆蓋層（copy-on-write）
+        harness_kwargs.setdefault("isolate_disk", True)
+        harness_kwargs.setdefault("disk_overlay", True)
+        if harness_factory is None and not harness_kwargs.get("use_snapshot") and \
+                not (harness_kwargs["isolate_disk"] or harness_kwargs["disk_overlay"]):
+            raise ValueError("池中的 VM 不能共用 fs.img，請保留 isolate_disk 或 disk_overlay")
+        self.harness_factory = harness_factory or (lambda: XV6TestHarness(**harness_kwargs))
+        # 記憶體預算換算成同時存在的 VM 數量上限
+        self.max_vms = None if max_memory_mb is None else max(1, max_memory_mb // vm_memory_mb)
+
+        self._idle: "queue.Queue[Optional[XV6TestHarness]]" = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, refill_concurrency),
+                                            thread_name_prefix="xv6-pool")
+        self._lock = threading.Lock()
+        self._pending = 0   # 背景開機中的數量
+        self._in_use = 0    # 已借出的數量
+        self._closed = False
+
+        self._stats = {
+            "acquires": 0,
+            "hits": 0,
+            "misses": 0,
+            "boots": 0,
+            "boot_failures": 0,
+            "total_wait": 0.0,
+            "max_wait": 0.0,
+        }
+
+    def start(self) -> None:
+        """開始在背景預先開機"""
+        self._refill()
+
+    def _live_vms(self) -> int:
+        """目前存在的 VM 數量（呼叫者需持有 _lock）"""
+        return self._idle.qsize() + self._pending + self._in_use
+
+    def _refill(self) -> None:
+        """補足待命 VM 數量，同時遵守記憶體預算"""
+        with self._lock:
+            while not self._closed and self._idle.qsize() + self._pending < self.size:
+                if self.max_vms is not None and self._live_vms() >= self.max_vms:
+                    break
+                self._pending += 1
+                self._executor.submit(self._boot_one)
+
+    def _boot_one(self) -> None:
+        """背景執行緒：開機一個 VM 並放入待命佇列"""
+        harness = None
+        success = False
+        try:
+            harness = self.harness_factory()
+            success = harness.start()
+        except Exception as e:
+            if self.debug:
+                print(f"[DEBUG] 背景開機失敗: {e}")
+        finally:
+            # 不論開機是否拋出例外都要減少 _pending，否則池永遠不會補上這個位置
+            with self._lock:
+                self._pending -= 1
+                self._stats["boots"] += 1
+                if not success:
+                    self._stats["boot_failures"] += 1
+                closed = self._closed
+
+        if (closed or not success) and harness is not None:
+            harness.stop()
+        if closed:
+            return
+
+        # 開機失敗時放入 None，讓等待中的 acquire() 立即返回失敗而不是一直卡住
+        self._idle.put(harness if success else None)
+
+    def acquire(self, timeout: Optional[float] = None) -> Optional[XV6TestHarness]:
+        """
+        借出一個已開機的 VM
+
+        Args:
+            timeout: 最長等待時間（秒），None 表示一直等待
+
+        Returns:
+            Optional[XV6TestHarness]: 已停在 shell 提示符的 harness，開機失敗或逾時返回 None
+        """
+        start = time.time()
+        harness = None
+        hit = False
+
+        if self.size == 0:
+            # 不預先開機：直接在目前執行緒開機
+            harness = self.harness_factory()
+            if not harness.start():
+                harness.stop()
+                harness = None
+            with self._lock:
+                self._stats["boots"] += 1
+                if harness is None:
+                    self._stats["boot_failures"] += 1
+        else:
+            try:
+                harness = self._idle.get_nowait()
+                hit = harness is not None
+            except queue.Empty:
+                # 沒有待命的 VM：確認有在開機，然後等待
+                self._refill()
+                try:
+                    harness = self._idle.get(timeout=timeout)
+                except queue.Empty:
+                    harness = None
+
+        wait = time.time() - start
+        with self._lock:
+            self._stats["acquires"] += 1
+            self._stats["hits" if hit else "misses"] += 1
+            self._stats["total_wait"] += wait
+            self._stats["max_wait"] = max(self._stats["max_wait"], wait)
+            if harness is not None:
+                self._in_use += 1
+
+        if self.debug:
+            print(f"[DEBUG] 取得 VM ({'hit' if hit else 'miss'})，等待 {wait:.2f} 秒")
+
+        # 立即在背景補一台
+        self._refill()
+        return harness
+
+    def release(self, harness: XV6TestHarness) -> None:
+        """
+        歸還 VM：直接關閉丟棄（狀態已被測試修改，不再重複使用）
+
+        Args:
+            harness: acquire() 取得的 harness
+        """
+        harness.stop()
+        with self._lock:
+            self._in_use -= 1
+        # 使用中的數量減少後，記憶體預算可能允許再補一台
+        self._refill()
+
+    @contextmanager
+    def lease(self, timeout: Optional[float] = None) -> Iterator[Optional[XV6TestHarness]]:
+        """以 with 語句借用 VM，離開時自動歸還"""
+        harness = self.acquire(timeout)
+        try:
+            yield harness
+        finally:
+            if harness is not None:
+                self.release(harness)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        取得池的統計資料
+
+        Returns:
+            Dict[str, float]: 命中/未命中次數、等待時間、開機次數與目前數量
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats["idle"] = self._idle.qsize()
+            stats["pending"] = self._pending
+            stats["in_use"] = self._in_use
+        stats["mean_wait"] = stats["total_wait"] / stats["acquires"] if stats["acquires"] else 0.0
+        return stats
+
+    def close(self) -> None:
+        """停止補充並關閉所有待命中的 VM"""
+        with self._lock:
+            self._closed = True
+        self._executor.shutdown(wait=True)
+
+        while True:
+            try:
+                harness = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if harness is not None:
+                harness.stop()
+
+    def __enter__(self):
+        """支援 with 語句的上下文管理"""
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """自動關閉所有 VM"""
+        self.close()
@@ -0,0 +1,145 @@
+"""
+xv6 開機階段計時模組
+記錄 start() 每個階段（建置檢查、磁碟準備、spawn、開機訊息、shell 提示符）的時間點，
+並彙總整個測試階段所有開機的 min/median/p95，找出開機時間花在哪裡
+"""
+
+import math
+import statistics
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+# 開機階段（依發生順序），console 階段以對應的輸出判斷
+BOOT_PHASES = ("build_check", "disk_setup", "spawn", "opensbi",
+               "kernel_booting", "init_sh", "prompt")
+
+# 不一定會出現的階段（沒有私有磁碟、使用 -bios none 時）
+OPTIONAL_PHASES = ("disk_setup", "opensbi")
+
+# console 階段 -> 要等待的輸出（正規表達式）
+CONSOLE_MARKERS = {
+    "opensbi": r"OpenSBI v",              # 使用 -bios none 時不會出現
+    "kernel_booting": r"xv6 kernel is booting",
+    "init_sh": r"init: starting sh",
+    "prompt": r"\$ ",
+}
+
+
+class BootProfile:
+    """
+    單次開機的階段時間點
+
+    Attributes:
+        mode: 啟動方式（direct / make / snapshot / isolated）
+        marks: 階段 -> 距離 start() 開始的秒數（只包含實際經過的階段）
+        success: 是否成功開機
+        waiting_for: 正在等待的階段（開機失敗時就是卡住的階段）
+    """
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.marks: Dict[str, float] = {}
+        self.success = False
+        self.waiting_for: Optional[str] = None
+        self._started = time.perf_counter()
+
+    def mark(self, phase: str) -> None:
+        """記錄階段完成的時間點"""
+        self.marks[phase] = time.perf_counter() - self._started
+        if phase == "prompt":
+            self.success = True
+            self.waiting_for = None
+
+    @property
+    def total(self) -> float:
+        """到最後一個完成階段為止的秒數"""
+        return max(self.marks.values(), default=0.0)
+
+    def durations(self) -> Dict[str, float]:
+        """
+        各階段本身的耗時（與前一個完成階段的差）
+
+        Returns:
+            Dict[str, float]: 階段 -> 秒數，依發生順序
+        """
+        result = {}
+        previous = 0.0
+        for phase in BOOT_PHASES:
+            if phase in self.marks:
+                result[phase] = self.marks[phase] - previous
+                previous = self.marks[phase]
+        return result
+
+    def to_dict(self) -> Dict:
+        """轉成可序列化的 dict"""
+        return {"mode": self.mode, "success": self.success, "total": self.total,
+                "waiting_for": self.waiting_for, "marks": dict(self.marks),
+                "durations": self.durations()}
+
+    def format(self) -> str:
+        """一行文字摘要，例如 "spawn=0.05s kernel_booting=1.20s ..." """
+        parts = [f"{phase}={seconds:.2f}s" for phase, seconds in self.durations().items()]
+        if not self.success and self.waiting_for:
+            parts.append(f"（卡在 {self.waiting_for}）")
+        return " ".join(parts)
+
+
+# 整個行程的開機紀錄（VM 池會在背景執行緒開機，需要鎖保護）
+_profiles: List[BootProfile] = []
+_lock = threading.Lock()
+
+
+def record(profile: BootProfile) -> None:
+    """加入一筆開機紀錄"""
+    with _lock:
+        _profiles.append(profile)
+
+
+def profiles() -> List[BootProfile]:
+    """目前為止的所有開機紀錄"""
+    with _lock:
+        return list(_profiles)
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    """最近秩（nearest-rank）百分位數"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def summarize(records: Optional[List[BootProfile]] = None) -> Dict[str, Dict[str, float]]:
+    """
+    彙總每個階段的耗時
+
+    Args:
+        records: 開機紀錄，None 則使用目前行程的所有紀錄
+
+    Returns:
+        Dict[str, Dict[str, float]]: 階段（另含 "total"）-> count/min/median/p95/max，
+                                     只統計成功的開機
+    """
+    records = [p for p in (profiles() if records is None else records) if p.success]
+    samples: Dict[str, List[float]] = {}
+    for profile in records:
+        for phase, seconds in profile.durations().items():
+            samples.setdefault(phase, []).append(seconds)
+        samples.setdefault("total", []).append(profile.total)
+
+    ordered = [phase for phase in BOOT_PHASES + ("total",) if phase in samples]
+    return {phase: {"count": len(samples[phase]),
+                    "min": min(samples[phase]),
+                    "median": statistics.median(samples[phase]),
+                    "p95": _percentile(samples[phase], 95),
+                    "max": max(samples[phase])}
+            for phase in ordered}
+
+
+def format_summary(summary: Dict[str, Dict[str, float]]) -> str:
+    """把 summarize() 的結果排成表格"""
+    lines = [f"{'階段':<16}{'次數':>6}{'min':>9}{'median':>9}{'p95':>9}{'max':>9}"]
+    for phase, stats in summary.items():
+        lines.append(f"{phase:<16}{stats['count']:>6}{stats['min']:>9.2f}"
+                     f"{stats['median']:>9.2f}{stats['p95']:>9.2f}{stats['max']:>9.2f}")
+    return "\n".join(lines)
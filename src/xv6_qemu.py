@@ -0,0 +1,227 @@
+"""
+QEMU 命令列工具模組
+從 xv6 Makefile 解析出 `make qemu` 實際執行的 QEMU 命令列並快取，
+讓 harness 可以直接執行 qemu-system-riscv64，省去 make 的相依性檢查
+"""
+
+import hashlib
+import json
+import os
+import shlex
+import subprocess
+from typing import Dict, List, Optional, Tuple
+
+
+# QEMU 執行檔名稱
+QEMU = "qemu-system-riscv64"
+QEMU_IMG = "qemu-img"
+
+# 快取目錄（快照、建置產物等），可用環境變數 XV6_CACHE_DIR 覆寫
+DEFAULT_CACHE_DIR = os.environ.get(
+    "XV6_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "xv6-test-framework")
+)
+
+# 決定快取是否失效的檔案（相對於 xv6 目錄）；命令列與 fs.img 的內容無關，
+# 且開機時會寫入 fs.img，不能列入，否則每次開機後都要重新執行 make -n qemu
+_KEY_FILES = ("Makefile", "kernel/kernel")
+
+# 行程內快取: xv6 路徑 -> (鍵值, 命令列)
+_command_cache: Dict[str, Tuple[str, List[str]]] = {}
+
+
+def default_qemu_command(xv6_path: str) -> List[str]:
+    """
+    xv6 Makefile 預設的 QEMUOPTS（無法執行 make 解析時的備援）
+
+    Args:
+        xv6_path: xv6-riscv 原始碼路徑
+
+    Returns:
+        List[str]: QEMU 參數列表
+    """
+    return [
+        QEMU,
+        "-machine", "virt",
+        "-bios", "none",
+        "-kernel", "kernel/kernel",
+        "-m", "128M",
+        "-smp", "3",
+        "-nographic",
+        "-global", "virtio-mmio.force-legacy=false",
+        "-drive", "file=fs.img,if=none,format=raw,id=x0",
+        "-device", "virtio-blk-device,drive=x0,bus=virtio-mmio-bus.0",
+    ]
+
+
+def _cache_key(xv6_path: str) -> str:
+    """依 Makefile 與 kernel 的修改時間計算快取鍵值"""
+    parts = []
+    for name in _KEY_FILES:
+        try:
+            parts.append(f"{name}:{os.stat(os.path.join(xv6_path, name)).st_mtime_ns}")
+        except OSError:
+            parts.append(f"{name}:missing")
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+
+def _disk_cache_path(xv6_path: str) -> str:
+    """磁碟快取檔案路徑（讓不同行程，例如平行 worker，共用解析結果）"""
+    name = hashlib.sha1(xv6_path.encode()).hexdigest()[:16]
+    return os.path.join(DEFAULT_CACHE_DIR, "qemu-commands", f"{name}.json")
+
+
+def parse_make_dry_run(output: str) -> Optional[List[str]]:
+    """
+    從 `make -n qemu` 的輸出中找出 QEMU 命令列
+
+    Args:
+        output: make 的標準輸出
+
+    Returns:
+        Optional[List[str]]: QEMU 參數列表，找不到時返回 None
+    """
+    for line in reversed(output.splitlines()):
+        try:
+            args = shlex.split(line)
+        except ValueError:
+            continue
+        if args and os.path.basename(args[0]).startswith("qemu-system-"):
+            return args
+    return None
+
+
+def resolve_qemu_command(xv6_path: str, debug: bool = False) -> List[str]:
+    """
+    取得 `make qemu` 會執行的 QEMU 命令列
+
+    以 `make -n qemu` 解析一次後快取在記憶體與磁碟，
+    Makefile 或 kernel 的修改時間改變時重新解析
+
+    Args:
+        xv6_path: xv6-riscv 原始碼路徑
+        debug: 是否啟用除錯模式
+
+    Returns:
+        List[str]: QEMU 參數列表（路徑相對於 xv6_path）
+    """
+    xv6_path = os.path.abspath(xv6_path)
+    key = _cache_key(xv6_path)
+
+    cached = _command_cache.get(xv6_path)
+    if cached and cached[0] == key:
+        return list(cached[1])
+
+    cache_file = _disk_cache_path(xv6_path)
+    try:
+        with open(cache_file) as f:
+            data = json.load(f)
+        if data.get("key") == key:
+            _command_cache[xv6_path] = (key, data["command"])
+            return list(data["command"])
+    except (OSError, ValueError, KeyError):
+        pass
+
+    command = None
+    try:
+        result = subprocess.run(["make", "-n", "-s", "-C", xv6_path, "qemu"],
+                                capture_output=True, text=True, timeout=30)
+        command = parse_make_dry_run(result.stdout)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        if debug:
+            print(f"[DEBUG] 無法解析 QEMU 命令列: {e}")
+
+    if command is None:
+        # 備援命令列不寫入磁碟快取，下次仍會嘗試用 make 解析
+        if debug:
+            print("[DEBUG] 使用預設的 QEMU 命令列")
+        command = default_qemu_command(xv6_path)
+    else:
+        try:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            with open(cache_file, "w") as f:
+                json.dump({"key": key, "command": command}, f)
+        except OSError:
+            pass
+
+    _command_cache[xv6_path] = (key, command)
+    return list(command)
+
+
+def with_drive(cmd: List[str], drive: str, drive_format: str = "raw") -> List[str]:
+    """
+    替換命令列中 -drive 的磁碟映像與格式，保留其他選項（if、id 等）
+
+    Args:
+        cmd: QEMU 參數列表
+        drive: 新的磁碟映像路徑
+        drive_format: 新的映像格式
+
+    Returns:
+        List[str]: 替換後的參數列表
+    """
+    cmd = list(cmd)
+    for i, arg in enumerate(cmd[:-1]):
+        if arg != "-drive":
+            continue
+        options = [opt for opt in cmd[i + 1].split(",")
+                   if not opt.startswith(("file=", "format="))]
+        cmd[i + 1] = ",".join([f"file={drive}", f"format={drive_format}"] + options)
+        return cmd
+    raise ValueError("QEMU 命令列中找不到 -drive 參數")
+
+
+def build_qemu_command(xv6_path: str,
+                       drive: str = "fs.img",
+                       drive_format: str = "raw",
+                       extra_args: Optional[List[str]] = None) -> List[str]:
+    """
+    組出直接啟動 xv6 的 QEMU 命令列（需以 xv6_path 為工作目錄執行）
+
+    Args:
+        xv6_path: xv6-riscv 原始碼路徑
+        drive: 磁碟映像路徑（相對路徑以 xv6_path 為基準）
+        drive_format: 磁碟映像格式（raw 或 qcow2）
+        extra_args: 額外附加的 QEMU 參數（例如 -loadvm）
+
+    Returns:
+        List[str]: 可直接交給 pexpect.spawn 的參數列表
+    """
+    cmd = with_drive(resolve_qemu_command(xv6_path), drive, drive_format)
+    if extra_args:
+        cmd.extend(extra_args)
+    return cmd
+
+
+def create_overlay(base: str, dest: str, base_format: str = "raw") -> None:
+    """
+    建立以 base 為 backing file 的 qcow2 覆蓋層（copy-on-write）
+
+    VM 的寫入只會進入覆蓋層，base 保持不變；建立時間與 base 大小無關
+
+    Args:
+        base: 原始磁碟映像（例如 fs.img），會轉成絕對路徑寫入覆蓋層
+        dest: 覆蓋層輸出路徑
+        base_format: base 的映像格式
+
+    Raises:
+        subprocess.CalledProcessError: qemu-img 執行失敗
+    """
+    subprocess.run(
+        [QEMU_IMG, "create", "-q", "-f", "qcow2", "-F", base_format,
+         "-b", os.path.abspath(base), dest],
+        check=True, capture_output=True
+    )
+
+
+def allocated_bytes(path: str) -> int:
+    """
+    檔案實際佔用的磁碟空間（稀疏檔案與 qcow2 覆蓋層只計算已配置的區塊）
+
+    Args:
+        path: 檔案路徑
+
+    Returns:
+        int: 位元組數
+    """
+    return os.stat(path).st_blocks * 512
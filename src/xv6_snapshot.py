@@ -0,0 +1,164 @@
+"""
+xv6 快照模組
+開機一次到 shell 提示符後以 QEMU savevm 存成 qcow2 內部快照，
+之後每次啟動都用 -loadvm 還原，省去完整的開機流程
+"""
+
+import hashlib
+import os
+import shutil
+import subprocess
+import pexpect
+from typing import Dict, List, Optional, Tuple
+
+from xv6_qemu import DEFAULT_CACHE_DIR, build_qemu_command
+
+
+# 快照標籤名稱（儲存在 qcow2 映像內）
+SNAPSHOT_TAG = "xv6-ready"
+
+# 行程內快取: 檔案路徑 -> (stat 簽章, 內容雜湊)，檔案沒有變動時不必重新讀取
+_digest_cache: Dict[str, Tuple[Tuple[int, int], str]] = {}
+
+
+def _content_digest(path: str) -> str:
+    """計算檔案內容的 SHA-256，大小與修改時間不變時使用上次的結果"""
+    st = os.stat(path)
+    signature = (st.st_size, st.st_mtime_ns)
+    cached = _digest_cache.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    _digest_cache[path] = (signature, digest.hexdigest())
+    return _digest_cache[path][1]
+
+
+class XV6Snapshot:
+    """管理「已開機到 shell 提示符」的 QEMU 快照映像"""
+
+    def __init__(self,
+                 xv6_path: str,
+                 cache_dir: Optional[str] = None,
+                 boot_timeout: int = 60,
+                 debug: bool = False):
+        """
+        初始化快照管理器
+
+        Args:
+            xv6_path: xv6-riscv 原始碼路徑
+            cache_dir: 快照存放目錄，None 則使用預設快取目錄
+            boot_timeout: 建立快照時的開機超時時間（秒）
+            debug: 是否啟用除錯模式
+        """
+        self.xv6_path = os.path.abspath(xv6_path)
+        self.cache_dir = os.path.join(cache_dir or DEFAULT_CACHE_DIR, "snapshots")
+        self.boot_timeout = boot_timeout
+        self.debug = debug
+
+    def _cache_key(self) -> str:
+        """
+        依 kernel 的大小、修改時間與 fs.img 的內容計算快照鍵值，重新編譯後快照自動失效；
+        fs.img 以內容比對，只改變修改時間的開機寫入（例如 log header）不會讓快照失效
+        """
+        digest = hashlib.sha1(self.xv6_path.encode())
+        st = os.stat(os.path.join(self.xv6_path, "kernel/kernel"))
+        digest.update(f"kernel/kernel:{st.st_size}:{st.st_mtime_ns}".encode())
+        digest.update(f"fs.img:{_content_digest(os.path.join(self.xv6_path, 'fs.img'))}".encode())
+        return digest.hexdigest()[:16]
+
+    @property
+    def image_path(self) -> str:
+        """目前 kernel/fs.img 對應的快照映像路徑"""
+        return os.path.join(self.cache_dir, f"xv6-{self._cache_key()}.qcow2")
+
+    def ensure(self) -> str:
+        """
+        確保快照存在，不存在時建立
+
+        Returns:
+            str: 快照映像路徑
+        """
+        image = self.image_path
+        if not os.path.isfile(image):
+            self.create(image)
+        return image
+
+    def create(self, image: str) -> None:
+        """
+        冷開機 xv6，等到 shell 提示符後執行 savevm 建立快照
+
+        Args:
+            image: 快照映像輸出路徑
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # 先寫到暫存檔，完成後再改名，避免其他行程讀到半成品
+        tmp_image = f"{image}.{os.getpid()}.tmp"
+
+        # savevm 需要所有可寫磁碟都支援快照，所以先把 raw 的 fs.img 轉成 qcow2
+        subprocess.run(
+            ["qemu-img", "convert", "-f", "raw", "-O", "qcow2",
+             os.path.join(self.xv6_path, "fs.img"), tmp_image],
+            check=True, capture_output=True
+        )
+
+        cmd = build_qemu_command(self.xv6_path, drive=tmp_image, drive_format="qcow2")
+        if self.debug:
+            print(f"[DEBUG] 建立快照: {' '.join(cmd)}")
+
+        process = pexpect.spawn(cmd[0], cmd[1:], cwd=self.xv6_path,
+                                timeout=self.boot_timeout, encoding='utf-8', echo=False)
+        try:
+            process.expect(r'\$ ', timeout=self.boot_timeout)
+
+            # -nographic 下 Ctrl-A c 會在序列埠與 QEMU monitor 之間切換
+            process.send("\x01c")
+            process.expect_exact("(qemu) ")
+            process.sendline(f"savevm {SNAPSHOT_TAG}")
+            process.expect_exact("(qemu) ", timeout=self.boot_timeout)
+            if "Error" in process.before:
+                raise RuntimeError(f"savevm 失敗: {process.before.strip()}")
+
+            process.sendline("quit")
+            process.expect(pexpect.EOF)
+        except BaseException:
+            if os.path.exists(tmp_image):
+                os.remove(tmp_image)
+            raise
+        finally:
+            process.close(force=True)
+
+        os.replace(tmp_image, image)
+
+        if self.debug:
+            print(f"[DEBUG] 快照已建立: {image}")
+
+    def clone(self, dest_dir: str) -> str:
+        """
+        複製一份快照給單一 VM 使用，避免多個實例寫入同一個映像
+
+        Args:
+            dest_dir: 複本存放目錄
+
+        Returns:
+            str: 複本映像路徑
+        """
+        image = self.ensure()
+        dest = os.path.join(dest_dir, "fs.qcow2")
+        shutil.copyfile(image, dest)
+        return dest
+
+    def qemu_command(self, image: str) -> List[str]:
+        """
+        組出從快照複本還原 VM 的 QEMU 命令列
+
+        Args:
+            image: clone() 回傳的快照複本路徑
+
+        Returns:
+            List[str]: QEMU 參數列表
+        """
+        return build_qemu_command(self.xv6_path, drive=image, drive_format="qcow2",
+                                  extra_args=["-loadvm", SNAPSHOT_TAG])
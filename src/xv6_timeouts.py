@@ -0,0 +1,188 @@
+"""
+xv6 自適應命令超時模組
+依歷次執行中每個命令（argv[0]）的耗時分佈決定超時：觀察到的 p99 乘上倍數，
+再限制在下限與上限之間。卡住的命令不必等滿寫死的超時，
+usertests、forktest 等本來就慢的命令在較慢的主機上也不會被切斷；
+樣本不足的命令仍使用預設的超時。統計只以 argv[0] 分組（cat 小檔案與大檔案共用一個 p99），
+因此呼叫端明確指定的超時只會被延長，不會被縮短
+
+耗時來自效能歷史資料庫（conftest 每次測試階段結束時寫入的 xv6_command_seconds），
+執行中完成的命令也會立即加入統計
+
+用法:
+    timeouts = AdaptiveTimeouts.from_history("reports/perf_history.sqlite")
+    xv6 = XV6TestHarness(timeouts=timeouts)
+
+    python src/xv6_timeouts.py                  # 列出目前學到的超時
+"""
+
+import argparse
+import os
+import socket
+import sys
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from xv6_history import DEFAULT_HISTORY_DB, PerfHistory, Samples
+from xv6_metrics import Histogram
+
+# 超時 = p99 × DEFAULT_MULTIPLIER，限制在 [DEFAULT_FLOOR, DEFAULT_CEILING] 秒
+DEFAULT_MULTIPLIER = 3.0
+DEFAULT_FLOOR = 3.0
+DEFAULT_CEILING = 900.0
+
+# 至少要有這麼多個樣本才以歷史決定超時
+MIN_SAMPLES = 10
+
+# 載入最近幾次 run 的樣本（較舊的紀錄可能來自不同的主機負載或 kernel）
+HISTORY_RUNS = 20
+
+
+def command_name(command: str) -> str:
+    """統計的鍵值：命令的 argv[0]（與 xv6_command_seconds 的 command 標籤相同）"""
+    argv = command.split()
+    return argv[0] if argv else ""
+
+
+class AdaptiveTimeouts:
+    """
+    每個命令的耗時統計與由此推算的超時（執行緒安全，可由多個 harness 共用）
+    """
+
+    def __init__(self,
+                 multiplier: float = DEFAULT_MULTIPLIER,
+                 floor: float = DEFAULT_FLOOR,
+                 ceiling: float = DEFAULT_CEILING,
+                 min_samples: int = MIN_SAMPLES):
+        """
+        Args:
+            multiplier: 超時是觀察到的 p99 的幾倍
+            floor: 超時下限（秒），避免極快的命令因偶發的停頓而失敗
+            ceiling: 超時上限（秒）
+            min_samples: 樣本少於這個數量的命令使用呼叫端指定的超時
+        """
+        if multiplier <= 0 or floor <= 0 or ceiling < floor:
+            raise ValueError("multiplier、floor 必須大於 0，且 ceiling 不能小於 floor")
+        self.multiplier = multiplier
+        self.floor = floor
+        self.ceiling = ceiling
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Histogram] = {}
+
+    @classmethod
+    def from_history(cls,
+                     db_path: str = DEFAULT_HISTORY_DB,
+                     runs: int = HISTORY_RUNS,
+                     host: Optional[str] = None,
+                     **kwargs) -> "AdaptiveTimeouts":
+        """
+        以效能歷史資料庫中最近幾次 run 的命令耗時建立
+
+        Args:
+            db_path: PerfHistory 的 SQLite 檔案，不存在時從空的統計開始
+            runs: 載入最近幾次 run
+            host: 只載入這台主機的紀錄，None 則使用目前的主機名稱
+            **kwargs: 傳給 AdaptiveTimeouts 的參數
+
+        Returns:
+            AdaptiveTimeouts: 載入歷史樣本後的實例
+        """
+        timeouts = cls(**kwargs)
+        if os.path.isfile(db_path):
+            with PerfHistory(db_path) as history:
+                samples = history.recent_samples("command", runs, host or socket.gethostname())
+            for name, values in samples.items():
+                timeouts.add_samples(name, values)
+        return timeouts
+
+    def add_samples(self, name: str, samples: Samples) -> None:
+        """
+        加入某個命令的歷史樣本
+
+        Args:
+            name: 命令名稱（argv[0]）
+            samples: [(秒數, 次數)]，例如 Histogram.buckets() 或 PerfHistory 的樣本
+        """
+        with self._lock:
+            hist = self._histograms.setdefault(name, Histogram())
+            for value, count in samples:
+                hist.record(value, count)
+
+    def observe(self, command: str, seconds: float) -> None:
+        """記錄一次完成的命令耗時（超時或失敗的命令不記錄，避免把卡住當成正常耗時）"""
+        with self._lock:
+            self._histograms.setdefault(command_name(command), Histogram()).record(seconds)
+
+    def learned(self, command: str) -> Optional[float]:
+        """
+        由耗時統計推算的超時
+
+        Returns:
+            Optional[float]: p99 × multiplier 限制在 [floor, ceiling] 的秒數，樣本不足時為 None
+        """
+        with self._lock:
+            hist = self._histograms.get(command_name(command))
+            if hist is None or hist.count < self.min_samples:
+                return None
+            p99 = hist.percentile(99)
+        return min(self.ceiling, max(self.floor, p99 * self.multiplier))
+
+    def timeout_for(self, command: str, default: float, explicit: bool = False) -> float:
+        """
+        命令的超時
+
+        Args:
+            command: 完整命令
+            default: 樣本不足時使用的超時（呼叫端指定或 harness 的預設值）
+            explicit: default 是否由呼叫端明確指定；是則學到的超時只用來延長，不會縮短
+
+        Returns:
+            float: 超時秒數
+        """
+        learned = self.learned(command)
+        if learned is None:
+            return default
+        return max(default, learned) if explicit else learned
+
+    def summary(self) -> List[Tuple[str, int, float, Optional[float]]]:
+        """
+        每個命令的統計
+
+        Returns:
+            List[Tuple[str, int, float, Optional[float]]]: (命令, 樣本數, p99, 超時)，
+                                                          依 p99 由慢到快排序，樣本不足時超時為 None
+        """
+        with self._lock:
+            rows = [(name, hist.count, hist.percentile(99))
+                    for name, hist in self._histograms.items()]
+        return sorted(((name, count, p99, self.learned(name)) for name, count, p99 in rows),
+                      key=lambda row: row[2], reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="列出由歷史命令耗時推算的自適應超時")
+    parser.add_argument("--db", default=os.environ.get("XV6_HISTORY_DB", DEFAULT_HISTORY_DB))
+    parser.add_argument("--runs", type=int, default=HISTORY_RUNS, help="載入最近幾次 run")
+    parser.add_argument("--host", help="只載入這台主機的紀錄（預設為目前的主機）")
+    parser.add_argument("--multiplier", type=float, default=DEFAULT_MULTIPLIER)
+    parser.add_argument("--floor", type=float, default=DEFAULT_FLOOR)
+    parser.add_argument("--ceiling", type=float, default=DEFAULT_CEILING)
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.db):
+        print(f"[ERROR] 資料庫不存在: {args.db}")
+        return 1
+
+    timeouts = AdaptiveTimeouts.from_history(args.db, args.runs, args.host,
+                                             multiplier=args.multiplier, floor=args.floor,
+                                             ceiling=args.ceiling)
+    print(f"{'樣本':>7}{'p99':>10}{'超時':>10}  命令")
+    for name, count, p99, timeout in timeouts.summary():
+        limit = f"{timeout:9.1f}s" if timeout is not None else f"{'(不足)':>8}"
+        print(f"{count:>7}{p99:>9.3f}s{limit}  {name or '(空白)'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,425 @@
+"""
+xv6 當機分類與最小化
+依 panic 訊息、scause/sepc 與最後的命令為 xv6_fuzz 保存的當機案例計算指紋，
+把重複的當機歸到同一組，並以 delta debugging（ddmin）把每組的代表案例縮減成最小重現輸入。
+候選案例平行重播在重複使用的 VM 上：使用快照時以 loadvm 還原執行中的 VM，
+否則從預先開機的 VM 池取用，不會每個候選案例都冷開機
+
+用法:
+    python src/xv6_triage.py fuzz/crashes
+    python src/xv6_triage.py fuzz/crashes --minimize --workers 4 --output fuzz/triage.json
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from xv6_fuzz import OPERATORS, execute_case, is_safe
+from xv6_harness import XV6TestHarness
+from xv6_pool import XV6HarnessPool
+
+
+# 指紋中的 trap 資訊（xv6 kernel/trap.c）
+# usertrap(): "usertrap(): unexpected scause 0x%lx pid=%d" 與 "sepc=0x%lx stval=0x%lx"
+# kerneltrap(): "scause=0x%lx sepc=0x%lx stval=0x%lx" 之後 panic("kerneltrap")
+_SCAUSE = re.compile(r"scause[= ](0x[0-9a-fA-F]+)")
+_SEPC = re.compile(r"sepc=(0x[0-9a-fA-F]+)")
+_PANIC = re.compile(r"panic: ([^\r\n]*)")
+# panic 訊息中會隨執行變動的部分（位址、pid 等數字）
+_VOLATILE = re.compile(r"0x[0-9a-fA-F]+|\d+")
+
+
+@dataclass(frozen=True)
+class Fingerprint:
+    """
+    當機指紋
+
+    Attributes:
+        kind: panic、usertrap、hang 或 exit
+        panic: 正規化後的 panic 訊息（數字與位址以 N 代替），沒有 panic 時為空字串
+        scause: 最後一次 trap 的 scause，沒有時為空字串
+        sepc: 最後一次 trap 的 sepc（當機的程式位置），沒有時為空字串
+        command: 最後執行的命令結構（程式與運算子，不含參數），例如 "cat < _ | wc"
+    """
+    __slots__ = ("kind", "panic", "scause", "sepc", "command")
+    kind: str
+    panic: str
+    scause: str
+    sepc: str
+    command: str
+
+    @property
+    def site(self) -> Tuple[str, str, str, str]:
+        """
+        當機位置：kind、panic、scause、sepc
+
+        有 panic 或 trap 資訊時以它判斷是否為同一個錯誤；
+        卡住或結束時沒有這些資訊，只能再加上命令結構區分
+        """
+        return self.kind, self.panic, self.scause, self.sepc
+
+    @property
+    def key(self) -> str:
+        """分組鍵值（12 個十六進位字元）"""
+        fields = self.site if (self.panic or self.sepc) else self.site + (self.command,)
+        return hashlib.sha1("\0".join(fields).encode()).hexdigest()[:12]
+
+    def reproduces(self, other: "Fingerprint") -> bool:
+        """
+        other 是否為同一個錯誤
+
+        有 panic 或 trap 資訊時只比較當機位置（最小化時命令會改變）；
+        卡住或結束沒有這些資訊，還要比較命令結構，否則任何卡住都算重現了另一個卡住
+        """
+        if self.site != other.site:
+            return False
+        return bool(self.panic or self.sepc) or self.command == other.command
+
+    def describe(self) -> str:
+        """一行說明"""
+        parts = [self.kind]
+        if self.panic:
+            parts.append(f"panic: {self.panic}")
+        if self.scause:
+            parts.append(f"scause={self.scause} sepc={self.sepc}")
+        if self.command:
+            parts.append(f"command: {self.command}")
+        return " | ".join(parts)
+
+
+def command_shape(command: Optional[str]) -> str:
+    """命令結構：保留程式名稱與運算子，其他參數以 _ 代替"""
+    if not command:
+        return ""
+    shape, expect_program = [], True
+    for token in command.split():
+        if token in OPERATORS:
+            shape.append(token)
+            expect_program = token in ("|", ";", "&", "(")
+        else:
+            shape.append(token if expect_program else "_")
+            expect_program = False
+    # 連續的參數合併成一個 _，參數數量不同的同一個錯誤仍屬同一組
+    return re.sub(r"_( _)+", "_", " ".join(shape))
+
+
+def fingerprint(crash: Dict) -> Fingerprint:
+    """
+    計算當機紀錄的指紋
+
+    Args:
+        crash: xv6_fuzz 保存的當機紀錄（kind、panic、registers、command、console 等）
+
+    Returns:
+        Fingerprint: 指紋
+    """
+    console = crash.get("console") or ""
+    panic = crash.get("panic") or ""
+    if not panic:
+        match = _PANIC.search(console)
+        panic = match.group(0) if match else ""
+    panic = _VOLATILE.sub("N", panic[len("panic: "):] if panic.startswith("panic: ") else panic)
+
+    # 優先使用 KernelFault 的暫存器，否則取 console 中最後一次 trap 報告
+    registers = crash.get("registers") or {}
+    scauses, sepcs = _SCAUSE.findall(console), _SEPC.findall(console)
+    scause = registers.get("scause") or (scauses[-1] if scauses else "")
+    sepc = registers.get("sepc") or (sepcs[-1] if sepcs else "")
+    return Fingerprint(crash.get("kind", ""), panic.strip(), scause, sepc,
+                       command_shape(crash.get("command")))
+
+
+def load_crashes(crash_dir: str) -> List[Dict]:
+    """
+    讀取目錄中的當機紀錄（*.json）
+
+    Args:
+        crash_dir: xv6_fuzz 的當機目錄
+
+    Returns:
+        List[Dict]: 當機紀錄，每筆加上 path 欄位
+    """
+    crashes = []
+    for path in sorted(glob.glob(os.path.join(crash_dir, "*.json"))):
+        with open(path) as f:
+            crash = json.load(f)
+        if isinstance(crash, dict) and "case" in crash:
+            crash["path"] = path
+            crashes.append(crash)
+    return crashes
+
+
+def bucket(crashes: Sequence[Dict]) -> Dict[str, List[Dict]]:
+    """
+    依指紋把當機分組
+
+    Args:
+        crashes: 當機紀錄
+
+    Returns:
+        Dict[str, List[Dict]]: 指紋鍵值 -> 當機紀錄（依數量由多到少；組內最短的案例排在最前面）
+    """
+    groups: Dict[str, List[Dict]] = {}
+    for crash in crashes:
+        groups.setdefault(fingerprint(crash).key, []).append(crash)
+    for group in groups.values():
+        group.sort(key=lambda crash: sum(len(line) for line in crash["case"]))
+    return dict(sorted(groups.items(), key=lambda item: -len(item[1])))
+
+
+def ddmin(items: Sequence, test: Callable[[List[Sequence]], List[bool]]) -> List:
+    """
+    delta debugging：找出仍能重現錯誤的最小子序列（1-minimal）
+
+    每一輪的所有候選（各子集與補集）一起交給 test，讓呼叫者平行重播
+
+    Args:
+        items: 會重現錯誤的序列
+        test: 接受候選列表、返回各候選是否重現錯誤的函數
+
+    Returns:
+        List: 縮減後的序列
+    """
+    items = list(items)
+    granularity = 2
+    while len(items) >= 2:
+        size = len(items) / granularity
+        chunks = [items[int(i * size):int((i + 1) * size)] for i in range(granularity)]
+        subsets = [chunk for chunk in chunks if chunk]
+        complements = [items[:int(i * size)] + items[int((i + 1) * size):]
+                       for i in range(granularity)] if granularity > 2 else []
+
+        candidates = subsets + complements
+        outcomes = test(candidates)
+        found = next((i for i, reproduced in enumerate(outcomes) if reproduced), None)
+
+        if found is None:
+            if granularity >= len(items):
+                break
+            granularity = min(len(items), granularity * 2)
+        elif found < len(subsets):
+            items, granularity = candidates[found], 2
+        else:
+            items, granularity = candidates[found], max(granularity - 1, 2)
+    return items
+
+
+class Replayer:
+    """在重複使用的 VM 上平行重播案例"""
+
+    def __init__(self,
+                 workers: int = 2,
+                 case_timeout: float = 5,
+                 harness_factory: Optional[Callable[[], XV6TestHarness]] = None,
+                 pool: Optional[XV6HarnessPool] = None,
+                 xv6_path: str = "../xv6-riscv"):
+        """
+        初始化重播器
+
+        Args:
+            workers: 同時重播的 VM 數量
+            case_timeout: 每個命令的超時時間（秒），卡住的案例以此判斷
+            harness_factory: 建立 harness 的函數；預設使用快照啟動的 XV6TestHarness，
+                             每個候選案例之間以 loadvm 還原
+            pool: 改從這個預先開機的池取用 VM（每個候選案例一台，用完即丟棄）；
+                  指定時忽略 harness_factory
+            xv6_path: xv6-riscv 原始碼路徑（預設 harness_factory 使用）
+        """
+        self.workers = workers
+        self.case_timeout = case_timeout
+        self.pool = pool
+        self.harness_factory = harness_factory or (
+            lambda: XV6TestHarness(xv6_path=xv6_path, use_snapshot=True, isolate_disk=True))
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="xv6-triage")
+        self._local = threading.local()
+        self._harnesses: List[XV6TestHarness] = []
+        self._lock = threading.Lock()
+        self._cache: Dict[Tuple[str, ...], Optional[Fingerprint]] = {}
+        self.stats = {"replays": 0, "cache_hits": 0, "restores": 0, "boots": 0}
+
+    def _acquire(self) -> Optional[XV6TestHarness]:
+        """取得目前執行緒的 VM：池模式每次取新的，否則重複使用並還原到乾淨狀態"""
+        if self.pool is not None:
+            return self.pool.acquire()
+
+        harness = getattr(self._local, "harness", None)
+        if harness is not None:
+            if not self._local.dirty:
+                return harness
+            if harness.reset():
+                with self._lock:
+                    self.stats["restores"] += 1
+                return harness
+            harness.stop()
+
+        harness = self.harness_factory()
+        with self._lock:
+            self.stats["boots"] += 1
+            self._harnesses.append(harness)
+        self._local.harness, self._local.dirty = None, False
+        if not harness.start():
+            harness.stop()
+            return None
+        self._local.harness = harness
+        return harness
+
+    def replay(self, case: Sequence[str]) -> Optional[Fingerprint]:
+        """
+        重播一個案例
+
+        Args:
+            case: 命令列表
+
+        Returns:
+            Optional[Fingerprint]: 當機時返回指紋，沒有當機（或無法取得 VM）返回 None
+        """
+        key = tuple(case)
+        with self._lock:
+            if key in self._cache:
+                self.stats["cache_hits"] += 1
+                return self._cache[key]
+
+        harness = self._acquire()
+        if harness is None:
+            print("[ERROR] 重播時無法取得 VM")
+            return None
+
+        try:
+            _, crash = execute_case(harness, case, self.case_timeout)
+        finally:
+            if self.pool is not None:
+                self.pool.release(harness)
+            else:
+                self._local.dirty = True
+
+        result = fingerprint(crash) if crash else None
+        with self._lock:
+            self.stats["replays"] += 1
+            self._cache[key] = result
+        return result
+
+    def reproduces(self, target: Fingerprint) -> Callable[[List[Sequence[str]]], List[bool]]:
+        """建立給 ddmin 使用的測試函數：平行重播各候選，判斷是否重現 target"""
+        def test(candidates: List[Sequence[str]]) -> List[bool]:
+            def one(candidate: Sequence[str]) -> bool:
+                if not candidate or not all(is_safe(line) for line in candidate):
+                    return False
+                found = self.replay(candidate)
+                return found is not None and target.reproduces(found)
+            return list(self._executor.map(one, candidates))
+        return test
+
+    def close(self) -> None:
+        """關閉所有 VM"""
+        self._executor.shutdown(wait=True)
+        for harness in self._harnesses:
+            harness.stop()
+        self._harnesses.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def minimize(case: Sequence[str], target: Fingerprint, replayer: Replayer) -> List[str]:
+    """
+    把案例縮減成仍能重現 target 的最小輸入
+
+    先以命令（行）為單位執行 ddmin，再對剩下的每一行以 token 為單位執行 ddmin
+
+    Args:
+        case: 原始案例
+        target: 要重現的指紋
+        replayer: 重播器
+
+    Returns:
+        List[str]: 最小重現案例
+    """
+    test = replayer.reproduces(target)
+    lines = ddmin(case, test)
+
+    for index in range(len(lines)):
+        def test_line(candidates: List[Sequence[str]], index=index) -> List[bool]:
+            return test([lines[:index] + [" ".join(tokens)] + lines[index + 1:]
+                         for tokens in candidates])
+        lines[index] = " ".join(ddmin(lines[index].split(), test_line))
+    return lines
+
+
+def triage(crash_dir: str,
+           replayer: Optional[Replayer] = None,
+           verbose: bool = True) -> List[Dict]:
+    """
+    分類目錄中的當機，並（指定 replayer 時）最小化每一組的代表案例
+
+    Args:
+        crash_dir: xv6_fuzz 的當機目錄
+        replayer: 重播器，None 則只分組不最小化
+        verbose: 是否印出進度
+
+    Returns:
+        List[Dict]: 每一組的 key、fingerprint、count、paths、case（代表案例），
+                    最小化時另有 reproducible 與 minimized
+    """
+    report = []
+    for key, crashes in bucket(load_crashes(crash_dir)).items():
+        representative = crashes[0]
+        target = fingerprint(representative)
+        entry = {"key": key, "fingerprint": target.describe(), "count": len(crashes),
+                 "paths": [crash["path"] for crash in crashes],
+                 "case": representative["case"]}
+        if verbose:
+            print(f"[TRIAGE] {key} x{len(crashes)}: {target.describe()}")
+
+        if replayer is not None:
+            # 經由重播器的執行緒重播，快照模式下不會在主執行緒多開一台 VM
+            entry["reproducible"] = replayer.reproduces(target)([representative["case"]])[0]
+            if entry["reproducible"]:
+                entry["minimized"] = minimize(representative["case"], target, replayer)
+                if verbose:
+                    print(f"[TRIAGE] {key} 最小重現: {entry['minimized']}")
+            elif verbose:
+                print(f"[TRIAGE] {key} 無法重現")
+        report.append(entry)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="xv6 模糊測試當機分類與最小化")
+    parser.add_argument("crash_dir", help="xv6_fuzz 的當機目錄")
+    parser.add_argument("--minimize", action="store_true", help="重播並最小化每一組的代表案例")
+    parser.add_argument("--xv6-path", default="../xv6-riscv")
+    parser.add_argument("--workers", type=int, default=2, help="同時重播的 VM 數量")
+    parser.add_argument("--timeout", type=float, default=5, help="每個命令的超時時間（秒）")
+    parser.add_argument("--output", help="把分類結果寫成 JSON")
+    args = parser.parse_args()
+
+    if args.minimize:
+        with Replayer(workers=args.workers, case_timeout=args.timeout,
+                      xv6_path=args.xv6_path) as replayer:
+            report = triage(args.crash_dir, replayer)
+            print(f"[TRIAGE] 重播 {replayer.stats['replays']} 次，快取命中 "
+                  f"{replayer.stats['cache_hits']} 次，還原 {replayer.stats['restores']} 次，"
+                  f"開機 {replayer.stats['boots']} 次")
+    else:
+        report = triage(args.crash_dir)
+
+    print(f"[TRIAGE] {sum(entry['count'] for entry in report)} 個當機，{len(report)} 組")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
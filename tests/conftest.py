@@ -0,0 +1,184 @@
+"""
+pytest 共用設定
+提供整個測試階段共用的預先開機 VM 池，並記錄每個測試的耗時、開機階段統計與框架呼叫的延遲指標，
+耗時同時存入以 xv6 revision 為鍵值的效能歷史資料庫，命令超時由資料庫中的歷史命令耗時推算；
+console 內容寫入每個測試的 gzip 日誌，失敗的測試在報告中附上最後一段 console 輸出
+"""
+
+import json
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from xv6_pool import XV6HarnessPool
+import xv6_console
+import xv6_history
+import xv6_profile
+from xv6_metrics import REGISTRY, current_test
+from xv6_timeouts import AdaptiveTimeouts
+
+# 受測的 xv6 原始碼目錄
+XV6_PATH = "../xv6-riscv"
+
+# 開機階段紀錄與延遲指標的輸出位置（平行執行時每個 worker 一個檔案）
+BOOT_PROFILE_DIR = "reports"
+METRICS_DIR = "reports"
+
+# 每個測試的 console 日誌目錄，與失敗報告中附加的 console 字元數
+CONSOLE_LOG_DIR = os.path.join("reports", "console")
+CONSOLE_TAIL_CHARS = 8 * 1024
+
+
+def pytest_configure(config):
+    """設定 console 日誌目錄（XV6_CONSOLE_LOG_DIR 設為空字串則只保留記憶體中的環狀紀錄）"""
+    xv6_console.configure(os.environ.get("XV6_CONSOLE_LOG_DIR", CONSOLE_LOG_DIR) or None)
+
+
+@pytest.fixture(scope="session")
+def xv6_pool():
+    """
+    Pytest fixture: 整個測試階段共用的 VM 池
+    背景預先開機，各測試檔的 xv6 fixture 從這裡取得已就緒的實例
+
+    環境變數:
+        XV6_POOL_SIZE: 待命 VM 數量（預設 2，設為 0 則每個測試自行開機）
+        XV6_POOL_MEMORY_MB: 所有 VM 的記憶體上限（MB）
+        XV6_DEBUG: 設為 1 時以 print 顯示所有互動（預設只記錄在 console 日誌）
+        XV6_TIMEOUT_MULTIPLIER: 自適應超時是歷史 p99 的幾倍（預設 3，設為 0 則使用固定的超時）
+    """
+    max_memory = os.environ.get("XV6_POOL_MEMORY_MB")
+    pool = XV6HarnessPool(
+        size=int(os.environ.get("XV6_POOL_SIZE", "2")),
+        max_memory_mb=int(max_memory) if max_memory else None,
+        xv6_path=XV6_PATH,
+        debug=os.environ.get("XV6_DEBUG") == "1",
+        timeouts=_adaptive_timeouts()
+    )
+    pool.start()
+
+    yield pool
+
+    pool.close()
+    stats = pool.stats()
+    print(f"\n[POOL] hits={stats['hits']} misses={stats['misses']} "
+          f"平均等待={stats['mean_wait']:.2f}s 最長等待={stats['max_wait']:.2f}s")
+
+
+def _adaptive_timeouts():
+    """由效能歷史資料庫的命令耗時建立自適應超時（停用或沒有資料庫時返回 None）"""
+    multiplier = float(os.environ.get("XV6_TIMEOUT_MULTIPLIER", "3"))
+    db_path = os.environ.get("XV6_HISTORY_DB", xv6_history.DEFAULT_HISTORY_DB)
+    if multiplier <= 0 or not db_path:
+        return None
+    return AdaptiveTimeouts.from_history(db_path, multiplier=multiplier)
+
+
+# 每個測試的耗時與結果（setup + call + teardown）
+_test_durations = {}
+
+
+def pytest_runtest_logreport(report):
+    """累計每個測試各階段的耗時與結果"""
+    entry = _test_durations.setdefault(report.nodeid, {"duration": 0.0, "outcome": "passed"})
+    entry["duration"] += report.duration
+    if report.failed:
+        entry["outcome"] = "failed"
+    elif report.skipped:
+        entry["outcome"] = "skipped"
+
+
+# pytest_runtest_logstart 設定 current_test 時得到的 token
+_test_tokens = {}
+
+
+def pytest_runtest_logstart(nodeid, location):
+    """標記目前執行中的測試，框架呼叫的延遲指標與 console 日誌以此分組"""
+    _test_tokens[nodeid] = current_test.set(nodeid)
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    """失敗的測試附上這個測試期間最後一段 console 輸出與完整日誌的位置"""
+    outcome = yield
+    report = outcome.get_result()
+    if not report.failed:
+        return
+    for log in xv6_console.logs_for_test(item.nodeid):
+        content = log.tail(CONSOLE_TAIL_CHARS, item.nodeid)
+        path = log.spool_paths.get(item.nodeid)
+        if path:
+            content += f"\n\n完整日誌: {path}"
+        report.sections.append((f"xv6 console #{log.id}（最後 {CONSOLE_TAIL_CHARS // 1024} KB）",
+                                content))
+
+
+def pytest_runtest_logfinish(nodeid, location):
+    xv6_console.close_spools(nodeid)
+    token = _test_tokens.pop(nodeid, None)
+    if token is not None:
+        current_test.reset(token)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    """
+    測試階段結束：設定 XV6_DURATIONS_FILE 時，把每個測試的耗時寫成 JSON（平行執行器會讀取），
+    並彙總這個階段所有開機的各階段耗時，輸出框架呼叫的延遲指標（JSON 與 Prometheus 格式）
+    """
+    path = os.environ.get("XV6_DURATIONS_FILE")
+    if path:
+        with open(path, "w") as f:
+            json.dump(_test_durations, f, indent=2)
+
+    # 開機階段統計：印出各階段 min/median/p95 並保存每次開機的紀錄
+    profiles = xv6_profile.profiles()
+    if profiles:
+        print("\n[BOOT] 開機階段耗時（秒）")
+        print(xv6_profile.format_summary(xv6_profile.summarize(profiles)))
+        failed = [p for p in profiles if not p.success]
+        if failed:
+            print(f"[BOOT] {len(failed)} 次開機失敗: " +
+                  ", ".join(p.waiting_for or "?" for p in failed))
+
+        worker = os.environ.get("XV6_WORKER_ID")
+        name = f"boot_profile-{worker}.json" if worker else "boot_profile.json"
+        os.makedirs(BOOT_PROFILE_DIR, exist_ok=True)
+        with open(os.path.join(BOOT_PROFILE_DIR, name), "w") as f:
+            json.dump({"summary": xv6_profile.summarize(profiles),
+                       "boots": [p.to_dict() for p in profiles]}, f, indent=2)
+
+    # 延遲指標：列出最慢的測試與 guest 命令，並寫出 metrics.json / metrics.prom
+    slowest_tests = REGISTRY.top("xv6_call_seconds", "test", limit=5)
+    if slowest_tests:
+        print("\n[METRICS] 框架呼叫耗時最多的測試")
+        for test, seconds, calls in slowest_tests:
+            print(f"  {seconds:8.2f}s {calls:>5} 次  {test or '(測試之外)'}")
+        slowest_commands = REGISTRY.top("xv6_command_seconds", "command", limit=5)
+        if slowest_commands:
+            print("[METRICS] 耗時最多的命令")
+            for command, seconds, calls in slowest_commands:
+                print(f"  {seconds:8.2f}s {calls:>5} 次  {command or '(空白)'}")
+
+        worker = os.environ.get("XV6_WORKER_ID")
+        json_path, prom_path = REGISTRY.write(
+            METRICS_DIR, f"metrics-{worker}" if worker else "metrics")
+        print(f"[METRICS] 已寫入 {json_path}、{prom_path}")
+
+    # 效能歷史：以 xv6 revision / kernel 雜湊為鍵值保存這次的耗時（XV6_HISTORY_DB 設為空字串則停用）
+    db_path = os.environ.get("XV6_HISTORY_DB", xv6_history.DEFAULT_HISTORY_DB)
+    kernel = xv6_history.kernel_hash(XV6_PATH)
+    if db_path and kernel and _test_durations:
+        samples = {("test", nodeid): [(entry["duration"], 1)]
+                   for nodeid, entry in _test_durations.items() if entry["outcome"] == "passed"}
+        for labels, hist in REGISTRY.series("xv6_command_seconds"):
+            samples[("command", labels.get("command", ""))] = hist.buckets()
+        for profile in profiles:
+            if profile.success:
+                for phase, seconds in profile.durations().items():
+                    samples.setdefault(("boot", phase), []).append((seconds, 1))
+                samples.setdefault(("boot", "total"), []).append((profile.total, 1))
+
+        revision = xv6_history.xv6_revision(XV6_PATH)
+        with xv6_history.PerfHistory(db_path) as history:
+            history.record_run(revision, kernel, samples, os.environ.get("XV6_WORKER_ID"))
+        print(f"[HISTORY] 已記錄 xv6 {revision[:12]}（kernel {kernel[:12]}）到 {db_path}")
@@ -0,0 +1,71 @@
+"""
+非同步測試框架測試
+驗證 AsyncXV6TestHarness 的基本操作，以及單一 event loop 同時驅動多個 VM
+"""
+
+import asyncio
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from xv6_async import AsyncXV6TestHarness
+
+
+async def _boot(count: int):
+    """同時啟動 count 個 VM，任一失敗時關閉全部"""
+    harnesses = [AsyncXV6TestHarness(timeout=15) for _ in range(count)]
+    started = await asyncio.gather(*(h.start() for h in harnesses))
+    if not all(started):
+        await asyncio.gather(*(h.stop() for h in harnesses))
+        pytest.fail("無法啟動 xv6")
+    return harnesses
+
+
+class TestAsyncHarness:
+    """測試非同步框架"""
+
+    def test_run_command(self):
+        """單一 VM 的命令執行與檔案檢查"""
+        async def scenario():
+            async with AsyncXV6TestHarness(timeout=15) as xv6:
+                assert xv6.process, "無法啟動 xv6"
+                success, output = await xv6.run_command("echo hello async")
+                assert success and output == "hello async"
+
+                await xv6.run_command("echo data > async.txt")
+                assert await xv6.check_file_exists("async.txt")
+                assert not await xv6.check_file_exists("missing.txt")
+
+        asyncio.run(scenario())
+
+    def test_many_vms_one_loop(self):
+        """多個 VM 同時執行命令，輸出不應互相混雜"""
+        async def scenario():
+            harnesses = await _boot(4)
+            try:
+                results = await asyncio.gather(
+                    *(h.run_commands([f"echo vm{i}", "echo done"])
+                      for i, h in enumerate(harnesses)))
+            finally:
+                await asyncio.gather(*(h.stop() for h in harnesses))
+
+            for i, result in enumerate(results):
+                assert result == [(True, f"vm{i}"), (True, "done")]
+
+        asyncio.run(scenario())
+
+    def test_command_timeout(self):
+        """超時的命令應返回 False 而不是讓 event loop 卡住"""
+        async def scenario():
+            async with AsyncXV6TestHarness(timeout=15) as xv6:
+                assert xv6.process, "無法啟動 xv6"
+                success, output = await xv6.run_command("cat", timeout=2)
+                assert not success
+                assert "超時" in output
+
+        asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v", "-s", "--tb=short"])
@@ -14,25 +14,16 @@ from xv6_harness import XV6TestHarness
 
 
 @pytest.fixture(scope="function")
-def xv6():
+def xv6(xv6_pool):
     """
     Pytest fixture: 為每個測試函數提供乾淨的 xv6 實例
-    測試前啟動 xv6，測試後自動清理
+    從 VM 池取得已開機的實例，測試後丟棄
     """
-    harness = XV6TestHarness(
-        xv6_path="../xv6-riscv",
-        timeout=10,
-        debug=True  # 開發階段建議啟用 debug
-    )
-    
-    # 啟動 xv6
-    success = harness.start()
-    assert success, "無法啟動 xv6"
-    
-    yield harness  # 提供給測試函數使用
-    
-    # 測試完成後清理
-    harness.stop()
+    harness = xv6_pool.acquire()
+    assert harness, "無法啟動 xv6"
+    harness.timeout = 10
+    yield harness
+    xv6_pool.release(harness)
 
 
 class TestBasicCommands:
@@ -47,12 +38,12 @@ class TestBasicCommands:
     
     def test_ls_command(self, xv6):
         """測試 ls 命令 - 列出檔案"""
-        success, output = xv6.run_command("ls")
+        success, listing = xv6.run_command("ls", parse="ls")
         
         assert success, "ls 命令執行失敗"
         # xv6 預設應該有這些檔案
-        assert "." in output, "ls 應該顯示當前目錄 '.'"
-        assert ".." in output, "ls 應該顯示父目錄 '..'"
+        assert "." in listing and listing["."].is_dir, "ls 應該顯示當前目錄 '.'"
+        assert ".." in listing and listing[".."].is_dir, "ls 應該顯示父目錄 '..'"
     
     def test_cat_readme(self, xv6):
         """測試 cat 命令 - 讀取 README 檔案"""
@@ -88,13 +79,13 @@ class TestFileSystem:
     
     def test_wc_command(self, xv6):
         """測試 wc (word count) 命令"""
-        success, output = xv6.run_command("wc README")
+        success, counts = xv6.run_command("wc README", parse="wc")
         
         assert success, "wc 命令執行失敗"
         # wc 輸出格式: lines words bytes filename
-        # 應該包含數字
-        assert any(char.isdigit() for char in output), \
-            f"wc 輸出應該包含數字: {output}"
+        assert len(counts) == 1 and counts[0].name == "README", f"wc 輸出格式不正確: {counts}"
+        assert counts[0].lines > 0 and counts[0].bytes > counts[0].words, \
+            f"wc 計數不合理: {counts[0]}"
 
 
 class TestProcessManagement:
@@ -118,11 +109,11 @@ class TestProcessManagement:
     def test_usertests_exists(self, xv6):
         """檢查 usertests 測試程式是否存在"""
         # usertests 是 xv6 內建的測試程式
-        success, output = xv6.run_command("ls")
+        success, listing = xv6.run_command("ls", parse="ls")
         assert success, "ls 命令執行失敗"
         
         # 檢查 usertests 是否在檔案列表中
-        files = output.split()
+        files = listing.names
         
         # 注意：執行 usertests 會花很長時間，這裡只檢查它是否存在
         # 實際執行會在其他測試中進行
@@ -154,6 +145,16 @@ class TestShellFeatures:
         success, output = xv6.run_command("")
         assert success, "空命令應該成功執行（什麼都不做）"
     
+    def test_output_containing_prompt(self, xv6):
+        """輸出中包含 "$ " 時不應提前判定命令結束"""
+        success, output = xv6.run_command("echo cost $ 5")
+        assert success
+        assert output == "cost $ 5", f"輸出被提示符截斷: {output}"
+
+        # 下一個命令的輸出不應混入上一個命令的殘留內容
+        success, output = xv6.run_command("echo next")
+        assert success and output == "next"
+
     def test_invalid_command(self, xv6):
         """測試不存在的命令"""
         success, output = xv6.run_command("nonexistent_command_xyz")
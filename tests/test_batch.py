@@ -0,0 +1,74 @@
+"""
+批次命令執行測試
+驗證 run_commands() 以結束標記正確分隔每個命令的輸出
+"""
+
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from xv6_harness import XV6TestHarness
+
+
+@pytest.fixture(scope="function")
+def xv6(xv6_pool):
+    """Pytest fixture: 提供 xv6 實例（從 VM 池取得已開機的實例）"""
+    harness = xv6_pool.acquire()
+    assert harness, "無法啟動 xv6"
+    harness.timeout = 10
+    yield harness
+    xv6_pool.release(harness)
+
+
+class TestBatchOutput:
+    """測試批次輸出的分隔"""
+
+    def test_outputs_in_order(self, xv6):
+        """每個命令的輸出應該對應到自己的結果"""
+        results = xv6.run_commands(["echo one", "echo two", "echo three"])
+
+        assert [success for success, _ in results] == [True, True, True]
+        assert [output for _, output in results] == ["one", "two", "three"]
+
+    def test_empty_and_invalid_commands(self, xv6):
+        """空命令與無效命令不應影響其他命令的輸出"""
+        results = xv6.run_commands(["", "nonexistent_cmd_xyz", "echo still works"])
+
+        assert all(success for success, _ in results)
+        assert results[0][1] == ""
+        assert results[2][1] == "still works"
+
+    def test_batch_larger_than_console_buffer(self, xv6):
+        """超過 console 輸入緩衝區的批次應該分段送出而不遺失命令"""
+        commands = [f"echo line{i}" for i in range(40)]
+        results = xv6.run_commands(commands)
+
+        assert len(results) == 40
+        for i, (success, output) in enumerate(results):
+            assert success, f"第 {i} 個命令失敗"
+            assert output == f"line{i}", f"第 {i} 個命令輸出不正確: {output}"
+
+    def test_file_operations(self, xv6):
+        """批次建立檔案後應該能讀取"""
+        results = xv6.run_commands([
+            "echo batch data > batch.txt",
+            "cat batch.txt",
+            "rm batch.txt",
+        ])
+        assert all(success for success, _ in results)
+        assert "batch data" in results[1][1]
+        assert not xv6.check_file_exists("batch.txt")
+
+    def test_shell_usable_after_batch(self, xv6):
+        """批次執行後一般的 run_command 仍應正常運作"""
+        xv6.run_commands(["echo a", "echo b"])
+        success, output = xv6.run_command("echo after batch")
+        assert success and "after batch" in output
+
+
+def test_batch_without_start():
+    """未啟動時每個命令都應該返回失敗"""
+    harness = XV6TestHarness(xv6_path="../xv6-riscv")
+    results = harness.run_commands(["echo a", "echo b"])
+    assert results == [(False, "Error: xv6 未啟動")] * 2
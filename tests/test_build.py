@@ -0,0 +1,114 @@
+"""
+xv6 建置快取測試
+使用模擬的 xv6 目錄（簡化的 Makefile）驗證快取命中、重新建置與 LRU 淘汰
+"""
+
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from xv6_build import XV6BuildManager
+
+
+MAKEFILE = (
+    "kernel/kernel: kernel/main.c\n"
+    "\tcat kernel/main.c > kernel/kernel\n"
+    "\techo built >> build.log\n"
+    "fs.img: README\n"
+    "\tcat README > fs.img\n"
+)
+
+
+@pytest.fixture
+def fake_xv6(tmp_path):
+    """建立只有 kernel/main.c 與 README 的模擬 xv6 目錄"""
+    root = tmp_path / "xv6"
+    (root / "kernel").mkdir(parents=True)
+    (root / "Makefile").write_text(MAKEFILE)
+    (root / "kernel" / "main.c").write_text("int main() { return 0; }\n")
+    (root / "README").write_text("xv6 readme\n")
+    return root
+
+
+def build_count(root):
+    """模擬 Makefile 每次編譯 kernel 都會在 build.log 多一行"""
+    log = root / "build.log"
+    return len(log.read_text().splitlines()) if log.exists() else 0
+
+
+class TestBuildCache:
+    """測試建置快取行為"""
+
+    def test_miss_builds_and_stores(self, fake_xv6, tmp_path):
+        """第一次建置應該執行 make 並存入快取"""
+        manager = XV6BuildManager(str(fake_xv6), cache_dir=str(tmp_path / "cache"))
+        source_hash = manager.ensure_built()
+
+        assert source_hash is not None
+        assert build_count(fake_xv6) == 1
+        assert [name for name, _, _ in manager.entries()] == [source_hash]
+
+    def test_hit_restores_without_make(self, fake_xv6, tmp_path):
+        """原始碼雜湊相同時應直接還原產物，不執行 make"""
+        manager = XV6BuildManager(str(fake_xv6), cache_dir=str(tmp_path / "cache"))
+        first = manager.ensure_built()
+        (fake_xv6 / "kernel" / "kernel").unlink()
+
+        second = manager.ensure_built()
+        assert second == first
+        assert build_count(fake_xv6) == 1, "快取命中時不應該重新編譯"
+        assert (fake_xv6 / "kernel" / "kernel").exists(), "產物應該被還原"
+
+    def test_source_change_rebuilds(self, fake_xv6, tmp_path):
+        """修改原始碼後雜湊改變，應該重新建置"""
+        manager = XV6BuildManager(str(fake_xv6), cache_dir=str(tmp_path / "cache"))
+        first = manager.ensure_built()
+
+        (fake_xv6 / "kernel" / "main.c").write_text("int main() { return 1; }\n")
+        second = manager.ensure_built()
+
+        assert second != first
+        assert build_count(fake_xv6) == 2
+
+    def test_switching_back_is_cached(self, fake_xv6, tmp_path):
+        """切回先前的原始碼版本時應該命中快取並還原對應的 kernel"""
+        manager = XV6BuildManager(str(fake_xv6), cache_dir=str(tmp_path / "cache"))
+        main_c = fake_xv6 / "kernel" / "main.c"
+        original = main_c.read_text()
+
+        first = manager.ensure_built()
+        main_c.write_text("int main() { return 1; }\n")
+        manager.ensure_built()
+        main_c.write_text(original)
+
+        assert manager.ensure_built() == first
+        assert build_count(fake_xv6) == 2
+        assert (fake_xv6 / "kernel" / "kernel").read_text() == original
+
+    def test_build_outputs_not_hashed(self, fake_xv6, tmp_path):
+        """編譯產物（kernel、fs.img）不應影響原始碼雜湊"""
+        manager = XV6BuildManager(str(fake_xv6), cache_dir=str(tmp_path / "cache"))
+        before = manager.source_hash()
+        manager.ensure_built()
+        assert manager.source_hash() == before
+
+    def test_lru_eviction(self, fake_xv6, tmp_path):
+        """超過大小上限時應淘汰最久未使用的項目"""
+        manager = XV6BuildManager(str(fake_xv6), cache_dir=str(tmp_path / "cache"),
+                                  max_cache_bytes=1)
+        main_c = fake_xv6 / "kernel" / "main.c"
+
+        first = manager.ensure_built()
+        main_c.write_text("int main() { return 2; }\n")
+        second = manager.ensure_built()
+
+        names = [name for name, _, _ in manager.entries()]
+        assert second in names, "目前使用的建置不應被淘汰"
+        assert first not in names
+
+    def test_build_failure(self, fake_xv6, tmp_path):
+        """編譯失敗時返回 None"""
+        (fake_xv6 / "Makefile").write_text("kernel/kernel:\n\tfalse\n")
+        manager = XV6BuildManager(str(fake_xv6), cache_dir=str(tmp_path / "cache"))
+        assert manager.ensure_built() is None
@@ -0,0 +1,120 @@
+"""
+console 紀錄測試
+驗證環狀緩衝區的上限、依測試篩選的結尾內容與 gzip 日誌
+"""
+
+import gzip
+import json
+import pytest
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+import xv6_console
+from xv6_console import READ, SENT, ConsoleLog
+from xv6_metrics import ByteCounter, current_test
+
+
+@pytest.fixture
+def spool_dir(tmp_path):
+    """暫時把 console 日誌寫到 tmp_path"""
+    previous = xv6_console._spool_dir
+    xv6_console.configure(str(tmp_path))
+    yield tmp_path
+    xv6_console.configure(previous)
+
+
+@pytest.mark.usefixtures("spool_dir")
+class TestConsoleLog:
+    """測試單一實例的紀錄"""
+
+    def test_ring_buffer_bounded(self):
+        """超過上限時丟棄最舊的紀錄"""
+        log = ConsoleLog(ring_chars=100)
+        for i in range(50):
+            log.record(READ, f"line {i:03d}\n")
+        assert sum(len(entry[2]) for entry in log.entries()) <= 100
+        assert log.tail(1000).endswith("line 049\n")
+        assert "line 000" not in log.tail(1000)
+
+    def test_tail_skips_input_and_limits_size(self):
+        """結尾內容只包含讀到的輸出與註記，並限制長度"""
+        log = ConsoleLog()
+        log.record(SENT, "ls\n")
+        log.record(READ, "ls\r\nREADME 2 2 2290\r\n$ ")
+        log.note("停止 xv6...")
+        tail = log.tail(1000)
+        assert tail == "ls\nREADME 2 2 2290\n$ [harness] 停止 xv6...\n"
+        assert log.tail(10) == tail[-10:]
+
+    def test_tail_filtered_by_test(self):
+        """只取某個測試期間的紀錄"""
+        log = ConsoleLog()
+        token = current_test.set("test_a")
+        log.record(READ, "from a\n")
+        current_test.reset(token)
+        token = current_test.set("test_b")
+        log.record(READ, "from b\n")
+        current_test.reset(token)
+        assert log.tail(1000, "test_a") == "from a\n"
+
+    def test_tail_since(self):
+        """只取某個時間之後的紀錄"""
+        log = ConsoleLog()
+        log.record(READ, "old\n")
+        started = time.time()
+        log.record(READ, "new\n")
+        assert log.tail(1000, since=started) == "new\n"
+
+    def test_channel_forwards(self):
+        """channel 同時寫入紀錄與其他類檔案物件"""
+        log = ConsoleLog()
+        counter = ByteCounter()
+        log.channel(READ, counter).write("hello")
+        assert counter.bytes == 5
+        assert log.entries()[0][1:3] == (READ, "hello")
+
+
+def test_spool_per_test(spool_dir):
+    """每個測試一個 gzip 日誌，每行是時間、方向與 JSON 字串"""
+    log = ConsoleLog()
+    token = current_test.set("tests/test_x.py::test_one")
+    try:
+        log.record(SENT, "echo hi\n")
+        log.record(READ, "hi\r\n")
+    finally:
+        current_test.reset(token)
+
+    assert xv6_console.logs_for_test("tests/test_x.py::test_one") == [log]
+    paths = xv6_console.close_spools("tests/test_x.py::test_one")
+    assert len(paths) == 1 and paths[0].startswith(str(spool_dir))
+
+    with gzip.open(paths[0], "rt", encoding="utf-8") as f:
+        lines = [line.split(" ", 2) for line in f.read().splitlines()]
+    assert [(direction, json.loads(text)) for _, direction, text in lines] == \
+        [(SENT, "echo hi\n"), (READ, "hi\r\n")]
+
+
+def test_spool_overwritten_by_new_session(spool_dir):
+    """新的階段（編號重新從 1 開始）覆寫同名的日誌，不會接在先前階段的內容後面"""
+    test = "tests/test_x.py::test_again"
+
+    def run(text, log_id):
+        log = ConsoleLog()
+        log.id = log_id
+        token = current_test.set(test)
+        try:
+            log.record(READ, text)
+        finally:
+            current_test.reset(token)
+        return xv6_console.close_spools(test)[0]
+
+    first = run("first session\n", 1)
+    xv6_console.configure(str(spool_dir))
+    second = run("second session\n", 1)
+
+    assert first == second
+    with gzip.open(second, "rt", encoding="utf-8") as f:
+        assert [json.loads(line.split(" ", 2)[2]) for line in f.read().splitlines()] == \
+            ["second session\n"]
@@ -0,0 +1,181 @@
+"""
+kernel 錯誤偵測測試
+驗證 panic/usertrap 訊息的解析、跨越多次讀取的比對與卡住偵測
+"""
+
+import pytest
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from xv6_fault import PANIC_SETTLE, FaultWatcher, KernelFault
+from xv6_harness import XV6TestHarness
+
+
+class TestFaultWatcher:
+    """測試錯誤掃描"""
+
+    def test_panic_with_registers(self):
+        """kerneltrap 的暫存器與 panic 訊息，即使跨越多次讀取"""
+        watcher = FaultWatcher()
+        watcher.command("ln a b")
+        for chunk in ("$ ln a b\r\nscause=0xd sepc=0x80001a2c stval=0x3f", "\r\npan",
+                      "ic: kerneltrap\r\n"):
+            watcher.write(chunk)
+        fault = watcher.pending
+        assert fault.kind == "panic" and fault.message == "kerneltrap"
+        assert fault.registers == {"scause": "0xd", "sepc": "0x80001a2c", "stval": "0x3f"}
+        assert fault.commands == ("ln a b",)
+        assert fault.offset == len("$ ln a b\r\nscause=0xd sepc=0x80001a2c stval=0x3f\r\n")
+
+    def test_usertrap(self):
+        """usertrap 要等到 sepc/stval 那一行才算完整"""
+        watcher = FaultWatcher()
+        watcher.write("usertrap(): unexpected scause 0xf pid=3\r\n")
+        assert watcher.pending is None
+        watcher.write("            sepc=0x1a stval=0x0\r\n")
+        assert watcher.pending.registers == {"scause": "0xf", "sepc": "0x1a", "stval": "0x0"}
+        # usertrap 取出後清除，panic 則保留到 reset()
+        assert watcher.take().kind == "usertrap" and watcher.pending is None
+
+    def test_panic_is_sticky(self):
+        watcher = FaultWatcher()
+        watcher.write("panic: ilock\n")
+        watcher.last_output -= PANIC_SETTLE
+        assert watcher.take() is watcher.pending
+        with pytest.raises(KernelFault):
+            watcher.begin()
+        watcher.reset()
+        watcher.begin()
+
+    def test_non_fatal_only_recorded(self):
+        """不在 fatal 中的種類只記錄"""
+        watcher = FaultWatcher(fatal=("panic",))
+        watcher.write("usertrap(): unexpected scause 0xf pid=3\n  sepc=0x1a stval=0x0\n")
+        assert watcher.pending is None
+        assert [fault.kind for fault in watcher.faults] == ["usertrap"]
+        assert list(watcher.triggers) == ["panic"]
+
+    def test_reported_once(self):
+        """同一個訊息不會因為保留的掃描視窗被重複記錄"""
+        watcher = FaultWatcher()
+        watcher.write("usertrap(): unexpected scause 0xf pid=3\n  sepc=0x1a stval=0x0\n")
+        watcher.write("more output\n")
+        assert len(watcher.faults) == 1
+
+    def test_only_at_line_start(self):
+        """不在行首的錯誤訊息文字是一般輸出"""
+        watcher = FaultWatcher()
+        watcher.write("echo panic: not really\r\n")
+        watcher.write("$ x usertrap(): unexpected scause 0xf pid=3\n  sepc=0x1a stval=0x0\n")
+        assert watcher.pending is None and watcher.faults == []
+
+    def test_line_start_across_window(self):
+        """掃描視窗截斷後仍記得開頭是否為行首"""
+        watcher = FaultWatcher()
+        watcher.write("x" * 2000 + "panic: ")
+        watcher.write("no\n")
+        assert watcher.pending is None
+        watcher.write("\n" + "y" * 2000 + "\npanic: ")
+        watcher.write("yes\n")
+        assert watcher.pending.message == "yes"
+
+    def test_echo_skipped(self):
+        """送出的命令被回顯時不是錯誤訊息"""
+        watcher = FaultWatcher()
+        watcher.command("panic: foo")
+        watcher.write("panic: foo\r\n")
+        assert watcher.pending is None
+        # 回顯只略過一次
+        watcher.write("panic: foo\r\n")
+        assert watcher.pending.message == "foo"
+
+    def test_panic_followed_by_output(self):
+        """panic 之後 kernel 停止；之後還有輸出的 panic 行只是命令輸出"""
+        watcher = FaultWatcher()
+        watcher.write("panic: x\r\n$ ")
+        assert watcher.pending is None
+        watcher.write("\r\npanic: y\r\n")
+        assert watcher.pending.message == "y" and watcher.confirmed() is None
+        assert watcher.settle_time() > 0
+        watcher.write("$ ")
+        assert watcher.pending is None and watcher.faults == []
+
+    def test_retracted_panic_restores_usertrap(self):
+        """撤回的 panic 不會帶走它取代的 usertrap"""
+        watcher = FaultWatcher()
+        watcher.write("usertrap(): unexpected scause 0xf pid=3\n  sepc=0x1a stval=0x0\n")
+        watcher.write("panic: text\n")
+        assert watcher.pending.kind == "panic"
+        watcher.write("$ ")
+        assert watcher.pending.kind == "usertrap"
+        assert [fault.kind for fault in watcher.faults] == ["usertrap"]
+
+    def test_panic_confirmed_after_silence(self):
+        watcher = FaultWatcher()
+        watcher.write("panic: z\r\n")
+        watcher.begin()
+        watcher.last_output -= PANIC_SETTLE
+        assert watcher.confirmed().message == "z" and watcher.settle_time() == 0
+        with pytest.raises(KernelFault):
+            watcher.begin()
+
+    def test_awaiting(self):
+        """行首可能是錯誤訊息開頭時需要再讀取"""
+        watcher = FaultWatcher()
+        watcher.write("$ ls\npan")
+        assert watcher.awaiting()
+        watcher.write("ic: x")
+        assert watcher.awaiting()
+        watcher.write("\n$ ")
+        assert not watcher.awaiting()
+        watcher.write("\nusertrap(): unexpected scause 0xf pid=3\n")
+        assert watcher.awaiting()
+        watcher.write("  sepc=0x1a stval=0x0\n$ echo panic: x")
+        assert watcher.take().kind == "usertrap" and not watcher.awaiting()
+
+    def test_forwards_and_tracks_silence(self):
+        class Sink:
+            data = ""
+
+            def write(self, data):
+                Sink.data += data
+
+            def flush(self):
+                pass
+
+        watcher = FaultWatcher(Sink())
+        time.sleep(0.05)
+        assert watcher.silent_for() >= 0.05
+        watcher.write("hello")
+        assert Sink.data == "hello" and watcher.silent_for() < 0.05
+
+
+@pytest.mark.slow
+def test_silent_command_fails_fast():
+    """silence_timeout 內沒有輸出時不必等到命令超時"""
+    harness = XV6TestHarness(xv6_path="../xv6-riscv", silence_timeout=2)
+    assert harness.start(), "無法啟動 xv6"
+    try:
+        started = time.time()
+        success, output = harness.run_command("sleep 300", timeout=60)
+        assert not success and harness.last_fault.kind == "hang"
+        assert time.time() - started < 10
+    finally:
+        harness.stop()
+
+
+@pytest.mark.slow
+def test_echoed_panic_text_is_not_a_fault():
+    """命令輸出中的 panic 文字不會讓命令與之後的命令失敗"""
+    harness = XV6TestHarness(xv6_path="../xv6-riscv")
+    assert harness.start(), "無法啟動 xv6"
+    try:
+        success, output = harness.run_command("echo panic: x")
+        assert success and output == "panic: x"
+        assert harness.last_fault is None
+        success, output = harness.run_command("echo after")
+        assert success and output == "after"
+    finally:
+        harness.stop()
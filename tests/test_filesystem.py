@@ -17,23 +17,16 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 
 @pytest.fixture(scope="function")
-def xv6():
+def xv6(xv6_pool):
     """
     Pytest fixture: 為每個測試函數提供乾淨的 xv6 實例
-    測試前啟動 xv6，測試後自動清理
+    從 VM 池取得已開機的實例，測試後丟棄
     """
-    harness = XV6TestHarness(
-        xv6_path="../xv6-riscv",
-        timeout=15,
-        debug=True
-    )
-
-    success = harness.start()
-    assert success, "無法啟動 xv6"
-
+    harness = xv6_pool.acquire()
+    assert harness, "無法啟動 xv6"
+    harness.timeout = 15
     yield harness
-
-    harness.stop()
+    xv6_pool.release(harness)
 
 
 @pytest.mark.filesystem
@@ -63,11 +56,10 @@ class TestFileCreation:
             assert success, f"建立 {filename} 失敗"
             assert xv6.check_file_exists(filename), f"{filename} 未建立"
 
-        # 驗證所有檔案都在
-        success, output = xv6.run_command("ls")
-        assert success
+        # 驗證所有檔案都在（一次 ls 檢查全部）
+        exists = xv6.check_files_exist(files)
         for filename in files:
-            assert filename in output, f"ls 輸出中找不到 {filename}"
+            assert exists[filename], f"ls 輸出中找不到 {filename}"
 
     def test_create_file_with_special_name(self, xv6):
         """測試建立特殊名稱的檔案"""
@@ -325,11 +317,11 @@ class TestDirectoryOperations:
 
     def test_list_directory(self, xv6):
         """測試列出目錄內容"""
-        success, output = xv6.run_command("ls")
+        success, listing = xv6.run_command("ls", parse="ls")
         assert success, "ls 命令失敗"
 
         # 應該至少包含 . 和 ..
-        assert "." in output or ".." in output, "ls 應該顯示目錄項目"
+        assert "." in listing and ".." in listing, "ls 應該顯示目錄項目"
 
     def test_list_directory_with_files(self, xv6):
         """測試列出包含檔案的目錄"""
@@ -340,12 +332,13 @@ class TestDirectoryOperations:
             assert success
 
         # 列出目錄
-        success, output = xv6.run_command("ls")
+        success, listing = xv6.run_command("ls", parse="ls")
         assert success
 
-        # 驗證檔案出現在列表中
+        # 驗證檔案出現在列表中，且是內容為 "test\n" 的一般檔案
         for filename in test_files:
-            assert filename in output, f"{filename} 應該出現在 ls 輸出中"
+            assert filename in listing, f"{filename} 應該出現在 ls 輸出中"
+            assert listing[filename].is_file and listing[filename].size == 5
 
 
 @pytest.mark.filesystem
@@ -429,6 +422,56 @@ class TestFileSystemIntegration:
         print(f"\n成功建立 {created_count}/{num_files} 個檔案")
 
 
+@pytest.mark.filesystem
+class TestListingCache:
+    """測試 check_file_exists 的目錄列表快取"""
+
+    def test_repeated_checks_use_cache(self, xv6):
+        """沒有修改檔案系統時，重複檢查不應再執行 ls"""
+        assert xv6.check_file_exists("README")
+        before = xv6.stats()
+
+        for _ in range(5):
+            assert xv6.check_file_exists("README")
+            assert not xv6.check_file_exists("nothere.txt")
+        xv6.run_command("cat README")
+
+        after = xv6.stats()
+        assert after["ls_round_trips"] == before["ls_round_trips"]
+        assert after["round_trips_saved"] == before["round_trips_saved"] + 10
+
+    def test_mutating_commands_invalidate(self, xv6):
+        """重導向、rm、ln 之後快取應失效"""
+        assert not xv6.check_file_exists("cache.txt")
+
+        xv6.run_command("echo data > cache.txt")
+        assert xv6.check_file_exists("cache.txt")
+
+        xv6.run_command("ln cache.txt cache_link.txt")
+        assert xv6.check_file_exists("cache_link.txt")
+
+        xv6.run_command("rm cache.txt cache_link.txt")
+        assert xv6.check_files_exist(["cache.txt", "cache_link.txt"]) == \
+            {"cache.txt": False, "cache_link.txt": False}
+
+    def test_subdirectory_listing(self, xv6):
+        """可以檢查子目錄中的檔案"""
+        xv6.run_command("mkdir cachedir")
+        xv6.run_command("echo x > cachedir/inner.txt")
+
+        assert xv6.check_file_exists("cachedir")
+        assert xv6.check_file_exists("cachedir/inner.txt")
+        assert not xv6.check_file_exists("cachedir/other.txt")
+
+    def test_may_modify_fs(self):
+        """唯讀命令不應使快取失效，其他命令都應視為會修改"""
+        for command in ["ls", "cat README", "echo hi", "grep a README | wc", ""]:
+            assert not XV6TestHarness._may_modify_fs(command), command
+        for command in ["echo a > f", "rm f", "mkdir d", "ln a b",
+                        "cat a; rm b", "usertests", "cd d"]:
+            assert XV6TestHarness._may_modify_fs(command), command
+
+
 @pytest.mark.filesystem
 class TestFileSystemEdgeCases:
     """測試檔案系統邊界情況"""
@@ -0,0 +1,265 @@
+"""
+主機端 fs.img 讀取與建置測試
+以手工組出的小型 xv6 映像驗證 superblock、inode、目錄與間接區塊的解析，
+並以讀取器驗證 xv6_mkfs 建出的映像
+"""
+
+import errno
+import pytest
+import struct
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from xv6_fs import BSIZE, FSMAGIC, MAXFILE, NDIRECT, T_DEVICE, T_DIR, T_FILE, XV6FileSystem
+from xv6_harness import XV6TestHarness
+from xv6_mkfs import XV6ImageBuilder, build_image
+
+
+# 小型映像的配置：boot, super, log(3), inode(2), bitmap(1), data...
+NLOG, LOGSTART, INODESTART, BMAPSTART, DATASTART, SIZE = 3, 2, 5, 7, 8, 400
+
+
+def _make_image(path, files):
+    """
+    組出只有根目錄與一般檔案的 xv6 映像
+
+    Args:
+        path: 輸出路徑
+        files: 檔名 -> 內容
+    """
+    image = bytearray(SIZE * BSIZE)
+    struct.pack_into("<8I", image, BSIZE, FSMAGIC, SIZE, SIZE - DATASTART, 32,
+                     NLOG, LOGSTART, INODESTART, BMAPSTART)
+    next_block = [DATASTART]
+
+    def alloc(data):
+        blockno = next_block[0]
+        next_block[0] += 1
+        image[blockno * BSIZE:blockno * BSIZE + len(data)] = data
+        return blockno
+
+    def write_inode(inum, kind, data):
+        blocks = [alloc(data[i:i + BSIZE]) for i in range(0, len(data), BSIZE)]
+        addrs = blocks[:NDIRECT] + [0] * (NDIRECT - len(blocks[:NDIRECT]))
+        if len(blocks) > NDIRECT:
+            addrs.append(alloc(struct.pack(f"<{len(blocks) - NDIRECT}I", *blocks[NDIRECT:])))
+        else:
+            addrs.append(0)
+        offset = INODESTART * BSIZE + inum * 64
+        struct.pack_into(f"<4hI{NDIRECT + 1}I", image, offset, kind, 0, 0, 1, len(data), *addrs)
+
+    entries = [(".", 1), ("..", 1)]
+    for inum, (name, data) in enumerate(files.items(), start=2):
+        write_inode(inum, T_FILE, data)
+        entries.append((name, inum))
+    write_inode(1, T_DIR, b"".join(struct.pack("<H14s", inum, name.encode())
+                                   for name, inum in entries))
+    # bitmap：已使用的區塊（中繼資料與資料）全部標記
+    for blockno in range(next_block[0]):
+        image[BMAPSTART * BSIZE + blockno // 8] |= 1 << (blockno % 8)
+    with open(path, "wb") as f:
+        f.write(image)
+
+
+@pytest.fixture
+def image(tmp_path):
+    """包含一般檔案與需要間接區塊的大檔案的映像"""
+    path = str(tmp_path / "fs.img")
+    _make_image(path, {
+        "README": b"xv6 readme\n",
+        "empty.txt": b"",
+        "big.bin": bytes(range(256)) * 60,   # 15 個區塊，超過 NDIRECT
+    })
+    return path
+
+
+class TestFileSystemReader:
+    """測試 fs.img 解析"""
+
+    def test_superblock(self, image):
+        """應正確解析 superblock"""
+        with XV6FileSystem(image) as fs:
+            assert fs.superblock.magic == FSMAGIC
+            assert fs.superblock.inodestart == INODESTART
+
+    def test_listdir_and_read(self, image):
+        """列出根目錄並讀取檔案內容"""
+        with XV6FileSystem(image) as fs:
+            assert sorted(fs.listdir("/")) == ["README", "big.bin", "empty.txt"]
+            assert fs.read_file("/README") == b"xv6 readme\n"
+            assert fs.read_file("empty.txt") == b""
+            assert fs.exists("README") and not fs.exists("missing")
+
+    def test_indirect_blocks(self, image):
+        """超過 NDIRECT 個區塊的檔案要透過間接區塊讀取"""
+        with XV6FileSystem(image) as fs:
+            assert fs.read_file("big.bin") == bytes(range(256)) * 60
+
+    def test_errors(self, image):
+        """不存在的檔案與目錄應該拋出對應的例外"""
+        with XV6FileSystem(image) as fs:
+            with pytest.raises(FileNotFoundError):
+                fs.read_file("missing")
+            with pytest.raises(IsADirectoryError):
+                fs.read_file("/")
+            with pytest.raises(NotADirectoryError):
+                fs.listdir("README")
+
+    def test_walk_and_tree(self, image):
+        """走訪目錄樹並一次讀出所有檔案"""
+        with XV6FileSystem(image) as fs:
+            walked = list(fs.walk())
+            assert walked[0][0] == "/" and walked[0][1] == []
+            assert fs.tree()["/README"] == b"xv6 readme\n"
+
+    def test_log_replay(self, image):
+        """已提交但未寫回的日誌區塊應覆蓋原本的區塊"""
+        with XV6FileSystem(image) as fs:
+            readme_block = fs.lookup("README").addrs[0]
+
+        # 日誌標頭：1 個區塊，目的地為 README 的資料區塊
+        with open(image, "r+b") as f:
+            f.seek(LOGSTART * BSIZE)
+            f.write(struct.pack("<2I", 1, readme_block))
+            f.seek((LOGSTART + 1) * BSIZE)
+            f.write(b"from the log\n")
+
+        with XV6FileSystem(image) as fs:
+            assert fs.read_file("README") == b"from the lo"
+        with XV6FileSystem(image, replay_log=False) as fs:
+            assert fs.read_file("README") == b"xv6 readme\n"
+
+    def test_rejects_non_xv6_image(self, tmp_path):
+        """superblock magic 不符時拒絕開啟"""
+        path = tmp_path / "bad.img"
+        path.write_bytes(bytes(4 * BSIZE))
+        with pytest.raises(ValueError):
+            XV6FileSystem(str(path))
+
+
+class TestImageBuilder:
+    """測試 fs.img 建置"""
+
+    def test_add_files_to_copy(self, image, tmp_path):
+        """寫入複本不應修改原始映像，新舊檔案都要讀得到"""
+        dest = str(tmp_path / "out.img")
+        build_image(dest, base=image, files={
+            "new.txt": b"fresh\n",
+            "data/nested/deep.bin": bytes(range(256)) * 100,
+            "README": b"replaced\n",
+        })
+
+        with XV6FileSystem(dest) as fs:
+            assert fs.read_file("new.txt") == b"fresh\n"
+            assert fs.read_file("data/nested/deep.bin") == bytes(range(256)) * 100
+            assert fs.read_file("README") == b"replaced\n"
+            assert fs.read_file("big.bin") == bytes(range(256)) * 60
+        with XV6FileSystem(image) as fs:
+            assert not fs.exists("new.txt")
+            assert fs.read_file("README") == b"xv6 readme\n"
+
+    def test_mkdir_links(self, tmp_path):
+        """子目錄的 ".." 指回上層，上層 nlink 增加（與 kernel 的 mkdir 相同）"""
+        path = str(tmp_path / "fs.img")
+        with XV6ImageBuilder.create(path) as builder:
+            builder.mkdir("a/b")
+            builder.add_device("console", 1)
+
+        with XV6FileSystem(path) as fs:
+            a = fs.lookup("a")
+            assert a.type == T_DIR and a.nlink == 2
+            assert dict(fs.readdir(fs.lookup("a/b")))[".."] == a.inum
+            assert fs.lookup("console").type == T_DEVICE
+            assert fs.lookup("console").major == 1
+
+    def test_directory_read_does_not_allocate(self, tmp_path):
+        """讀取目錄（例如查詢檔名）不會替目錄配置區塊"""
+        path = str(tmp_path / "fs.img")
+        with XV6ImageBuilder.create(path) as builder:
+            inum = builder.mkdir("d")
+            # 讓目錄大小涵蓋一個尚未配置的區塊，模擬損壞的映像
+            inode = builder._read_inode(inum)
+            builder._write_inode(inode._replace(size=inode.size + BSIZE))
+            next_block = builder._next_block
+            builder._dirs.clear()
+
+            assert builder._dirlookup(inum, "missing") is None
+            assert builder._next_block == next_block
+            assert builder._read_inode(inum).addrs == inode.addrs
+
+    def test_overwrite_reuses_blocks(self, tmp_path):
+        """覆寫檔案時釋放舊的區塊，反覆覆寫不會耗盡空間"""
+        path = str(tmp_path / "fs.img")
+        with XV6ImageBuilder.create(path, size=400) as builder:
+            for i in range(20):
+                builder.add_file("big", bytes([i]) * (200 * BSIZE))
+
+        with XV6FileSystem(path) as fs:
+            assert fs.read_file("big") == bytes([19]) * (200 * BSIZE)
+
+    def test_limits(self, tmp_path):
+        """超過 xv6 檔案大小或 inode 數量時應該報錯"""
+        path = str(tmp_path / "fs.img")
+        with XV6ImageBuilder.create(path, ninodes=16) as builder:
+            with pytest.raises(ValueError):
+                builder.add_file("huge", bytes(MAXFILE * BSIZE + 1))
+            with pytest.raises(ValueError):
+                builder.add_file("a_very_long_file_name", b"")
+            with pytest.raises(OSError) as info:
+                builder.add_files({f"f{i}": b"" for i in range(20)})
+            assert info.value.errno == errno.ENOSPC
+
+    def test_resize_keeps_base(self, image, tmp_path):
+        """以更大的大小重建時保留原始內容，並可放入上千個檔案"""
+        dest = str(tmp_path / "big.img")
+        files = {f"many/f{i}": str(i).encode() for i in range(2000)}
+        build_image(dest, base=image, files=files, size=8000, ninodes=2100)
+
+        with XV6FileSystem(dest) as fs:
+            assert fs.superblock.ninodes == 2100
+            assert fs.read_file("README") == b"xv6 readme\n"
+            assert len(fs.listdir("many")) == 2000
+            assert fs.read_file("many/f1999") == b"1999"
+
+    def test_add_tree(self, tmp_path):
+        """複製主機目錄樹"""
+        host = tmp_path / "fixtures"
+        (host / "sub").mkdir(parents=True)
+        (host / "top.txt").write_bytes(b"top")
+        (host / "sub" / "inner.txt").write_bytes(b"inner")
+
+        dest = str(tmp_path / "fs.img")
+        build_image(dest, tree=str(host))
+        with XV6FileSystem(dest) as fs:
+            assert fs.tree() == {"/top.txt": b"top", "/sub/inner.txt": b"inner"}
+
+
+def test_boot_with_preloaded_files(tmp_path):
+    """開機前預先放入的檔案在 xv6 中應該可以直接使用"""
+    image = build_image(str(tmp_path / "fs.img"), base="../xv6-riscv/fs.img",
+                        files={f"pre/f{i}": f"preloaded {i}\n".encode() for i in range(100)},
+                        size=4000, ninodes=400)
+
+    with XV6TestHarness(xv6_path="../xv6-riscv", fs_image=image, disk_overlay=True) as xv6:
+        assert xv6.process, "無法啟動 xv6"
+        success, output = xv6.run_command("cat pre/f99")
+        assert success and output == "preloaded 99"
+        assert xv6.check_file_exists("pre/f0")
+
+
+def test_read_from_running_vm(xv6_pool):
+    """從執行中的 VM 直接讀取剛寫入的檔案"""
+    harness = xv6_pool.acquire()
+    assert harness, "無法啟動 xv6"
+    try:
+        harness.run_command("echo out of band > oob.txt")
+        with harness.open_filesystem() as fs:
+            assert fs.read_file("oob.txt") == b"out of band\n"
+            assert "README" in fs.listdir()
+
+        # 讀取後 VM 應該繼續執行
+        success, output = harness.run_command("echo still running")
+        assert success and output == "still running"
+    finally:
+        xv6_pool.release(harness)
@@ -0,0 +1,106 @@
+"""
+模糊測試引擎測試
+驗證文法產生的命令、變異、語料庫與 panic 偵測
+"""
+
+import json
+import pytest
+import random
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from xv6_console import ConsoleLog
+from xv6_fuzz import (MAX_LINE, Corpus, FuzzEngine, Mutator, ShellGrammar, execute_case,
+                      features, is_safe)
+
+
+class TestGrammar:
+    """測試文法產生器"""
+
+    def test_lines_are_safe(self):
+        """產生的命令行都在 sh 緩衝區內，且不會讀取 console 輸入"""
+        grammar = ShellGrammar(random.Random(0))
+        for _ in range(200):
+            for line in grammar.case():
+                assert is_safe(line) and len(line) <= MAX_LINE
+
+    def test_deterministic(self):
+        """同一個種子產生相同的案例"""
+        assert ShellGrammar(random.Random(7)).case() == ShellGrammar(random.Random(7)).case()
+
+    def test_is_safe(self):
+        assert is_safe("cat README | wc")
+        assert is_safe("grep x < README")
+        assert is_safe("echo hi > a ; cat a")
+        assert not is_safe("cat")
+        assert not is_safe("echo hi ; wc > out")
+        assert not is_safe("grep pattern")
+        assert not is_safe("echo " + "x" * MAX_LINE)
+
+
+class TestMutator:
+    """測試變異"""
+
+    def test_mutations_are_safe(self):
+        rng = random.Random(1)
+        mutator = Mutator(rng, ShellGrammar(rng))
+        case = ["echo hi > a", "cat a", "ls"]
+        for _ in range(200):
+            mutated = mutator.mutate(case, ["rm a", "wc README"])
+            assert mutated and all(is_safe(line) for line in mutated)
+
+
+class TestCorpus:
+    """測試語料庫"""
+
+    def test_features_normalized(self):
+        """名稱與數字不影響特徵"""
+        a = features(["cat x1"], [(True, "cat: cannot open x1")])
+        b = features(["cat y22"], [(True, "cat: cannot open y22")])
+        assert a == b == {"cat|cat: cannot open _"}
+        assert features(["ls"], [(False, "命令超時: ls")]) == {"ls|失敗"}
+
+    def test_keeps_only_new_behavior(self, tmp_path):
+        """只保留產生新特徵的案例，並可從目錄重新載入"""
+        corpus = Corpus(str(tmp_path))
+        assert corpus.add(["cat x"], {"cat|cat: cannot open _"})
+        assert not corpus.add(["cat y"], {"cat|cat: cannot open _"})
+        assert corpus.add(["ls"], {"ls|. N N N"})
+        assert sorted(Corpus(str(tmp_path)).cases) == [("cat x",), ("ls",)]
+
+
+class FakeHarness:
+    """只回報第一個命令成功的 harness，running 表示 QEMU 是否仍在執行"""
+
+    def __init__(self, running: bool):
+        self.running = running
+        self.last_fault = None
+        self.console_log = ConsoleLog()
+
+    def run_commands(self, commands, timeout=None):
+        return [(True, "")] + [(False, "失敗")] * (len(commands) - 1)
+
+    def is_running(self) -> bool:
+        return self.running
+
+
+@pytest.mark.parametrize("running, kind", [(True, "hang"), (False, "exit")])
+def test_crash_kind_from_process_state(running, kind):
+    """沒有 kernel 錯誤時，依 QEMU 是否仍在執行區分卡住與結束，不看錯誤訊息的文字"""
+    _, crash = execute_case(FakeHarness(running), ["echo a", "cat"], timeout=1)
+    assert crash["kind"] == kind and crash["command_index"] == 1 and crash["command"] == "cat"
+
+
+@pytest.mark.fuzzing
+def test_short_fuzz_run(xv6_pool, tmp_path):
+    """在真正的 xv6 上執行幾個案例"""
+    engine = FuzzEngine(xv6_pool, workers=1, seed=0, corpus=Corpus(str(tmp_path / "corpus")),
+                        crash_dir=str(tmp_path / "crashes"))
+    stats = engine.run(max_cases=5)
+    assert stats["vm_boots"] >= 1, "無法啟動 xv6"
+    assert stats["cases"] == 5 and stats["commands"] > 0
+    assert stats["corpus"] >= 1
+    for crash in engine.crashes:
+        print(json.dumps(crash, ensure_ascii=False)[:500])
+    assert not any(crash["kind"] == "panic" for crash in engine.crashes)
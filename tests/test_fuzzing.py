@@ -16,17 +16,13 @@ from xv6_harness import XV6TestHarness
 
 
 @pytest.fixture(scope="function")
-def xv6():
-    """Pytest fixture: 提供 xv6 實例"""
-    harness = XV6TestHarness(
-        xv6_path="../xv6-riscv",
-        timeout=20,
-        debug=True
-    )
-    success = harness.start()
-    assert success, "無法啟動 xv6"
+def xv6(xv6_pool):
+    """Pytest fixture: 提供 xv6 實例（從 VM 池取得已開機的實例）"""
+    harness = xv6_pool.acquire()
+    assert harness, "無法啟動 xv6"
+    harness.timeout = 20
     yield harness
-    harness.stop()
+    xv6_pool.release(harness)
 
 
 @pytest.mark.fuzzing
@@ -163,9 +159,8 @@ class TestBoundaryValues:
                 print(f"\n達到檔案限制: {i} 個檔案")
                 break
         
-        # 清理
-        for i in range(10):
-            xv6.run_command(f"rm fuzz_file{i}.txt", timeout=5)
+        # 清理（批次送出）
+        xv6.run_commands([f"rm fuzz_file{i}.txt" for i in range(10)], timeout=5)
 
 
 @pytest.mark.fuzzing
@@ -289,9 +284,8 @@ class TestResourceExhaustion:
         
         print(f"\n成功建立 {len(created)} 個檔案")
         
-        # 清理
-        for filename in created:
-            xv6.run_command(f"rm {filename}", timeout=5)
+        # 清理（批次送出）
+        xv6.run_commands([f"rm {filename}" for filename in created], timeout=5)
         
         # 至少應該能建立一些檔案
         assert len(created) > 0, "應該能建立至少一些檔案"
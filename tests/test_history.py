@@ -0,0 +1,88 @@
+"""
+效能歷史資料庫測試
+驗證 Mann-Whitney U 檢定、依 revision 保存樣本與回歸判斷
+"""
+
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from xv6_history import PerfHistory, mann_whitney_u, weighted_median
+
+
+def _samples(values):
+    return [(value, 1) for value in values]
+
+
+class TestMannWhitney:
+    """測試 U 檢定"""
+
+    def test_separated_groups(self):
+        """完全分開的兩組（與 scipy.stats.mannwhitneyu 的常態近似一致）"""
+        u, p = mann_whitney_u(_samples([1, 2, 3, 4, 5]), _samples([6, 7, 8, 9, 10]))
+        assert u == 0
+        assert p == pytest.approx(0.01219, abs=1e-4)
+
+    def test_identical_groups(self):
+        """相同分佈不顯著"""
+        _, p = mann_whitney_u(_samples([1, 2, 3, 4, 5]), _samples([1, 2, 3, 4, 5]))
+        assert p == pytest.approx(1.0)
+
+    def test_weighted_equals_expanded(self):
+        """帶次數的樣本與展開後的樣本結果相同"""
+        weighted = mann_whitney_u([(1.0, 3), (2.0, 2)], [(2.0, 1), (3.0, 4)])
+        expanded = mann_whitney_u(_samples([1, 1, 1, 2, 2]), _samples([2, 3, 3, 3, 3]))
+        assert weighted == pytest.approx(expanded)
+
+    def test_weighted_median(self):
+        assert weighted_median([(1.0, 1), (5.0, 10), (9.0, 1)]) == 5.0
+        assert weighted_median([]) == 0.0
+
+
+class TestPerfHistory:
+    """測試資料庫保存與 revision 比較"""
+
+    @pytest.fixture
+    def history(self, tmp_path):
+        with PerfHistory(str(tmp_path / "history.sqlite")) as history:
+            yield history
+
+    def test_samples_by_revision_prefix(self, history):
+        """以 revision 或 kernel 雜湊前綴取得多次執行的樣本"""
+        history.record_run("aaaa1111", "k1", {("test", "t"): [(1.0, 1)]})
+        history.record_run("aaaa1111", "k1", {("test", "t"): [(1.2, 1)]})
+        history.record_run("bbbb2222", "k2", {("test", "t"): [(5.0, 1)]})
+
+        assert sorted(history.samples("aaaa")[("test", "t")]) == [(1.0, 1), (1.2, 1)]
+        assert history.samples("k2")[("test", "t")] == [(5.0, 1)]
+        assert history.samples("cccc") == {}
+        assert [row[0] for row in history.revisions()] == ["bbbb2222", "aaaa1111"]
+
+    def test_recent_samples(self, history):
+        """最近幾次 run 中某種樣本，不分 revision"""
+        history.record_run("aaaa1111", "k1", {("command", "ls"): [(0.1, 5)]})
+        history.record_run("bbbb2222", "k2", {("command", "ls"): [(0.2, 3)],
+                                              ("test", "t"): [(1.0, 1)]})
+        assert sorted(history.recent_samples("command")["ls"]) == [(0.1, 5), (0.2, 3)]
+        assert history.recent_samples("command", runs=1) == {"ls": [(0.2, 3)]}
+        assert history.recent_samples("command", host="other") == {}
+
+    def test_compare_flags_regression(self, history):
+        """顯著且超過門檻的變慢標記為 regression，雜訊不標記"""
+        for i in range(8):
+            history.record_run("base", "k1", {("test", "forktest"): [(1.0 + i * 0.01, 1)],
+                                              ("boot", "total"): [(2.0 + i * 0.01, 1)]})
+            history.record_run("head", "k2", {("test", "forktest"): [(1.5 + i * 0.01, 1)],
+                                              ("boot", "total"): [(2.0 + i * 0.01, 1)]})
+
+        results = {r["name"]: r for r in history.compare("base", "head")}
+        assert results["forktest"]["status"] == "regression"
+        assert results["forktest"]["change"] == pytest.approx(0.5, rel=0.05)
+        assert results["total"]["status"] == "unchanged"
+
+    def test_compare_requires_samples(self, history):
+        """樣本太少的項目不做檢定"""
+        history.record_run("base", "k1", {("test", "t"): [(1.0, 1)]})
+        history.record_run("head", "k2", {("test", "t"): [(9.0, 1)]})
+        assert history.compare("base", "head") == []
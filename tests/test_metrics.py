@@ -0,0 +1,112 @@
+"""
+延遲指標測試
+驗證直方圖的百分位數精度、Prometheus 輸出格式，以及框架呼叫的自動記錄
+"""
+
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from xv6_metrics import REGISTRY, ByteCounter, Histogram, MetricsRegistry
+
+
+class TestHistogram:
+    """測試 HDR 風格直方圖"""
+
+    def test_percentiles_within_bucket_error(self):
+        """百分位數的相對誤差不超過桶寬（約 2 / 2^SUB_BUCKET_BITS）"""
+        hist = Histogram()
+        for i in range(1, 10001):
+            hist.record(i / 1000)      # 1ms .. 10s
+
+        assert hist.count == 10000
+        assert hist.percentile(50) == pytest.approx(5.0, rel=0.02)
+        assert hist.percentile(99) == pytest.approx(9.9, rel=0.02)
+        assert hist.percentile(100) == pytest.approx(10.0)
+        assert hist.mean == pytest.approx(5.0005)
+
+    def test_sparse_buckets(self):
+        """只為出現過的值配置桶"""
+        hist = Histogram()
+        for _ in range(1000):
+            hist.record(0.25)
+        hist.record(30.0)
+        assert len(hist.counts) == 2
+        assert hist.percentile(50) == pytest.approx(0.25, rel=0.02)
+        assert hist.max == 30.0
+
+    def test_empty(self):
+        """沒有資料時百分位數為 0"""
+        assert Histogram().percentile(99) == 0.0
+        assert Histogram().to_dict()["count"] == 0
+
+
+class TestRegistry:
+    """測試指標登錄與輸出"""
+
+    def test_top_groups_by_label(self):
+        """依標籤加總，耗時最多的在前"""
+        registry = MetricsRegistry()
+        registry.observe("xv6_call_seconds", 1.0, op="run_command", test="a")
+        registry.observe("xv6_call_seconds", 2.0, op="start", test="a")
+        registry.observe("xv6_call_seconds", 0.5, op="run_command", test="b")
+
+        top = registry.top("xv6_call_seconds", "test")
+        assert top[0] == ("a", pytest.approx(3.0), 2)
+        assert top[1] == ("b", pytest.approx(0.5), 1)
+
+    def test_prometheus_format(self):
+        """summary 輸出 quantile/_sum/_count，計數器輸出 counter"""
+        registry = MetricsRegistry()
+        registry.observe("xv6_call_seconds", 0.5, op="run_command")
+        registry.inc("xv6_call_bytes_sent_total", 42, op="run_command")
+
+        text = registry.to_prometheus()
+        assert "# TYPE xv6_call_seconds summary" in text
+        assert 'xv6_call_seconds{op="run_command",quantile="0.99"}' in text
+        assert 'xv6_call_seconds_count{op="run_command"} 1' in text
+        assert "# TYPE xv6_call_bytes_sent_total counter" in text
+        assert 'xv6_call_bytes_sent_total{op="run_command"} 42' in text
+
+    def test_label_escaping(self):
+        """標籤值中的引號與反斜線要跳脫"""
+        registry = MetricsRegistry()
+        registry.observe("xv6_command_seconds", 0.1, command='echo "a\\b"')
+        assert 'command="echo \\"a\\\\b\\""' in registry.to_prometheus()
+
+    def test_write(self, tmp_path):
+        """寫出 JSON 與 Prometheus 兩個檔案"""
+        registry = MetricsRegistry()
+        registry.observe("xv6_call_seconds", 0.1, op="stop")
+        json_path, prom_path = registry.write(str(tmp_path), "metrics-gw0")
+        assert os.path.basename(json_path) == "metrics-gw0.json"
+        assert os.path.getsize(json_path) > 0 and os.path.getsize(prom_path) > 0
+
+    def test_byte_counter(self):
+        """計算 str（UTF-8）與 bytes 的位元組數"""
+        counter = ByteCounter()
+        counter.write("ls\n")
+        counter.write(b"\x00\x01")
+        counter.write("測")
+        assert counter.bytes == 3 + 2 + 3
+
+
+def test_harness_calls_recorded(xv6_pool):
+    """框架呼叫自動記錄延遲與收發量，巢狀呼叫只記錄最外層"""
+    harness = xv6_pool.acquire()
+    assert harness, "無法啟動 xv6"
+    try:
+        harness.run_command("echo metrics")
+        harness.check_file_exists("README")
+
+        # current_test 由 conftest 設為 nodeid
+        test = os.environ["PYTEST_CURRENT_TEST"].rsplit(" ", 1)[0]
+        assert REGISTRY.histogram("xv6_call_seconds", op="run_command", test=test).count == 1
+        assert REGISTRY.histogram("xv6_call_seconds", op="check_file_exists", test=test).count == 1
+        assert REGISTRY.histogram("xv6_command_seconds", command="echo").count >= 1
+        received = {tuple(sorted(c["labels"].items())): c["value"]
+                    for c in REGISTRY.to_dict()["counters"]["xv6_call_bytes_received_total"]}
+        assert received[(("op", "run_command"), ("test", test))] > 0
+    finally:
+        xv6_pool.release(harness)
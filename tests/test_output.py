@@ -0,0 +1,96 @@
+"""
+有界輸出模式測試
+驗證 OutputSink 只保留最後一段、完整輸出的雜湊與暫存檔，以及與一般模式結果一致
+"""
+
+import hashlib
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from xv6_harness import XV6TestHarness
+from xv6_output import HEAD_SIZE, OutputSink
+
+
+def _sink(limit, spill_dir=None):
+    """以框架的清理函數建立 OutputSink，回顯行為 "cmd" """
+    echoes = ["cmd"]
+    return OutputSink(limit,
+                      lambda raw: XV6TestHarness._clean_framed_output(raw, echoes),
+                      lambda text: XV6TestHarness._strip_echoes(text, echoes),
+                      spill_dir)
+
+
+def _feed(sink, raw, size=100):
+    """以固定大小分段送入"""
+    for i in range(0, len(raw), size):
+        sink.feed(raw[i:i + size])
+    return sink.finish()
+
+
+class TestOutputSink:
+    """測試有界輸出的緩衝"""
+
+    def test_short_output_matches_normal_mode(self):
+        """比 HEAD_SIZE 短的輸出與一般模式完全相同"""
+        raw = "\r\n$ cmd\r\nhello\r\nworld\r\n$ "
+        output = _feed(_sink(1000), raw, size=3)
+        assert output == XV6TestHarness._clean_framed_output(raw, ["cmd"]) == "hello\nworld"
+        assert not output.truncated
+
+    def test_long_output_keeps_tail(self):
+        """長輸出只保留最後 limit 個字元，長度與雜湊涵蓋完整輸出"""
+        lines = [f"line {i:05d}" for i in range(2000)]
+        raw = "\r\n$ cmd\r\n" + "\r\n".join(lines) + "\r\n\r\n$ "
+        full = "\n".join(lines)
+        assert len(full) > HEAD_SIZE
+
+        output = _feed(_sink(256), raw)
+        assert output.truncated
+        assert output == full[-256:]
+        assert output.total_length == len(full)
+        assert output.sha256 == hashlib.sha256(full.encode()).hexdigest()
+
+    def test_crlf_split_across_chunks(self):
+        """\\r 與 \\n 分在兩段時仍正確正規化"""
+        raw = "\r\n$ cmd\r\n" + "ab\r\n" * 3000 + "$ "
+        output = _feed(_sink(64), raw, size=7)
+        assert "\r" not in output
+        assert output.endswith("ab\nab")
+
+    def test_spill_file(self, tmp_path):
+        """完整輸出寫到暫存檔"""
+        raw = "\r\n$ cmd\r\n" + "y" * 10000 + "\r\n$ "
+        output = _feed(_sink(100, str(tmp_path)), raw)
+        with open(output.spill_path) as f:
+            assert f.read() == "y" * 10000
+        assert len(output) == 100
+
+    def test_discard_removes_spill(self, tmp_path):
+        """命令失敗時刪除暫存檔"""
+        sink = _sink(100, str(tmp_path))
+        sink.feed("\r\n$ cmd\r\n" + "z" * 10000)
+        sink.discard()
+        assert os.listdir(tmp_path) == []
+
+
+def test_bounded_matches_unbounded():
+    """實際 VM 上有界模式的結果是一般模式輸出的結尾"""
+    harness = XV6TestHarness(xv6_path="../xv6-riscv", isolate_disk=True, output_limit=128)
+    try:
+        assert harness.start(), "無法啟動 xv6"
+        harness.output_limit = None
+        success, full = harness.run_command("cat README")
+        assert success
+
+        harness.output_limit = 128
+        success, tail = harness.run_command("cat README")
+        assert success
+        assert full.endswith(tail) and len(tail) == 128
+        assert tail.total_length == len(full)
+
+        # 有界模式之後 console 狀態正常
+        assert harness.run_command("echo ok") == (True, "ok")
+    finally:
+        harness.stop()
@@ -0,0 +1,99 @@
+"""
+xv6 平行執行器測試
+驗證測試收集、分配與依歷史耗時的排程
+"""
+
+import json
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from xv6_history import PerfHistory
+from xv6_parallel import collect_tests, estimate_durations, load_durations, schedule
+
+
+class TestSchedule:
+    """測試依耗時的排程"""
+
+    def test_every_test_assigned_once(self):
+        """每個測試都應該剛好被分配到一個 worker"""
+        tests = [f"tests/test_x.py::test_{i}" for i in range(10)]
+        buckets, _ = schedule(tests, 3, {})
+
+        assigned = [t for bucket in buckets for t in bucket]
+        assert sorted(assigned) == sorted(tests)
+        assert len(buckets) == 3
+
+    def test_even_spread(self):
+        """耗時相同時各 worker 的測試數量差距不超過 1"""
+        tests = [f"tests/test_x.py::test_{i}" for i in range(11)]
+        buckets, loads = schedule(tests, 4, {test: 2.0 for test in tests})
+        sizes = [len(bucket) for bucket in buckets]
+        assert len(buckets) == 4 and max(sizes) - min(sizes) <= 1
+        assert max(loads) - min(loads) <= 2.0
+
+    def test_more_workers_than_tests(self):
+        """worker 比測試多時不應產生空的 worker"""
+        buckets, loads = schedule(["a.py::a", "b.py::b"], 8, {})
+        assert len(buckets) == 2 and len(loads) == 2
+
+    def test_lpt_balance(self):
+        """由長到短分給負載最小的 worker：輪流分配會是 15/13，LPT 剛好平分"""
+        durations = {f"t{i}.py::t": seconds
+                     for i, seconds in enumerate((7.0, 6.0, 5.0, 4.0, 3.0, 3.0))}
+        buckets, loads = schedule(list(durations), 2, durations, group=False)
+        assert loads == [14.0, 14.0]
+        assert sorted(t for bucket in buckets for t in bucket) == sorted(durations)
+
+    def test_longest_first(self):
+        """長的測試先分配，各自落在不同的 worker"""
+        durations = {"a.py::slow1": 60.0, "b.py::slow2": 50.0, "c.py::x": 10.0,
+                     "c.py::y": 10.0, "d.py::z": 20.0}
+        buckets, loads = schedule(list(durations), 2, durations, group=False)
+        assert sorted(loads) == [70.0, 80.0]
+        assert not any({"a.py::slow1", "b.py::slow2"} <= set(bucket) for bucket in buckets)
+        assert sorted(t for bucket in buckets for t in bucket) == sorted(durations)
+
+    def test_module_groups(self):
+        """同一個測試檔的短測試留在同一個 worker，依原本的順序"""
+        tests = [f"tests/test_a.py::test_{i}" for i in range(4)] + ["tests/test_b.py::test_slow"]
+        durations = {test: 1.0 for test in tests[:4]}
+        durations["tests/test_b.py::test_slow"] = 10.0
+        buckets, loads = schedule(tests, 2, durations)
+        assert sorted(buckets) == [tests[:4], tests[4:]]
+        assert sorted(loads) == [4.0, 10.0]
+
+    def test_large_module_split(self):
+        """一個測試檔太大時拆到多個 worker"""
+        tests = [f"tests/test_a.py::test_{i}" for i in range(8)]
+        buckets, loads = schedule(tests, 4, {test: 5.0 for test in tests})
+        assert len(buckets) == 4 and loads == [10.0] * 4
+
+    def test_estimates_for_new_tests(self):
+        """沒有紀錄的測試以同一個檔案的中位數估計"""
+        durations = {"tests/test_a.py::old1": 2.0, "tests/test_a.py::old2": 4.0,
+                     "tests/test_b.py::old": 30.0}
+        estimates = estimate_durations(["tests/test_a.py::new", "tests/test_c.py::new"], durations)
+        assert estimates == {"tests/test_a.py::new": 3.0, "tests/test_c.py::new": 4.0}
+
+
+def test_load_durations(tmp_path):
+    """上次的 worker 紀錄與指定的檔案覆蓋資料庫中的中位數"""
+    db_path = str(tmp_path / "history.sqlite")
+    with PerfHistory(db_path) as history:
+        for seconds in (1.0, 2.0, 9.0):
+            history.record_run("aaaa", "k1", {("test", "t::a"): [(seconds, 1)],
+                                              ("test", "t::b"): [(seconds, 1)]})
+    with open(tmp_path / "worker-0.json", "w") as f:
+        json.dump({"t::b": {"duration": 5.0, "outcome": "failed"}}, f)
+    with open(tmp_path / "extra.json", "w") as f:
+        json.dump({"t::c": 7.0}, f)
+
+    durations = load_durations(str(tmp_path), db_path, [str(tmp_path / "extra.json")])
+    assert durations == {"t::a": 2.0, "t::b": 5.0, "t::c": 7.0}
+
+
+def test_collect_tests_returns_node_ids():
+    """收集結果應該是 pytest node id"""
+    tests = collect_tests([os.path.join(os.path.dirname(__file__), "test_parallel.py")])
+    assert any(t.endswith("TestSchedule::test_every_test_assigned_once") for t in tests)
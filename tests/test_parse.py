@@ -0,0 +1,97 @@
+"""
+命令輸出解析測試
+驗證 ls、wc、usertests 輸出的解析與快取
+"""
+
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from xv6_harness import XV6TestHarness
+from xv6_parse import DirEntry, parse_ls, parse_usertests, parse_wc
+
+LS_OUTPUT = """\
+.              1 1 1024
+..             1 1 1024
+README         2 2 2290
+cat            2 3 34208
+console        3 21 0
+a_very_long_name 2 25 12"""
+
+USERTESTS_OUTPUT = """\
+usertests starting
+test copyin: OK
+test copyout: OK
+test sbrkfail: usertrap(): unexpected scause 0xd pid=6
+            sepc=0x2c8 stval=0x0
+OK
+test bigdir: FAILED
+test manywrites: """
+
+
+class TestParseLs:
+    """測試 ls 解析"""
+
+    def test_entries(self):
+        """每列轉成 DirEntry，依輸出順序"""
+        listing = parse_ls(LS_OUTPUT)
+        assert len(listing) == 6
+        assert listing["README"] == DirEntry("README", 2, 2, 2290)
+        assert listing["."].is_dir and listing["README"].is_file and listing["console"].is_device
+        assert listing.names == ("README", "cat", "console", "a_very_long_name")
+
+    def test_ignores_errors(self):
+        """錯誤訊息不會變成項目"""
+        listing = parse_ls("ls: cannot open nodir")
+        assert len(listing) == 0 and "ls:" not in listing
+
+    def test_no_substring_false_positive(self):
+        """名稱比對是完整比對，不是子字串"""
+        listing = parse_ls(LS_OUTPUT)
+        assert "READ" not in listing and "." in listing
+
+    def test_cached_per_output(self):
+        """同一份輸出重複解析返回同一個物件"""
+        assert parse_ls(LS_OUTPUT) is parse_ls(LS_OUTPUT)
+
+    def test_slots(self):
+        """紀錄不帶 __dict__"""
+        assert not hasattr(parse_ls(LS_OUTPUT)["README"], "__dict__")
+
+
+class TestParseWc:
+    """測試 wc 解析"""
+
+    def test_counts(self):
+        counts = parse_wc("49 323 2290 README\n3 3 12 a b")
+        assert counts[0].lines == 49 and counts[0].words == 323 and counts[0].bytes == 2290
+        assert counts[0].name == "README"
+        assert counts[1].name == "a b"
+
+    def test_stdin(self):
+        """讀取標準輸入時沒有檔名"""
+        assert parse_wc("1 2 6 ")[0].name == ""
+
+
+class TestParseUsertests:
+    """測試 usertests 解析"""
+
+    def test_results(self):
+        """kernel 訊息夾在測試名稱與結果之間時仍正確判斷"""
+        result = parse_usertests(USERTESTS_OUTPUT)
+        assert result.passed == ("copyin", "copyout", "sbrkfail")
+        assert result.failed == ("bigdir",)
+        assert result.incomplete == "manywrites"
+        assert not result.all_passed
+
+    def test_all_passed(self):
+        result = parse_usertests("test a: OK\ntest b: OK\nALL TESTS PASSED")
+        assert result.all_passed and result.as_dict() == {"a": True, "b": True}
+
+
+def test_unknown_parser():
+    """不支援的解析器名稱"""
+    harness = XV6TestHarness(xv6_path="../xv6-riscv")
+    with pytest.raises(ValueError):
+        harness.run_command("ls", parse="nope")
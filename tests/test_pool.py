@@ -0,0 +1,176 @@
+"""
+xv6 VM 池測試
+驗證預先開機、借出/歸還、記憶體預算與統計計數
+"""
+
+import pytest
+import sys
+import os
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from xv6_pool import XV6HarnessPool
+
+
+class FakeHarness:
+    """模擬 XV6TestHarness 的開機/關機，不需要 QEMU"""
+
+    boot_delay = 0.05
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.running = False
+
+    def start(self) -> bool:
+        time.sleep(self.boot_delay)
+        self.running = not self.fail
+        return self.running
+
+    def stop(self) -> bool:
+        self.running = False
+        return True
+
+
+def wait_for_idle(pool, count, timeout=2.0):
+    """等待池中待命數量達到 count"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if pool.stats()["idle"] >= count:
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_default_factory_isolates_disk():
+    """池中的 VM 同時執行，預設的 harness 必須各自使用私有磁碟"""
+    pool = XV6HarnessPool(size=0, xv6_path="../xv6-riscv")
+    harness = pool.harness_factory()
+    assert harness.isolate_disk and harness.disk_overlay
+
+
+def test_shared_disk_rejected():
+    """明確關閉私有磁碟時拒絕建立池，而不是讓 VM 同時寫入同一個 fs.img"""
+    with pytest.raises(ValueError):
+        XV6HarnessPool(size=0, xv6_path="../xv6-riscv", isolate_disk=False, disk_overlay=False)
+    # 只關閉覆蓋層時仍使用私有複本
+    pool = XV6HarnessPool(size=0, xv6_path="../xv6-riscv", disk_overlay=False)
+    assert pool.harness_factory().isolate_disk
+
+
+class TestPoolBehavior:
+    """測試池的借出與補充邏輯"""
+
+    def test_prebooted_acquire_is_hit(self):
+        """預先開機完成後取用應該命中且幾乎不用等待"""
+        with XV6HarnessPool(size=2, harness_factory=FakeHarness) as pool:
+            assert wait_for_idle(pool, 2), "池未在時間內預先開機"
+
+            harness = pool.acquire()
+            assert harness is not None and harness.running
+            pool.release(harness)
+
+            stats = pool.stats()
+            assert stats["hits"] == 1
+            assert stats["misses"] == 0
+
+    def test_released_harness_is_discarded(self):
+        """歸還的實例應該被關閉，不會再被借出"""
+        with XV6HarnessPool(size=1, harness_factory=FakeHarness) as pool:
+            first = pool.acquire()
+            pool.release(first)
+            assert not first.running, "歸還的實例應該已停止"
+
+            second = pool.acquire()
+            assert second is not first
+            pool.release(second)
+
+    def test_cold_pool_counts_miss(self):
+        """待命池為空時取用應該計為 miss 並記錄等待時間"""
+        with XV6HarnessPool(size=1, harness_factory=FakeHarness) as pool:
+            harness = pool.acquire()
+            assert harness is not None
+            pool.release(harness)
+
+            stats = pool.stats()
+            assert stats["misses"] == 1
+            assert stats["total_wait"] > 0
+
+    def test_size_zero_boots_inline(self):
+        """size=0 時每次取用都在目前執行緒開機"""
+        with XV6HarnessPool(size=0, harness_factory=FakeHarness) as pool:
+            harness = pool.acquire()
+            assert harness is not None and harness.running
+            pool.release(harness)
+            assert pool.stats()["boots"] == 1
+
+    def test_boot_failure_returns_none(self):
+        """開機失敗時 acquire 應該返回 None 而不是一直等待"""
+        with XV6HarnessPool(size=1, harness_factory=lambda: FakeHarness(fail=True)) as pool:
+            assert pool.acquire(timeout=2) is None
+            assert pool.stats()["boot_failures"] >= 1
+
+    def test_boot_exception_does_not_leak_slot(self):
+        """start() 拋出例外時 acquire 不會卡住，VM 被關閉且池會補上這個位置"""
+        harnesses = []
+
+        class RaisingHarness(FakeHarness):
+            def start(self):
+                harnesses.append(self)
+                self.running = True
+                raise RuntimeError("qemu 無法啟動")
+
+        with XV6HarnessPool(size=1, harness_factory=RaisingHarness) as pool:
+            assert pool.acquire(timeout=None) is None
+            assert pool.acquire(timeout=None) is None
+            stats = pool.stats()
+            assert stats["boot_failures"] >= 2
+            assert stats["pending"] <= 1
+        assert harnesses and not any(h.running for h in harnesses)
+
+
+class TestPoolLimits:
+    """測試記憶體預算與補充並行度"""
+
+    def test_memory_budget_caps_live_vms(self):
+        """記憶體預算應該限制同時存在的 VM 數量"""
+        pool = XV6HarnessPool(size=4, harness_factory=FakeHarness,
+                              max_memory_mb=256, vm_memory_mb=128)
+        assert pool.max_vms == 2
+        pool.start()
+        try:
+            assert wait_for_idle(pool, 2)
+            time.sleep(0.1)
+            assert pool.stats()["idle"] == 2, "不應該超過記憶體預算"
+        finally:
+            pool.close()
+
+    def test_refill_concurrency(self):
+        """同時開機的數量不應超過 refill_concurrency"""
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        class TrackingHarness(FakeHarness):
+            def start(self):
+                with lock:
+                    active.append(self)
+                    peak.append(len(active))
+                result = super().start()
+                with lock:
+                    active.remove(self)
+                return result
+
+        with XV6HarnessPool(size=4, harness_factory=TrackingHarness,
+                            refill_concurrency=2) as pool:
+            assert wait_for_idle(pool, 4)
+        assert max(peak) <= 2
+
+
+def test_pool_with_real_xv6():
+    """使用真正的 xv6：借出的實例應該已停在 shell 提示符"""
+    with XV6HarnessPool(size=1, xv6_path="../xv6-riscv", timeout=10) as pool:
+        with pool.lease() as harness:
+            assert harness is not None, "無法啟動 xv6"
+            success, output = harness.run_command("echo pooled")
+            assert success and "pooled" in output
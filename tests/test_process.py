@@ -15,17 +15,13 @@ from xv6_harness import XV6TestHarness
 
 
 @pytest.fixture(scope="function")
-def xv6():
-    """Pytest fixture: 提供 xv6 實例"""
-    harness = XV6TestHarness(
-        xv6_path="../xv6-riscv",
-        timeout=20,
-        debug=True
-    )
-    success = harness.start()
-    assert success, "無法啟動 xv6"
+def xv6(xv6_pool):
+    """Pytest fixture: 提供 xv6 實例（從 VM 池取得已開機的實例）"""
+    harness = xv6_pool.acquire()
+    assert harness, "無法啟動 xv6"
+    harness.timeout = 20
     yield harness
-    harness.stop()
+    xv6_pool.release(harness)
 
 
 @pytest.mark.process
@@ -338,16 +334,24 @@ class TestAdvancedProcessFeatures:
             pytest.skip("usertests 不存在")
         
         print("\n執行 usertests（這會花費較長時間）...")
-        success, output = xv6.run_command("usertests", timeout=300)
-        
-        if success:
-            # 檢查測試結果
-            if "ALL TESTS PASSED" in output or "all tests" in output.lower():
-                print("\n✓ usertests 全部通過")
-            else:
-                print(f"\nusertests 輸出:\n{output}")
-        else:
-            print("\n⚠ usertests 超時或失敗")
+        # 串流讀取輸出：即時顯示進度，出現 FAILED 時立即中止而不是等到超時；
+        # usertests 會刻意觸發 usertrap，只有 panic 才讓命令失敗
+        passed = []
+        all_passed = False
+        stream = xv6.stream_command("usertests", timeout=300,
+                                    abort_if=lambda line: "FAILED" in line,
+                                    fatal_faults=("panic",))
+        for line in stream:
+            if line.startswith("test ") and line.endswith("OK"):
+                passed.append(line)
+            elif "ALL TESTS PASSED" in line:
+                all_passed = True
+
+        if stream.aborted:
+            pytest.fail(f"usertests 失敗（已通過 {len(passed)} 項）: {stream.error}")
+        assert stream.success, f"usertests 超時或失敗: {stream.error}"
+        assert all_passed, f"usertests 沒有輸出 ALL TESTS PASSED（{len(passed)} 項通過）"
+        print(f"\n✓ usertests 全部通過，{len(passed)} 項")
 
 
 if __name__ == "__main__":
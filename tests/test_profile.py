@@ -0,0 +1,82 @@
+"""
+開機階段計時測試
+驗證 BootProfile 的階段耗時計算與跨多次開機的彙總
+"""
+
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from xv6_harness import XV6TestHarness
+from xv6_profile import BootProfile, summarize
+
+
+def _profile(marks, success=True):
+    """以指定的時間點建立 BootProfile"""
+    profile = BootProfile("direct")
+    profile.marks = dict(marks)
+    profile.success = success
+    return profile
+
+
+class TestBootProfile:
+    """測試單次開機紀錄"""
+
+    def test_durations_follow_phase_order(self):
+        """各階段耗時是與前一個完成階段的差，略過沒出現的階段"""
+        profile = _profile({"build_check": 0.1, "spawn": 0.3,
+                            "kernel_booting": 1.0, "init_sh": 2.5, "prompt": 2.6})
+        durations = profile.durations()
+        assert list(durations) == ["build_check", "spawn", "kernel_booting", "init_sh", "prompt"]
+        assert durations["spawn"] == pytest.approx(0.2)
+        assert durations["init_sh"] == pytest.approx(1.5)
+        assert profile.total == pytest.approx(2.6)
+
+    def test_prompt_marks_success(self):
+        """看到提示符時標記為成功"""
+        profile = BootProfile("direct")
+        profile.waiting_for = "prompt"
+        profile.mark("spawn")
+        assert not profile.success
+        profile.mark("prompt")
+        assert profile.success and profile.waiting_for is None
+
+    def test_format_reports_stuck_phase(self):
+        """開機失敗時摘要要指出卡住的階段"""
+        profile = _profile({"spawn": 0.1}, success=False)
+        profile.waiting_for = "kernel_booting"
+        assert "卡在 kernel_booting" in profile.format()
+
+
+class TestSummary:
+    """測試跨開機彙總"""
+
+    def test_summary_statistics(self):
+        """每個階段的 min/median/p95/max，只統計成功的開機"""
+        records = [_profile({"spawn": 0.1 * i, "prompt": 1.0 * i}) for i in range(1, 21)]
+        records.append(_profile({"spawn": 99.0}, success=False))
+
+        summary = summarize(records)
+        assert summary["spawn"]["count"] == 20
+        assert summary["spawn"]["max"] == pytest.approx(2.0)
+        assert summary["total"]["min"] == pytest.approx(1.0)
+        assert summary["total"]["median"] == pytest.approx(10.5)
+        assert summary["total"]["p95"] == pytest.approx(19.0)
+
+    def test_empty_summary(self):
+        """沒有成功的開機時返回空的彙總"""
+        assert summarize([]) == {}
+
+
+def test_real_boot_profile():
+    """實際開機應記錄到 kernel 開機訊息與提示符"""
+    harness = XV6TestHarness(xv6_path="../xv6-riscv", isolate_disk=True)
+    try:
+        assert harness.start(), "無法啟動 xv6"
+        marks = harness.boot_profile.marks
+        for phase in ("build_check", "disk_setup", "spawn", "kernel_booting", "init_sh", "prompt"):
+            assert phase in marks, f"缺少開機階段 {phase}"
+        assert list(marks.values()) == sorted(marks.values())
+    finally:
+        harness.stop()
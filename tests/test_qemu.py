@@ -0,0 +1,121 @@
+"""
+QEMU 命令列解析測試
+驗證從 make -n qemu 輸出解析命令列、替換磁碟映像與快取行為
+"""
+
+import json
+import pytest
+import shutil
+import subprocess
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from xv6_qemu import (QEMU_IMG, _cache_key, allocated_bytes, create_overlay, parse_make_dry_run,
+                      resolve_qemu_command, with_drive)
+from xv6_harness import XV6TestHarness
+
+
+MAKE_OUTPUT = """riscv64-linux-gnu-gcc -c -o kernel/main.o kernel/main.c
+qemu-system-riscv64 -machine virt -bios none -kernel kernel/kernel -m 128M -smp 3 -nographic -global virtio-mmio.force-legacy=false -drive file=fs.img,if=none,format=raw,id=x0 -device virtio-blk-device,drive=x0,bus=virtio-mmio-bus.0
+"""
+
+
+class TestCommandParsing:
+    """測試命令列解析"""
+
+    def test_parse_qemu_line(self):
+        """應該跳過編譯命令，只取出 QEMU 那一行"""
+        cmd = parse_make_dry_run(MAKE_OUTPUT)
+        assert cmd[0] == "qemu-system-riscv64"
+        assert cmd[cmd.index("-kernel") + 1] == "kernel/kernel"
+        assert cmd[cmd.index("-smp") + 1] == "3"
+
+    def test_parse_without_qemu(self):
+        """沒有 QEMU 命令時返回 None"""
+        assert parse_make_dry_run("make: Nothing to be done for 'all'.") is None
+
+    def test_with_drive_keeps_other_options(self):
+        """替換磁碟映像時應保留 if/id 等選項"""
+        cmd = with_drive(parse_make_dry_run(MAKE_OUTPUT), "/tmp/x.qcow2", "qcow2")
+        drive = cmd[cmd.index("-drive") + 1]
+        assert "file=/tmp/x.qcow2" in drive
+        assert "format=qcow2" in drive
+        assert "id=x0" in drive and "if=none" in drive
+        assert "format=raw" not in drive
+
+    def test_with_drive_requires_drive(self):
+        """命令列沒有 -drive 時應該報錯"""
+        with pytest.raises(ValueError):
+            with_drive(["qemu-system-riscv64", "-nographic"], "fs.img")
+
+
+def test_cache_key_ignores_fs_img(tmp_path):
+    """開機寫入 fs.img 不應讓命令列快取失效，Makefile 改變時才重新解析"""
+    (tmp_path / "Makefile").write_text("qemu:\n")
+    (tmp_path / "fs.img").write_bytes(b"\0" * 1024)
+    key = _cache_key(str(tmp_path))
+
+    os.utime(tmp_path / "fs.img", ns=(0, 10**18))
+    assert _cache_key(str(tmp_path)) == key
+
+    os.utime(tmp_path / "Makefile", ns=(0, 10**18))
+    assert _cache_key(str(tmp_path)) != key
+
+
+def test_resolve_from_makefile():
+    """從真正的 xv6 Makefile 解析出的命令列應使用 virt 機器與 fs.img"""
+    cmd = resolve_qemu_command("../xv6-riscv")
+    assert os.path.basename(cmd[0]).startswith("qemu-system-riscv64")
+    assert "virt" in cmd
+    assert any("fs.img" in arg for arg in cmd)
+
+
+def test_direct_launch_boots():
+    """直接執行 QEMU 應該能啟動到 shell 提示符"""
+    harness = XV6TestHarness(xv6_path="../xv6-riscv", launch="direct")
+    assert harness.start(), "直接啟動 QEMU 失敗"
+    try:
+        success, output = harness.run_command("echo direct")
+        assert success and "direct" in output
+    finally:
+        harness.stop()
+
+
+@pytest.mark.skipif(shutil.which(QEMU_IMG) is None, reason="需要 qemu-img")
+class TestDiskOverlay:
+    """測試 qcow2 覆蓋層"""
+
+    def test_create_overlay(self, tmp_path):
+        """覆蓋層應以原始映像為 backing file，且幾乎不佔空間"""
+        base = tmp_path / "fs.img"
+        base.write_bytes(b"\xab" * (4 << 20))
+        overlay = tmp_path / "fs.qcow2"
+
+        create_overlay(str(base), str(overlay))
+
+        info = json.loads(subprocess.run(
+            [QEMU_IMG, "info", "--output=json", str(overlay)],
+            check=True, capture_output=True, text=True).stdout)
+        assert info["format"] == "qcow2"
+        assert info["backing-filename"] == str(base)
+        assert allocated_bytes(str(overlay)) < allocated_bytes(str(base))
+
+    def test_overlay_isolation(self):
+        """寫入只進入各自的覆蓋層，原始 fs.img 與其他 VM 不受影響"""
+        base = os.path.join("../xv6-riscv", "fs.img")
+        mtime = os.stat(base).st_mtime_ns
+
+        with XV6TestHarness(xv6_path="../xv6-riscv", disk_overlay=True) as first, \
+                XV6TestHarness(xv6_path="../xv6-riscv", disk_overlay=True) as second:
+            assert first.process and second.process, "無法啟動 xv6"
+            first.run_command("echo leak > overlay.txt")
+            assert first.check_file_exists("overlay.txt")
+            assert not second.check_file_exists("overlay.txt")
+
+            stats = first.stats()
+            assert stats["disk_setup_seconds"] > 0
+            assert stats["disk_bytes"] > 0
+
+        assert os.stat(base).st_mtime_ns == mtime, "原始 fs.img 不應被修改"
+
@@ -0,0 +1,101 @@
+"""
+xv6 快照開機測試
+驗證從 QEMU 快照還原的 xv6 與冷開機行為一致，且各實例之間互不影響
+"""
+
+import pytest
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from xv6_harness import XV6TestHarness
+from xv6_snapshot import XV6Snapshot
+
+
+@pytest.fixture(scope="function")
+def xv6():
+    """Pytest fixture: 提供從快照還原的 xv6 實例"""
+    harness = XV6TestHarness(
+        xv6_path="../xv6-riscv",
+        timeout=10,
+        debug=True,
+        use_snapshot=True
+    )
+    success = harness.start()
+    assert success, "無法從快照啟動 xv6"
+    yield harness
+    harness.stop()
+
+
+class TestSnapshotBoot:
+    """測試快照還原後的 shell 狀態"""
+
+    def test_shell_ready_after_restore(self, xv6):
+        """還原後 shell 應該能立即執行命令"""
+        success, output = xv6.run_command("echo restored")
+        assert success, "還原後執行命令失敗"
+        assert "restored" in output
+
+    def test_filesystem_available(self, xv6):
+        """還原後檔案系統內容應與 fs.img 相同"""
+        assert xv6.check_file_exists("README"), "README 應該存在"
+
+    def test_writes_do_not_leak_between_instances(self, xv6):
+        """每個實例使用自己的快照複本，寫入不會影響下一個實例"""
+        success, _ = xv6.run_command("echo leak > snapleak.txt")
+        assert success
+        assert xv6.check_file_exists("snapleak.txt")
+
+        other = XV6TestHarness(xv6_path="../xv6-riscv", timeout=10, use_snapshot=True)
+        assert other.start(), "第二個實例無法從快照啟動"
+        try:
+            assert not other.check_file_exists("snapleak.txt"), \
+                "其他實例的寫入不應該出現在新的快照實例中"
+        finally:
+            other.stop()
+
+    def test_reset_restores_in_place(self, xv6):
+        """reset() 以 loadvm 還原執行中的 VM：寫入消失，QEMU 不重新啟動"""
+        assert xv6.run_command("echo gone > snapreset.txt")[0]
+        pid = xv6.process.pid
+        assert xv6.reset(), "還原快照失敗"
+        assert xv6.process.pid == pid
+        assert not xv6.check_file_exists("snapreset.txt")
+
+
+def test_cache_key_ignores_fs_img_mtime(tmp_path):
+    """fs.img 只有修改時間改變時沿用快照，內容或 kernel 改變時才重建"""
+    (tmp_path / "kernel").mkdir()
+    kernel = tmp_path / "kernel" / "kernel"
+    kernel.write_bytes(b"kernel")
+    fs_img = tmp_path / "fs.img"
+    fs_img.write_bytes(b"\0" * 4096)
+
+    snapshot = XV6Snapshot(str(tmp_path), cache_dir=str(tmp_path / "cache"))
+    key = snapshot._cache_key()
+
+    os.utime(fs_img, ns=(0, 10**18))
+    assert snapshot._cache_key() == key
+
+    fs_img.write_bytes(b"\1" * 4096)
+    changed = snapshot._cache_key()
+    assert changed != key
+
+    kernel.write_bytes(b"rebuilt kernel")
+    assert snapshot._cache_key() != changed
+
+
+@pytest.mark.slow
+def test_snapshot_restore_time():
+    """快照建立後，還原應該遠快於冷開機"""
+    harness = XV6TestHarness(xv6_path="../xv6-riscv", use_snapshot=True)
+    # 確保快照已存在，避免把建立快照的冷開機算進去
+    harness.snapshot.ensure()
+
+    start = time.time()
+    assert harness.start(), "無法從快照啟動 xv6"
+    duration = time.time() - start
+    harness.stop()
+
+    assert duration < 5, f"快照還原時間過長: {duration:.2f}秒"
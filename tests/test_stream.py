@@ -0,0 +1,77 @@
+"""
+串流命令輸出測試
+驗證 stream_command() 逐行產生輸出、回呼與中止條件
+"""
+
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from xv6_harness import XV6TestHarness
+
+
+@pytest.fixture(scope="function")
+def xv6(xv6_pool):
+    """Pytest fixture: 提供 xv6 實例（從 VM 池取得已開機的實例）"""
+    harness = xv6_pool.acquire()
+    assert harness, "無法啟動 xv6"
+    harness.timeout = 15
+    yield harness
+    xv6_pool.release(harness)
+
+
+class TestStreamCommand:
+    """測試串流輸出"""
+
+    def test_lines_match_run_command(self, xv6):
+        """串流取得的行應與 run_command 的輸出一致"""
+        success, expected = xv6.run_command("cat README")
+        assert success
+
+        stream = xv6.stream_command("cat README")
+        lines = list(stream)
+
+        assert stream.success, stream.error
+        assert "\n".join(lines).strip() == expected
+        assert stream.line_count == len(lines)
+
+    def test_on_line_callback(self, xv6):
+        """每一行都應該呼叫 on_line"""
+        seen = []
+        stream = xv6.stream_command("ls", on_line=seen.append)
+        lines = list(stream)
+
+        assert seen == lines
+        assert any(line.startswith("README") for line in lines)
+
+    def test_abort_stops_vm(self, xv6):
+        """abort_if 成立時應停止迭代並關閉 VM"""
+        stream = xv6.stream_command("ls", abort_if=lambda line: line.startswith(".."))
+        lines = list(stream)
+
+        assert stream.aborted
+        assert not stream.success
+        assert lines[-1].startswith("..")
+        assert xv6.process is None, "中止後 VM 應該已關閉"
+
+    def test_shell_usable_after_stream(self, xv6):
+        """串流結束後一般命令仍應正常運作"""
+        list(xv6.stream_command("echo streamed"))
+        success, output = xv6.run_command("echo after")
+        assert success and output == "after"
+
+
+def test_stream_without_start():
+    """未啟動時串流應該立即結束並回報失敗"""
+    stream = XV6TestHarness(xv6_path="../xv6-riscv").stream_command("ls")
+    assert list(stream) == []
+    assert stream.success is False
+
+
+def test_stream_is_single_shot():
+    """再次迭代不會重新送出命令"""
+    stream = XV6TestHarness(xv6_path="../xv6-riscv").stream_command("ls")
+    list(stream)
+    with pytest.raises(RuntimeError):
+        iter(stream)
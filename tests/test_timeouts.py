@@ -0,0 +1,81 @@
+"""
+自適應超時測試
+驗證由歷史命令耗時推算的超時、上下限與樣本不足時的退回
+"""
+
+import pytest
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from xv6_harness import XV6TestHarness
+from xv6_history import PerfHistory
+from xv6_timeouts import AdaptiveTimeouts, command_name
+
+
+class TestAdaptiveTimeouts:
+    """測試超時推算"""
+
+    def test_multiple_of_p99(self):
+        """超時是 p99 的倍數，以 argv[0] 分組"""
+        timeouts = AdaptiveTimeouts(multiplier=3, floor=1, ceiling=1000)
+        timeouts.add_samples("forktest", [(10.0, 99), (20.0, 1)])
+        assert timeouts.timeout_for("forktest", 30) == pytest.approx(30.0, rel=0.02)
+        assert command_name("  cat README ") == "cat"
+
+    def test_floor_and_ceiling(self):
+        timeouts = AdaptiveTimeouts(multiplier=3, floor=2, ceiling=600)
+        timeouts.add_samples("echo", [(0.01, 50)])
+        timeouts.add_samples("usertests", [(400.0, 20)])
+        assert timeouts.timeout_for("echo hi", 10) == 2
+        # 比呼叫端指定的超時長：較慢的主機上不會被切斷
+        assert timeouts.timeout_for("usertests", 300) == 600
+
+    def test_explicit_timeout_only_extended(self):
+        """呼叫端明確指定的超時不會被縮短（cat 大檔案與 cat README 共用一個 p99）"""
+        timeouts = AdaptiveTimeouts(multiplier=3, floor=1, ceiling=600)
+        timeouts.add_samples("cat", [(0.1, 50)])
+        timeouts.add_samples("usertests", [(150.0, 20)])
+        assert timeouts.timeout_for("cat big.txt", 60) == pytest.approx(1.0)
+        assert timeouts.timeout_for("cat big.txt", 60, explicit=True) == 60
+        assert timeouts.timeout_for("usertests", 300, explicit=True) == pytest.approx(450, rel=0.02)
+
+    def test_too_few_samples(self):
+        """樣本不足時使用呼叫端的超時，完成的命令會加入統計"""
+        timeouts = AdaptiveTimeouts(floor=1, min_samples=5)
+        for _ in range(4):
+            timeouts.observe("ls /", 0.1)
+        assert timeouts.learned("ls") is None and timeouts.timeout_for("ls", 15) == 15
+        timeouts.observe("ls", 0.1)
+        assert timeouts.timeout_for("ls", 15) == 1
+
+    def test_invalid_bounds(self):
+        with pytest.raises(ValueError):
+            AdaptiveTimeouts(floor=10, ceiling=5)
+
+    def test_from_history(self, tmp_path):
+        """載入最近的 run 中同一台主機的命令耗時"""
+        db_path = str(tmp_path / "history.sqlite")
+        with PerfHistory(db_path) as history:
+            history.record_run("aaaa", "k1", {("command", "wc"): [(0.5, 20)],
+                                              ("test", "t"): [(1.0, 1)]})
+        timeouts = AdaptiveTimeouts.from_history(db_path, floor=0.1)
+        assert timeouts.timeout_for("wc README", 10) == pytest.approx(1.5, rel=0.02)
+        assert AdaptiveTimeouts.from_history(db_path, host="other").learned("wc") is None
+        assert AdaptiveTimeouts.from_history(str(tmp_path / "missing.sqlite")).summary() == []
+
+
+def test_hanging_command_fails_fast():
+    """有歷史的命令卡住時不必等到預設的超時（不帶參數的 cat 會一直等待輸入）"""
+    timeouts = AdaptiveTimeouts(floor=2)
+    timeouts.add_samples("cat", [(0.05, 20)])
+    harness = XV6TestHarness(xv6_path="../xv6-riscv", timeout=60, timeouts=timeouts)
+    assert harness.start(), "無法啟動 xv6"
+    try:
+        started = time.time()
+        success, _ = harness.run_command("cat")
+        assert not success
+        assert time.time() - started < 10
+    finally:
+        harness.stop()
@@ -0,0 +1,122 @@
+"""
+當機分類與最小化測試
+驗證指紋、分組與 ddmin
+"""
+
+import json
+import pytest
+import sys
+import os
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from xv6_triage import (Replayer, bucket, command_shape, ddmin, fingerprint, load_crashes,
+                        minimize, triage)
+
+KERNELTRAP_CONSOLE = """\
+$ ln a b
+scause=0xd sepc=0x80001a2c stval=0x3fffffe000
+panic: kerneltrap
+"""
+
+
+def crash(kind="panic", command="ln a b", console=KERNELTRAP_CONSOLE, panic=None, case=None):
+    return {"kind": kind, "command": command, "console": console, "panic": panic,
+            "case": case or [command]}
+
+
+class TestFingerprint:
+    """測試指紋"""
+
+    def test_trap_fields(self):
+        """取出 panic 訊息與 scause/sepc"""
+        fp = fingerprint(crash())
+        assert (fp.kind, fp.panic, fp.scause, fp.sepc) == ("panic", "kerneltrap", "0xd", "0x80001a2c")
+        assert fp.command == "ln _"
+
+    def test_volatile_parts_ignored(self):
+        """panic 訊息中的數字與參數不同仍是同一組"""
+        a = fingerprint(crash(panic="panic: freeing 0x87f5e000", console=""))
+        b = fingerprint(crash(panic="panic: freeing 0x87f31000", console="", command="ln x y"))
+        assert a.key == b.key and a.panic == "freeing N"
+
+    def test_hangs_keyed_by_command(self):
+        """沒有 panic 資訊時以命令結構區分"""
+        a = fingerprint(crash(kind="hang", command="cat a | wc", console=""))
+        b = fingerprint(crash(kind="hang", command="ls a", console=""))
+        assert a.key != b.key and not a.reproduces(b)
+        c = fingerprint(crash(kind="hang", command="cat b c | wc", console=""))
+        assert a.reproduces(c)
+
+    def test_command_shape(self):
+        assert command_shape("cat a b < c | wc ; echo x y") == "cat _ < _ | wc ; echo _"
+
+
+def test_bucket_and_load(tmp_path):
+    """重複的當機歸到同一組，依數量排序，組內最短的案例在前"""
+    records = [crash(case=["echo 1", "ln a b"]), crash(case=["ln a b"]),
+               crash(kind="hang", command="cat x", console="")]
+    for i, record in enumerate(records):
+        with open(tmp_path / f"panic-{i}.json", "w") as f:
+            json.dump(record, f)
+    groups = list(bucket(load_crashes(str(tmp_path))).values())
+    assert [len(group) for group in groups] == [2, 1]
+    assert groups[0][0]["case"] == ["ln a b"]
+
+
+class TestDdmin:
+    """測試 delta debugging"""
+
+    def test_minimal_subset(self):
+        """只保留重現錯誤所需的元素"""
+        calls = []
+
+        def test(candidates):
+            calls.append(len(candidates))
+            return [3 in c and 7 in c for c in candidates]
+
+        assert ddmin(list(range(10)), test) == [3, 7]
+        # 每一輪的候選一起交給 test（可平行重播）
+        assert max(calls) > 1
+
+    def test_single_element(self):
+        assert ddmin(["only"], lambda candidates: [True] * len(candidates)) == ["only"]
+
+
+def test_minimize_lines_and_tokens():
+    """以重播結果縮減命令與 token"""
+    class FakeReplayer(Replayer):
+        def replay(self, case):
+            hit = any("rm" in line.split() and "x" in line.split() for line in case)
+            return fingerprint(crash(command="rm x")) if hit else None
+
+    with FakeReplayer(workers=2) as replayer:
+        target = fingerprint(crash(command="rm x"))
+        assert minimize(["echo a", "rm y x z", "ls"], target, replayer) == ["rm x"]
+
+
+def test_triage_replays_on_workers(tmp_path):
+    """triage() 的第一次重播也在重播器的執行緒上進行，不會在主執行緒另外開 VM"""
+    threads = []
+
+    class FakeReplayer(Replayer):
+        def replay(self, case):
+            threads.append(threading.current_thread().name)
+            return fingerprint(crash(command="rm x"))
+
+    with open(tmp_path / "panic-0.json", "w") as f:
+        json.dump(crash(command="rm x", case=["echo a", "rm x"]), f)
+    with FakeReplayer(workers=2) as replayer:
+        report = triage(str(tmp_path), replayer, verbose=False)
+    assert report[0]["reproducible"]
+    assert threads and all(name.startswith("xv6-triage") for name in threads)
+
+
+@pytest.mark.fuzzing
+def test_replay_reuses_vm():
+    """快照模式下重播多個案例只開機一次"""
+    with Replayer(workers=1) as replayer:
+        assert replayer.replay(["echo hi"]) is None
+        assert replayer.replay(["ls"]) is None
+        assert replayer.stats["boots"] == 1, "無法啟動 xv6"
+        assert replayer.stats["restores"] == 1